@@ -0,0 +1,227 @@
+"""Time and memory benchmarks of reading, processing, plotting and saving trials
+
+Run from the repository root, for example::
+
+    python -m benchmarks.run --size medium --output results/main.json
+    python -m benchmarks.run --size medium --compare results/main.json
+
+Each benchmark is timed `--repeats` times (the minimum and median are kept)
+and run once more under `tracemalloc` to record its peak Python/NumPy memory.
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Sequence
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np  # noqa: E402
+import scipy  # noqa: E402
+
+import spike2py  # noqa: E402
+from spike2py import read, trial  # noqa: E402
+
+from benchmarks.synthetic import SIZES, write_recording  # noqa: E402
+
+
+class Benchmark(NamedTuple):
+    """A benchmark: `setup` prepares fresh inputs, `run` is what is measured"""
+
+    name: str
+    setup: Callable[[], object]
+    run: Callable[[object], object]
+
+
+def benchmarks(file: Path) -> List[Benchmark]:
+    """All benchmarks for the recording in `file`"""
+
+    def open_trial():
+        return trial.Trial(trial.TrialInfo(file=file, name="benchmark"))
+
+    loaded_trial = open_trial().load_channels()
+
+    def saved_trial():
+        loaded_trial.save()
+        return loaded_trial.info.path_save_trial / "benchmark.pkl"
+
+    def waveform():
+        return copy.deepcopy(loaded_trial.Emg1)
+
+    def waveform_method(name: str, *args) -> Benchmark:
+        return Benchmark(
+            f"sig_proc.{name}",
+            waveform,
+            lambda waveform: getattr(waveform, name)(*args),
+        )
+
+    times = loaded_trial.Emg1.times
+    return [
+        Benchmark("read.read", lambda: file, read.read),
+        Benchmark("trial.Trial", lambda: None, lambda _: open_trial()),
+        Benchmark("trial.Trial.load_channels", open_trial, lambda t: t.load_channels()),
+        waveform_method("remove_mean"),
+        waveform_method("remove_value", 0.5),
+        waveform_method("lowpass", 20),
+        waveform_method("highpass", 20),
+        waveform_method("bandpass", [20, 450]),
+        waveform_method("bandstop", [45, 55]),
+        waveform_method("calibrate", 2.0, 0.1),
+        waveform_method("norm_percentage"),
+        waveform_method("norm_proportion"),
+        waveform_method("norm_percent_value", 2.0),
+        waveform_method("rect"),
+        waveform_method("interp_new_times", times[::2]),
+        waveform_method("interp_new_fs", 500),
+        waveform_method("linear_detrend"),
+        waveform_method("blank_artefacts", loaded_trial.Stim),
+        waveform_method("remove_line_noise"),
+        Benchmark(
+            "plot.plot_channel",
+            waveform,
+            lambda waveform: spike2py.plot.plot_channel(waveform, save=True),
+        ),
+        Benchmark(
+            "plot.plot_trial",
+            lambda: loaded_trial,
+            lambda t: spike2py.plot.plot_trial(t, save=True),
+        ),
+        Benchmark("trial.Trial.save", lambda: loaded_trial, lambda t: t.save()),
+        Benchmark("trial.load", saved_trial, trial.load),
+    ]
+
+
+def measure(benchmark: Benchmark, repeats: int) -> Dict[str, float]:
+    """Time `benchmark` `repeats` times, then record its peak traced memory
+
+    A first, untimed run loads lazily imported modules and warms caches.
+    """
+    benchmark.run(benchmark.setup())
+    durations = list()
+    for _ in range(repeats):
+        inputs = benchmark.setup()
+        start = time.perf_counter()
+        benchmark.run(inputs)
+        durations.append(time.perf_counter() - start)
+    inputs = benchmark.setup()
+    tracemalloc.start()
+    try:
+        benchmark.run(inputs)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds_min": min(durations),
+        "seconds_median": statistics.median(durations),
+        "peak_memory_bytes": peak_memory,
+        "repeats": repeats,
+    }
+
+
+def run(
+    size: str = "small",
+    repeats: int = 3,
+    selected: Sequence[str] = None,
+    directory: Path = None,
+) -> dict:
+    """Run benchmarks on a synthetic recording and return their results
+
+    Parameters
+    ----------
+    size
+        Key of `benchmarks.synthetic.SIZES`
+    repeats
+        Number of timed runs of each benchmark
+    selected
+        Names of benchmarks to run (or prefixes, e.g. 'sig_proc'); defaults to all
+    directory
+        Where the recording, figures and saved trial are written;
+        defaults to a temporary directory
+    """
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        directory = Path(directory or temporary_directory)
+        spec = SIZES[size]
+        file = write_recording(directory / f"synthetic_{size}.mat", spec)
+        results = dict()
+        for benchmark in benchmarks(file):
+            if selected and not any(
+                benchmark.name.startswith(name) for name in selected
+            ):
+                continue
+            results[benchmark.name] = measure(benchmark, repeats)
+        return {
+            "metadata": _metadata(size),
+            "recording": spec._asdict(),
+            "results": results,
+        }
+
+
+def compare(baseline: dict, current: dict) -> str:
+    """Table of time and memory ratios (current / baseline) per benchmark"""
+    lines = [f"{'benchmark':<32}{'time ratio':>12}{'memory ratio':>14}"]
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]
+        time_ratio = result["seconds_min"] / max(before["seconds_min"], 1e-12)
+        memory_ratio = result["peak_memory_bytes"] / max(before["peak_memory_bytes"], 1)
+        lines.append(f"{name:<32}{time_ratio:>12.2f}{memory_ratio:>14.2f}")
+    return "\n".join(lines)
+
+
+def _metadata(size: str) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "size": size,
+        "commit": commit,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "matplotlib": matplotlib.__version__,
+        "machine": platform.platform(),
+    }
+
+
+def main(argv: Sequence[str] = None) -> dict:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--size", choices=list(SIZES), default="small")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", nargs="+", help="benchmark names or prefixes")
+    parser.add_argument("--output", type=Path, help="JSON file to write results to")
+    parser.add_argument("--compare", type=Path, help="JSON results to compare with")
+    args = parser.parse_args(argv)
+    results = run(args.size, args.repeats, args.only)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+    for name, result in results["results"].items():
+        print(
+            f"{name:<32}{result['seconds_min'] * 1000:>10.1f} ms"
+            f"{result['peak_memory_bytes'] / 1e6:>10.1f} MB"
+        )
+    if args.compare:
+        print()
+        print(compare(json.loads(args.compare.read_text()), results))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Write synthetic Spike2 recordings exported to .mat, for benchmarks
+
+Files have the same layout as those exported by Spike2 (one struct per
+channel, with the fields Spike2 writes for each channel type), so they are
+read by exactly the same code paths as real recordings.
+"""
+
+from pathlib import Path
+from typing import Dict, NamedTuple, Union
+
+import numpy as np
+import scipy.io as sio
+
+
+class RecordingSpec(NamedTuple):
+    """Size and content of a synthetic recording
+
+    n_waveforms
+        Number of Waveform channels (EMG-like noise bursts plus a slow trend)
+    sampling_frequency
+        Sampling frequency of Waveform channels, in Hertz
+    duration
+        Length of the recording in seconds
+    event_rate
+        Mean number of events per second in the Event channel
+    n_wavemarks
+        Number of Wavemark channels
+    wavemark_rate
+        Mean number of spikes per second in each Wavemark channel
+    wavemark_points
+        Number of samples in each spike template
+    n_keyboard
+        Number of keyboard markers
+    n_textmarks
+        Number of textmark (memory) markers
+    """
+
+    n_waveforms: int = 4
+    sampling_frequency: int = 2000
+    duration: float = 60
+    event_rate: float = 1
+    n_wavemarks: int = 1
+    wavemark_rate: float = 10
+    wavemark_points: int = 32
+    n_keyboard: int = 10
+    n_textmarks: int = 5
+
+
+SIZES: Dict[str, RecordingSpec] = {
+    "tiny": RecordingSpec(n_waveforms=2, sampling_frequency=1000, duration=5),
+    "small": RecordingSpec(),
+    "medium": RecordingSpec(n_waveforms=8, sampling_frequency=5000, duration=300),
+    "large": RecordingSpec(
+        n_waveforms=16,
+        sampling_frequency=10000,
+        duration=600,
+        event_rate=5,
+        n_wavemarks=4,
+        wavemark_rate=20,
+    ),
+}
+
+
+def write_recording(
+    file: Union[Path, str],
+    spec: RecordingSpec = SIZES["small"],
+    seed: int = 0,
+    compress: bool = True,
+) -> Path:
+    """Write a synthetic Spike2 recording to `file`
+
+    Parameters
+    ----------
+    file
+        Path of the .mat file to write
+    spec
+        Size and content of the recording
+    seed
+        Seed of the random number generator; the same seed gives the same file
+    compress
+        Compress variables, as MATLAB 7 files exported by Spike2 are
+    """
+    file = Path(file)
+    rng = np.random.default_rng(seed)
+    n_samples = int(spec.duration * spec.sampling_frequency)
+    channels = dict()
+    for index in range(spec.n_waveforms):
+        channels[f"EMG{index + 1}"] = _waveform(
+            _emg_like(rng, n_samples, spec.sampling_frequency), spec.sampling_frequency
+        )
+    channels["Stim"] = _event(_poisson_times(rng, spec.event_rate, spec.duration))
+    for index in range(spec.n_wavemarks):
+        times = _poisson_times(rng, spec.wavemark_rate, spec.duration)
+        channels[f"MU{index + 1}"] = _wavemark(
+            times, _spike_templates(rng, len(times), spec.wavemark_points)
+        )
+    keyboard_times = np.sort(rng.uniform(0, spec.duration, spec.n_keyboard))
+    keyboard_codes = rng.choice(list("abcdefghij"), spec.n_keyboard)
+    channels["Keyboard"] = _keyboard(keyboard_times, keyboard_codes)
+    textmark_times = np.sort(rng.uniform(0, spec.duration, spec.n_textmarks))
+    channels["Memory"] = _textmark(
+        textmark_times, [f"note {index}" for index in range(spec.n_textmarks)]
+    )
+    file.parent.mkdir(parents=True, exist_ok=True)
+    sio.savemat(file, channels, do_compression=compress)
+    return file
+
+
+def _emg_like(rng: np.random.Generator, n_samples: int, sampling_frequency: int):
+    times = np.arange(n_samples) / sampling_frequency
+    envelope = 0.2 + (np.sin(2 * np.pi * 0.25 * times) > 0.5)
+    values = envelope * rng.normal(size=n_samples)
+    values += 0.5 * np.sin(2 * np.pi * 50 * times)
+    values += 0.1 * times / max(times[-1], 1)
+    return values
+
+
+def _poisson_times(rng: np.random.Generator, rate: float, duration: float):
+    return np.sort(rng.uniform(0, duration, rng.poisson(rate * duration)))
+
+
+def _spike_templates(rng: np.random.Generator, n_spikes: int, n_points: int):
+    template = np.sin(np.linspace(0, 2 * np.pi, n_points)) * np.hanning(n_points)
+    return template + 0.05 * rng.normal(size=(n_spikes, n_points))
+
+
+def _waveform(values: np.ndarray, sampling_frequency: int) -> dict:
+    interval = 1 / sampling_frequency
+    return {
+        "title": "",
+        "comment": "",
+        "interval": interval,
+        "scale": 1.0,
+        "offset": 0.0,
+        "units": "V",
+        "start": 0.0,
+        "length": len(values),
+        "values": values.reshape(-1, 1),
+        "times": (np.arange(len(values)) * interval).reshape(-1, 1),
+    }
+
+
+def _event(times: np.ndarray) -> dict:
+    return {
+        "title": "",
+        "comment": "",
+        "interval": 0.0,
+        "times": times.reshape(-1, 1),
+        "length": len(times),
+    }
+
+
+def _wavemark(times: np.ndarray, spikes: np.ndarray) -> dict:
+    return {
+        "title": "",
+        "comment": "",
+        "interval": 1 / 25000,
+        "scale": 1.0,
+        "offset": 0.0,
+        "units": "V",
+        "resolution": 1e-5,
+        "length": len(times),
+        "items": spikes.shape[1],
+        "trace": 1,
+        "traces": 1,
+        "times": times.reshape(-1, 1),
+        "codes": np.zeros((len(times), 4), dtype=np.uint8),
+        "values": spikes,
+    }
+
+
+def _keyboard(times: np.ndarray, codes: np.ndarray) -> dict:
+    encoded = np.zeros((len(codes), 4), dtype=np.uint8)
+    encoded[:, 0] = [ord(code) for code in codes]
+    return {
+        "title": "Keyboard",
+        "comment": "",
+        "resolution": 1e-5,
+        "length": len(times),
+        "times": times.reshape(-1, 1),
+        "codes": encoded,
+    }
+
+
+def _textmark(times: np.ndarray, text: list) -> dict:
+    width = max((len(line) for line in text), default=1)
+    return {
+        "title": "Memory",
+        "comment": "",
+        "resolution": 1e-5,
+        "length": len(times),
+        "items": width,
+        "times": times.reshape(-1, 1),
+        "codes": np.zeros((len(times), 4), dtype=np.uint8),
+        "text": np.array([line.ljust(width) for line in text]),
+    }
@@ -1,12 +1,51 @@
+import importlib
+
 from . import trial
 from . import channels
 from . import read
 from . import sig_proc
-from . import plot
+from . import spectral
 from . import types
-from . import demo
+from . import detect
+from . import pyramid
+from . import profiling
+from . import memory
+from . import cache
+from . import memo
+from . import segments
 from .trial import TrialInfo
 from .trial import Trial
-from .demo import test_install
-from .demo import tutorial_data
 from .trial import load
+
+# Imported on first use: they load matplotlib (and urllib for demo), sqlite3,
+# asyncio or shared memory, which scripts and worker processes that only read
+# and process data never need
+_LAZY_MODULES = (
+    "plot",
+    "demo",
+    "export",
+    "recipe",
+    "catalogue",
+    "aggregate",
+    "pipeline",
+    "shared",
+)
+# Functions of lazy modules, available as spike2py.<name>
+_LAZY_FUNCTIONS = {
+    "test_install": "demo",
+    "tutorial_data": "demo",
+    "aload": "pipeline",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_MODULES:
+        return importlib.import_module(f".{name}", __name__)
+    if name in _LAZY_FUNCTIONS:
+        module = importlib.import_module(f".{_LAZY_FUNCTIONS[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_MODULES) | set(_LAZY_FUNCTIONS))
@@ -0,0 +1,5 @@
+import sys
+
+from spike2py.cli import main
+
+sys.exit(main())
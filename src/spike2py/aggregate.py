@@ -0,0 +1,344 @@
+"""Streaming aggregation of observations across many trials
+
+Grand averages, variances, histograms and quantiles of epochs, spectra or
+rates can be computed over a whole study without holding more than one trial
+per process in memory. Each trial is loaded, reduced to observations by a
+user function and folded into running accumulators; accumulators of
+different processes are then merged. For example::
+
+    def emg_epochs(spike2py_trial):
+        return {"epochs": aggregate.epochs(spike2py_trial.Emg, spike2py_trial.Stim, 0.01, 0.05)}
+
+    result = aggregate.reduce_trials(
+        files, emg_epochs, {"epochs": aggregate.Moments()}, workers=8
+    )
+    grand_average = result["epochs"].mean
+"""
+
+import copy
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Sequence, Union
+
+import numpy as np
+
+from spike2py import channels, pipeline, trial
+from spike2py.types import artefact_times, trial_source
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+CHUNKS_PER_WORKER = 4
+
+
+class Moments:
+    """Running count, mean and variance of observations of equal shape
+
+    Batches are combined with the parallel form of Welford's algorithm, which
+    stays accurate for long studies and lets accumulators from different
+    processes be merged exactly.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean: np.ndarray = None
+        self._sum_sq_dev: np.ndarray = None
+
+    def __repr__(self) -> str:
+        shape = None if self.mean is None else np.shape(self.mean)
+        return f"Moments(count={self.count}, shape={shape})"
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Sample variance (with one degree of freedom removed)"""
+        if self.count < 2:
+            return None
+        return self._sum_sq_dev / (self.count - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        """Sample standard deviation"""
+        variance = self.variance
+        return None if variance is None else np.sqrt(variance)
+
+    def update(self, observations: np.ndarray):
+        """Add observations stacked along the first axis
+
+        For example, epochs of shape (n_epochs, n_samples) add n_epochs
+        observations of n_samples values. Use `observations[np.newaxis]` to
+        add a single observation.
+        """
+        observations = np.asarray(observations, dtype=float)
+        if len(observations) == 0:
+            return self
+        batch_mean = observations.mean(axis=0)
+        batch_sum_sq_dev = ((observations - batch_mean) ** 2).sum(axis=0)
+        self._combine(len(observations), batch_mean, batch_sum_sq_dev)
+        return self
+
+    def merge(self, other: "Moments"):
+        """Add the observations accumulated by `other`"""
+        if other.count:
+            self._combine(other.count, other.mean, other._sum_sq_dev)
+        return self
+
+    def _combine(self, count: int, mean: np.ndarray, sum_sq_dev: np.ndarray) -> None:
+        if self.count == 0:
+            self.count, self.mean, self._sum_sq_dev = count, mean, sum_sq_dev
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self._sum_sq_dev = (
+            self._sum_sq_dev + sum_sq_dev + delta**2 * (self.count * count / total)
+        )
+        self.count = total
+
+
+class Histogram:
+    """Counts of observed values in fixed bins
+
+    Parameters
+    ----------
+    edges
+        Bin edges, as for `numpy.histogram`; values outside them are counted
+        in `underflow` and `overflow`
+    """
+
+    def __init__(self, edges: Sequence[float]) -> None:
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def __repr__(self) -> str:
+        return f"Histogram(bins={len(self.counts)}, count={self.count})"
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum()) + self.underflow + self.overflow
+
+    def update(self, observations: np.ndarray):
+        """Add all values of `observations`, whatever their shape"""
+        values = np.asarray(observations, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        self.counts += np.histogram(values, self.edges)[0]
+        self.underflow += int(np.count_nonzero(values < self.edges[0]))
+        self.overflow += int(np.count_nonzero(values > self.edges[-1]))
+        return self
+
+    def merge(self, other: "Histogram"):
+        """Add the counts of `other`, which must have the same edges"""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Histograms with different edges cannot be merged")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+
+class QuantileSketch:
+    """Quantiles of observed values with bounded relative error and memory
+
+    Values are counted in logarithmically sized buckets (as in DDSketch), so
+    any quantile is returned within `relative_accuracy` of a true value of
+    that rank, using memory that grows with the logarithm of the range of the
+    values rather than with their number. Sketches merge exactly.
+
+    Parameters
+    ----------
+    relative_accuracy
+        Largest relative error of returned quantiles, e.g. 0.01 for 1%
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._positive: Dict[int, int] = dict()
+        self._negative: Dict[int, int] = dict()
+        self.zero_count = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"QuantileSketch(relative_accuracy={self.relative_accuracy}, "
+            f"count={self.count})"
+        )
+
+    @property
+    def count(self) -> int:
+        return (
+            sum(self._positive.values())
+            + sum(self._negative.values())
+            + self.zero_count
+        )
+
+    def update(self, observations: np.ndarray):
+        """Add all values of `observations`, whatever their shape"""
+        values = np.asarray(observations, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        self.zero_count += int(np.count_nonzero(values == 0))
+        _add_to_buckets(self._positive, self._bucket(values[values > 0]))
+        _add_to_buckets(self._negative, self._bucket(-values[values < 0]))
+        return self
+
+    def merge(self, other: "QuantileSketch"):
+        """Add the values counted by `other`, which must have the same accuracy"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Sketches with different accuracies cannot be merged")
+        for buckets, other_buckets in (
+            (self._positive, other._positive),
+            (self._negative, other._negative),
+        ):
+            for key, count in other_buckets.items():
+                buckets[key] = buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        return self
+
+    def quantile(self, q: Union[float, Sequence[float]]) -> Union[float, np.ndarray]:
+        """Value(s) at quantile(s) `q`, between 0 and 1"""
+        quantiles = np.atleast_1d(np.asarray(q, dtype=float))
+        if np.any((quantiles < 0) | (quantiles > 1)):
+            raise ValueError("Quantiles must be between 0 and 1")
+        if self.count == 0:
+            raise ValueError("Quantiles of an empty sketch are undefined")
+        negative_keys = sorted(self._negative, reverse=True)
+        positive_keys = sorted(self._positive)
+        values = np.concatenate(
+            [
+                -self._bucket_value(np.array(negative_keys)),
+                [0.0],
+                self._bucket_value(np.array(positive_keys)),
+            ]
+        )
+        counts = np.array(
+            [self._negative[key] for key in negative_keys]
+            + [self.zero_count]
+            + [self._positive[key] for key in positive_keys]
+        )
+        ranks = quantiles * (self.count - 1)
+        result = values[np.searchsorted(np.cumsum(counts), ranks, side="right")]
+        return float(result[0]) if np.ndim(q) == 0 else result
+
+    def _bucket(self, values: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(values) / math.log(self._gamma)).astype(np.int64)
+
+    def _bucket_value(self, keys: np.ndarray) -> np.ndarray:
+        return 2 * self._gamma ** keys.astype(float) / (self._gamma + 1)
+
+
+accumulator = Union[Moments, Histogram, QuantileSketch]
+
+
+def reduce_trials(
+    sources: Sequence[trial_source],
+    extract: Callable[["trial.Trial"], Dict[str, np.ndarray]],
+    accumulators: Dict[str, accumulator],
+    workers: int = None,
+    prefetch: int = 0,
+) -> Dict[str, accumulator]:
+    """Fold observations extracted from each trial into accumulators
+
+    Trials are loaded one at a time in each process and released once their
+    observations are added, so peak memory is about one trial per process
+    whatever the number of trials.
+
+    Parameters
+    ----------
+    sources
+        Trials given as Trial or TrialInfo instances, or as paths to Spike2
+        .mat files or saved (.pkl) trials
+    extract
+        Function of a trial returning observations keyed by accumulator name;
+        names may be left out for trials without the observation. With
+        `workers`, it must be a module-level function so it can be pickled.
+    accumulators
+        Empty (or partly filled) accumulators keyed by name; they are copied,
+        not modified
+    workers
+        Number of processes; defaults to processing trials in this process
+    prefetch
+        Number of trials each process reads ahead on a background thread
+        while the current trial is reduced (see
+        :func:`spike2py.pipeline.prefetch`); each holds one more trial in memory
+
+    Returns
+    -------
+    dict
+        Accumulators holding the observations of all trials, keyed by name
+    """
+    if workers and workers > 1 and len(sources) > 1:
+        chunks = _chunks(list(sources), workers * CHUNKS_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            partial_results = list(
+                executor.map(
+                    _reduce_chunk,
+                    chunks,
+                    [extract] * len(chunks),
+                    [accumulators] * len(chunks),
+                    [prefetch] * len(chunks),
+                )
+            )
+        result = copy.deepcopy(accumulators)
+        for partial_result in partial_results:
+            for name, partial in partial_result.items():
+                result[name].merge(partial)
+        return result
+    return _reduce_chunk(sources, extract, accumulators, prefetch)
+
+
+def epochs(
+    waveform: "channels.Waveform",
+    event_times: artefact_times,
+    pre: float,
+    post: float,
+) -> np.ndarray:
+    """`values` of a Waveform around each event, one row per event
+
+    Parameters
+    ----------
+    waveform
+        Waveform channel
+    event_times
+        Event channel (e.g. trial1.Stim) or array of times in seconds
+    pre, post
+        Seconds included before and after each event. Events too close to the
+        start or end of the recording for a full epoch are left out.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (n_events, n_samples)
+    """
+    event_times = np.asarray(getattr(event_times, "times", event_times), dtype=float)
+    sampling_frequency = waveform.info.sampling_frequency
+    n_pre = int(round(pre * sampling_frequency))
+    n_samples = n_pre + int(round(post * sampling_frequency)) + 1
+    onsets = np.searchsorted(waveform.times, event_times) - n_pre
+    onsets = onsets[(onsets >= 0) & (onsets + n_samples <= len(waveform.values))]
+    return waveform.values[onsets[:, np.newaxis] + np.arange(n_samples)]
+
+
+def _reduce_chunk(
+    sources: Sequence[trial_source],
+    extract: Callable[["trial.Trial"], Dict[str, np.ndarray]],
+    accumulators: Dict[str, accumulator],
+    prefetch: int = 0,
+) -> Dict[str, accumulator]:
+    accumulators = copy.deepcopy(accumulators)
+    trials = pipeline.prefetch(sources, depth=prefetch, load_channels=prefetch > 0)
+    for spike2py_trial in trials:
+        for name, observations in extract(spike2py_trial).items():
+            accumulators[name].update(observations)
+    return accumulators
+
+
+def _chunks(sources: List[trial_source], n_chunks: int) -> List[List[trial_source]]:
+    size = max(1, math.ceil(len(sources) / n_chunks))
+    starts = range(0, len(sources), size)
+    stops = range(size, len(sources) + size, size)
+    return [sources[start:stop] for start, stop in zip(starts, stops)]
+
+
+def _add_to_buckets(buckets: Dict[int, int], keys: np.ndarray) -> None:
+    for key, count in zip(*np.unique(keys, return_counts=True)):
+        buckets[int(key)] = buckets.get(int(key), 0) + int(count)
@@ -0,0 +1,226 @@
+"""Opt-in process-wide cache of channels read from data files
+
+When enabled, a channel read by any :class:`spike2py.trial.Trial` is kept
+and the same channel of the same file is not read again: other trials get
+channels backed by the same arrays. Arrays are shared read-only, which is safe
+because processing steps store their results in new arrays instead of
+modifying them in place.
+
+Channels are cached by resolved file path, modification time, size and
+channel name, so a modified file is read again. The most recently used
+channels are kept up to a byte budget; channels evicted from the budget stay
+available, through weak references, for as long as some trial still holds
+their arrays. For example::
+
+    spike2py.cache.enable(max_bytes=4_000_000_000)
+    trial1 = Trial(TrialInfo(file=file))
+    trial2 = Trial(TrialInfo(file=file))
+    trial1.Emg.values is trial2.Emg.values  # True
+"""
+
+import collections
+import threading
+import weakref
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, NamedTuple, Tuple
+
+import numpy as np
+
+from spike2py import read
+from spike2py.types import parsed_mat_data
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+cache_key = Tuple[str, int, int, str]
+
+_enabled = False
+_max_bytes = DEFAULT_MAX_BYTES
+_lock = threading.RLock()
+_recent: "collections.OrderedDict[cache_key, Dict]" = collections.OrderedDict()
+_recent_bytes = 0
+_weak: Dict[cache_key, "_WeakEntry"] = dict()
+_pending: Dict[cache_key, Future] = dict()
+_hits = 0
+_misses = 0
+
+
+class CacheInfo(NamedTuple):
+    """Cache statistics, as returned by :func:`info`
+
+    hits, misses
+        Channel reads served from the cache, and from data files
+    channels
+        Channels held within the byte budget
+    bytes
+        Bytes of arrays held within the byte budget
+    max_bytes
+        Byte budget
+    """
+
+    hits: int
+    misses: int
+    channels: int
+    bytes: int
+    max_bytes: int
+
+
+class _WeakEntry(NamedTuple):
+    fields: Dict
+    arrays: Dict[str, weakref.ref]
+
+
+def enable(max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+    """Cache channels read from data files until :func:`disable` is called
+
+    Parameters
+    ----------
+    max_bytes
+        Bytes of channel arrays kept while no trial uses them; least recently
+        used channels are released first
+    """
+    global _enabled, _max_bytes
+    with _lock:
+        _max_bytes = max_bytes
+        _enabled = True
+        _evict()
+
+
+def disable() -> None:
+    """Stop caching channels and release the cache"""
+    global _enabled
+    with _lock:
+        _enabled = False
+        clear()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def clear() -> None:
+    """Release all cached channels and reset the statistics"""
+    global _recent_bytes, _hits, _misses
+    with _lock:
+        _recent.clear()
+        _weak.clear()
+        _recent_bytes = _hits = _misses = 0
+
+
+def info() -> CacheInfo:
+    with _lock:
+        return CacheInfo(_hits, _misses, len(_recent), _recent_bytes, _max_bytes)
+
+
+def read_channel(file: Path, location: "read.ChannelLocation") -> parsed_mat_data:
+    """Channel data from the cache, or from :func:`spike2py.read.read_channel`
+
+    Arrays of cached channels are read-only; the returned dict itself is a
+    new dict that can be modified. While the cache is disabled, this is
+    :func:`spike2py.read.read_channel`.
+    """
+    if not _enabled:
+        return read.read_channel(file, location)
+    global _hits, _misses
+    key = _key(file, location)
+    with _lock:
+        value = _lookup(key)
+        if value is not None:
+            _hits += 1
+            return _copy(value)
+        pending = _pending.get(key)
+        if pending is None:
+            _misses += 1
+            pending = _pending[key] = Future()
+            reading = True
+        else:
+            _hits += 1
+            reading = False
+    if not reading:
+        return _copy(pending.result())
+    try:
+        value = read.read_channel(file, location)
+        for field in value.values():
+            if isinstance(field, np.ndarray):
+                field.setflags(write=False)
+        with _lock:
+            _store(key, value)
+        pending.set_result(value)
+    except BaseException as error:
+        pending.set_exception(error)
+        raise
+    finally:
+        with _lock:
+            del _pending[key]
+    return _copy(value)
+
+
+def _key(file: Path, location: "read.ChannelLocation") -> cache_key:
+    file = Path(file).resolve()
+    stat = file.stat()
+    return str(file), stat.st_mtime_ns, stat.st_size, location.name
+
+
+def _lookup(key: cache_key) -> Dict:
+    if key in _recent:
+        _recent.move_to_end(key)
+        return _recent[key]
+    entry = _weak.get(key)
+    if entry is None:
+        return None
+    arrays = {name: ref() for name, ref in entry.arrays.items()}
+    if any(array is None for array in arrays.values()):
+        return None
+    value = {**entry.fields, **arrays}
+    _store(key, value)
+    return value
+
+
+def _store(key: cache_key, value: Dict) -> None:
+    global _recent_bytes
+    arrays = {
+        name: field for name, field in value.items() if isinstance(field, np.ndarray)
+    }
+    fields = {name: field for name, field in value.items() if name not in arrays}
+    refs = {name: weakref.ref(array, _forget(key)) for name, array in arrays.items()}
+    _weak[key] = _WeakEntry(fields, refs)
+    n_bytes = sum(array.nbytes for array in arrays.values())
+    if key in _recent:
+        _recent_bytes -= _nbytes(_recent.pop(key))
+    if n_bytes <= _max_bytes:
+        _recent[key] = value
+        _recent_bytes += n_bytes
+        _evict()
+
+
+def _forget(key: cache_key):
+    """Weak reference callback removing the entry of `key` once an array is gone"""
+
+    # Bound now: callbacks can run at interpreter exit, after module globals are cleared
+    def callback(_, lock=_lock, weak=_weak) -> None:
+        with lock:
+            entry = weak.get(key)
+            if entry and any(ref() is None for ref in entry.arrays.values()):
+                del weak[key]
+
+    return callback
+
+
+def _evict() -> None:
+    global _recent_bytes
+    while _recent_bytes > _max_bytes:
+        _, value = _recent.popitem(last=False)
+        _recent_bytes -= _nbytes(value)
+
+
+def _nbytes(value: Dict) -> int:
+    return sum(
+        field.nbytes for field in value.values() if isinstance(field, np.ndarray)
+    )
+
+
+def _copy(value: Dict) -> parsed_mat_data:
+    return {
+        name: list(field) if isinstance(field, list) else field
+        for name, field in value.items()
+    }
@@ -0,0 +1,368 @@
+"""SQLite catalogue of the trials in a directory tree, queried without loading them
+
+Scanning reads only the channel headers of each .mat file (see
+:func:`spike2py.read.headers`). Rescans only read files that were added or
+changed since the last scan, so keeping a catalogue of thousands of trials up
+to date is cheap. For example::
+
+    catalogue = Catalogue("study.sqlite")
+    catalogue.scan("/data/study")
+    for trial in catalogue.trials(subject_id="sub01", channel="Soleus", min_duration=60):
+        trial.Soleus.plot()
+
+:func:`study_files` and :func:`trial_infos` list the trials of a study without
+a catalogue, as :func:`spike2py.recipe.run` and the `spike2py` command do.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Sequence, Union
+
+from spike2py import read, trial
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY,
+    file TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    subject_id TEXT,
+    name TEXT,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    trial_id INTEGER NOT NULL REFERENCES trials(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    ch_type TEXT NOT NULL,
+    units TEXT,
+    sampling_frequency INTEGER,
+    length INTEGER,
+    start_time REAL,
+    end_time REAL
+);
+CREATE INDEX IF NOT EXISTS trials_subject_id ON trials(subject_id);
+CREATE INDEX IF NOT EXISTS channels_trial_id ON channels(trial_id);
+CREATE INDEX IF NOT EXISTS channels_name ON channels(name COLLATE NOCASE);
+"""
+
+
+class ScanResult(NamedTuple):
+    """Files added, updated, removed, unchanged or that failed to be read by a scan"""
+
+    added: List[Path]
+    updated: List[Path]
+    removed: List[Path]
+    unchanged: List[Path]
+    failed: List[Path]
+
+
+class CatalogueEntry(NamedTuple):
+    """A catalogued trial; its data is only read when :meth:`trial` is used
+
+    file
+        Path of the .mat file
+    subject_id
+        Subject's study identifier
+    name
+        Trial name (the file name without extension)
+    duration
+        Seconds from the start of the earliest to the end of the latest channel
+    channels
+        Channel headers with channel names as `keys`
+    """
+
+    file: Path
+    subject_id: str
+    name: str
+    duration: float
+    channels: Dict[str, "read.ChannelHeader"]
+
+    def trial(self, **trial_info) -> "trial.Trial":
+        """Open the trial; its channels are read when first accessed
+
+        Parameters
+        ----------
+        trial_info
+            Other :class:`spike2py.trial.TrialInfo` fields, e.g. path_save_figures
+        """
+        return trial.Trial(
+            trial.TrialInfo(
+                file=self.file, name=self.name, subject_id=self.subject_id, **trial_info
+            )
+        )
+
+
+class Catalogue:
+    """Catalogue of trials stored in a SQLite database
+
+    Parameters
+    ----------
+    database
+        Path of the SQLite database file, created if needed;
+        ':memory:' keeps the catalogue in memory
+    """
+
+    def __init__(self, database: Union[Path, str]) -> None:
+        self.database = database
+        self._connection = sqlite3.connect(str(database))
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+
+    def __repr__(self) -> str:
+        n_trials = self._connection.execute("SELECT COUNT(*) FROM trials").fetchone()[0]
+        return f"Catalogue({str(self.database)!r}, {n_trials} trials)"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def scan(
+        self,
+        directory: Union[Path, str],
+        pattern: str = "**/*.mat",
+        subject_id: Callable[[Path], str] = None,
+    ) -> ScanResult:
+        """Add new and changed files under `directory`, and remove deleted ones
+
+        Files whose modification time and size are unchanged since the last
+        scan are not read again.
+
+        Parameters
+        ----------
+        directory
+            Root of the directory tree to scan
+        pattern
+            Glob pattern of data files, relative to `directory`
+        subject_id
+            Function returning the subject identifier of a file. Defaults to
+            the name of the first folder below `directory` (e.g. 'sub01' for
+            directory/sub01/session1/trial.mat), or 'sub' for files directly in
+            `directory`.
+        """
+        directory = Path(directory).absolute()
+        if subject_id is None:
+            subject_id = subject_from_folder(directory)
+        known = {
+            file: (trial_id, mtime_ns, size)
+            for trial_id, file, mtime_ns, size in self._connection.execute(
+                "SELECT id, file, mtime_ns, size FROM trials"
+            )
+            if Path(file).is_relative_to(directory)
+        }
+        result = ScanResult(list(), list(), list(), list(), list())
+        found = set()
+        with self._connection:
+            for file in sorted(directory.glob(pattern)):
+                found.add(str(file))
+                stat = file.stat()
+                trial_id, mtime_ns, size = known.get(str(file), (None, None, None))
+                if (mtime_ns, size) == (stat.st_mtime_ns, stat.st_size):
+                    result.unchanged.append(file)
+                    continue
+                try:
+                    channel_headers = read.headers(file)
+                except (read.WrongFileType, ValueError, KeyError, OSError):
+                    result.failed.append(file)
+                    continue
+                if trial_id is not None:
+                    self._connection.execute(
+                        "DELETE FROM trials WHERE id = ?", (trial_id,)
+                    )
+                self._insert(file, stat, subject_id(file), channel_headers)
+                (result.added if trial_id is None else result.updated).append(file)
+            for file, (trial_id, _, _) in known.items():
+                if file not in found:
+                    self._connection.execute(
+                        "DELETE FROM trials WHERE id = ?", (trial_id,)
+                    )
+                    result.removed.append(Path(file))
+        return result
+
+    def query(
+        self,
+        subject_id: str = None,
+        name: str = None,
+        channel: str = None,
+        ch_type: str = None,
+        min_duration: float = None,
+        max_duration: float = None,
+    ) -> List[CatalogueEntry]:
+        """Catalogued trials matching all the given criteria
+
+        Parameters
+        ----------
+        subject_id
+            Subject's study identifier
+        name
+            Trial name
+        channel
+            Name of a channel the trial must have (case-insensitive, so both
+            'Soleus' and 'soleus' match the channel attribute `Soleus`)
+        ch_type
+            Type of a channel the trial must have, e.g. 'wavemark'; combined
+            with `channel`, the type of that channel
+        min_duration, max_duration
+            Duration in seconds of the matching channel if `channel` or
+            `ch_type` is given, otherwise of the trial
+        """
+        conditions, parameters = list(), list()
+        for column, value in (("t.subject_id", subject_id), ("t.name", name)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        channel_conditions = list()
+        if channel is not None:
+            channel_conditions.append("c.name = ? COLLATE NOCASE")
+            parameters.append(channel)
+        if ch_type is not None:
+            channel_conditions.append("c.ch_type = ?")
+            parameters.append(ch_type)
+        duration = "(c.end_time - c.start_time)" if channel_conditions else "t.duration"
+        for operator, value in ((">=", min_duration), ("<=", max_duration)):
+            if value is not None:
+                (channel_conditions if channel_conditions else conditions).append(
+                    f"{duration} {operator} ?"
+                )
+                parameters.append(value)
+        if channel_conditions:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM channels c WHERE c.trial_id = t.id AND "
+                + " AND ".join(channel_conditions)
+                + ")"
+            )
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connection.execute(
+            f"SELECT t.id, t.file, t.subject_id, t.name, t.duration FROM trials t "
+            f"{where} ORDER BY t.file",
+            parameters,
+        ).fetchall()
+        channel_headers = {row[0]: dict() for row in rows}
+        for trial_id, *header in self._connection.execute(
+            "SELECT c.trial_id, c.name, c.ch_type, c.units, c.sampling_frequency, "
+            "c.length, c.start_time, c.end_time "
+            f"FROM trials t JOIN channels c ON c.trial_id = t.id {where} "
+            "ORDER BY c.rowid",
+            parameters,
+        ):
+            channel_headers[trial_id][header[0]] = read.ChannelHeader(*header)
+        return [
+            CatalogueEntry(
+                Path(file), subject, trial_name, duration, channel_headers[trial_id]
+            )
+            for trial_id, file, subject, trial_name, duration in rows
+        ]
+
+    def trials(self, **criteria) -> Iterator["trial.Trial"]:
+        """Open the trials matching `criteria` (see :meth:`query`) one at a time
+
+        Only the index of each file is read when its trial is opened; channels
+        are read when first accessed.
+        """
+        for entry in self.query(**criteria):
+            yield entry.trial()
+
+    def _insert(
+        self,
+        file: Path,
+        stat,
+        subject_id: str,
+        channel_headers: Dict[str, "read.ChannelHeader"],
+    ) -> None:
+        starts = [header.start for header in channel_headers.values()]
+        ends = [header.end for header in channel_headers.values()]
+        duration = (max(ends) - min(starts)) if channel_headers else 0.0
+        trial_id = self._connection.execute(
+            "INSERT INTO trials (file, mtime_ns, size, subject_id, name, duration) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                str(file),
+                stat.st_mtime_ns,
+                stat.st_size,
+                subject_id,
+                file.stem,
+                duration,
+            ),
+        ).lastrowid
+        self._connection.executemany(
+            "INSERT INTO channels VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(trial_id, *header) for header in channel_headers.values()],
+        )
+
+
+study_source = Union[Path, str, Catalogue, Sequence[Union[Path, str]]]
+
+
+def study_files(sources: Union[Path, str, Sequence[Union[Path, str]]]) -> List[Path]:
+    """.mat files of a study directory (in all its subfolders), or of several sources
+
+    Directories are searched in sorted order; files are returned as given.
+    """
+    if isinstance(sources, (Path, str)):
+        sources = [sources]
+    files = list()
+    for source in map(Path, sources):
+        if source.is_dir():
+            files.extend(sorted(source.absolute().glob("**/*.mat")))
+        else:
+            files.append(source)
+    return files
+
+
+def trial_infos(
+    sources: study_source, output_directory: Union[Path, str] = None
+) -> List["trial.TrialInfo"]:
+    """TrialInfo of each trial of a study, with its subject identifier
+
+    Parameters
+    ----------
+    sources
+        Catalogue (all its trials), study directory (searched for .mat files
+        in all subfolders; see :func:`subject_from_folder`), or list of .mat
+        files and study directories. Files given directly have no subject
+        identifier.
+    output_directory
+        Directory where outputs are written, in a folder per subject
+        (<output_directory>/<subject_id>/data and .../figures); defaults to
+        the 'data' and 'figures' folders next to each .mat file
+    """
+    if isinstance(sources, Catalogue):
+        entries = [(entry.file, entry.subject_id) for entry in sources.query()]
+    else:
+        if isinstance(sources, (Path, str)):
+            sources = [sources]
+        entries = list()
+        for source in map(Path, sources):
+            if not source.is_dir():
+                entries.append((source, None))
+                continue
+            subject_id = subject_from_folder(source.absolute())
+            entries.extend((file, subject_id(file)) for file in study_files(source))
+    infos = list()
+    for file, subject_id in entries:
+        info = trial.TrialInfo(file=Path(file), subject_id=subject_id)
+        if output_directory is not None:
+            subject_directory = Path(output_directory) / (subject_id or "sub")
+            info.path_save_trial = subject_directory / "data"
+            info.path_save_figures = subject_directory / "figures"
+        infos.append(info)
+    return infos
+
+
+def subject_from_folder(directory: Path) -> Callable[[Path], str]:
+    """Function returning the subject identifier of files under `directory`
+
+    The identifier is the name of the first folder below `directory` (e.g.
+    'sub01' for directory/sub01/session1/trial.mat), or 'sub' for files
+    directly in `directory`.
+    """
+
+    def subject_id(file: Path) -> str:
+        parts = file.relative_to(directory).parts
+        return parts[0] if len(parts) > 1 else "sub"
+
+    return subject_id
@@ -1,11 +1,19 @@
+import copy
+import math
 from pathlib import Path
-from typing import NamedTuple, Literal
+from typing import TYPE_CHECKING, List, NamedTuple, Literal, Tuple
 
 import numpy as np
 
-import spike2py.plot as plot
+import spike2py.memory as memory
+import spike2py.profiling as profiling
+import spike2py.pyramid as pyramid
+import spike2py.segments as segments
 import spike2py.sig_proc as sig_proc
 
+if TYPE_CHECKING:
+    import spike2py.shared as shared
+
 from spike2py.types import (
     parsed_wavemark,
     parsed_waveform,
@@ -14,6 +22,9 @@ from spike2py.types import (
     parsed_keyboard,
 )
 
+# Waveform arrays with one value per sample, besides the `proc_*` values
+SAMPLE_ATTRIBUTES = ("times", "values", "raw_values", "times_pre_interp")
+
 
 class ChannelInfo(NamedTuple):
     """Information about channel
@@ -49,12 +60,71 @@ class Channel:
              str indentifier
      times
          Sample times in seconds
+
+    Attributes
+    ----------
+    profile
+        :class:`spike2py.profiling.Profile` of the trial the channel was read
+        from, which records the channel's processing and plotting stages
+        while profiling is enabled; None for channels created directly
     """
 
+    profile: "profiling.Profile" = None
+
     def __init__(self, channel_info: ChannelInfo, times: np.ndarray) -> None:
         self.info = channel_info
         self.times = times
 
+    def window(self, start: float, end: float):
+        """Restrict channel to the time range `start` <= time <= `end`
+
+        No data is copied: the returned channel's arrays are NumPy views of
+        this channel's arrays. Processing the returned channel replaces its
+        arrays rather than modifying them in place, so this channel is never
+        changed.
+
+        Parameters
+        ----------
+        start
+            Start time in seconds
+        end
+            End time in seconds
+
+        Returns
+        -------
+        Channel
+            New channel of the same type covering the requested time range
+        """
+        if end < start:
+            raise ValueError("Window end time must not be before start time")
+        first, last = self._window_indices(start, end)
+        windowed = copy.copy(self)
+        windowed._slice(first, last)
+        return windowed
+
+    def _window_indices(self, start: float, end: float) -> Tuple[int, int]:
+        return _searchsorted_window(self.times, start, end)
+
+    def memory_usage(self) -> "memory.MemoryUsage":
+        """Bytes of memory held by each array attribute (`values`, `proc_*`, ...)
+
+        Attributes sharing memory (e.g. `raw_values` and `values` before any
+        processing) are counted once; see :class:`spike2py.memory.MemoryUsage`.
+        """
+        return memory.memory_usage({"": self})
+
+    def share(self, min_bytes: int = None) -> "shared.SharedObject":
+        """Copy the channel's arrays to shared memory and return a picklable descriptor
+
+        See :func:`spike2py.shared.share`.
+        """
+        from spike2py import shared
+
+        return shared.share(self, min_bytes)
+
+    def _slice(self, first: int, last: int) -> None:
+        self.times = self.times[first:last]
+
 
 class Event(Channel):
     """Event channel class
@@ -94,6 +164,8 @@ class Event(Channel):
         save
             Set to `True` to save Event figure to `path_save_figures`
         """
+        from spike2py import plot
+
         plot.plot_channel(self, save=save)
         return self
 
@@ -130,6 +202,11 @@ class Keyboard(Channel):
     def __repr__(self) -> str:
         return "Keyboard channel"
 
+    def _slice(self, first: int, last: int) -> None:
+        super()._slice(first, last)
+        if self.codes is not None:
+            self.codes = self.codes[first:last]
+
     def plot(self, save: Literal[True, False] = False) -> None:
         """Save Keyboard channel figure
 
@@ -139,6 +216,8 @@ class Keyboard(Channel):
             Set to `True` to save Keyboard figure to `path_save_figures`
         """
 
+        from spike2py import plot
+
         plot.plot_channel(self, save=save)
         return self
 
@@ -175,6 +254,10 @@ class Textmark(Channel):
     def __repr__(self) -> str:
         return "Textmark channel"
 
+    def _slice(self, first: int, last: int) -> None:
+        super()._slice(first, last)
+        self.codes = self.codes[first:last]
+
     def plot(self, save: Literal[True, False] = False) -> None:
         """Save Textmark channel figure
 
@@ -184,6 +267,8 @@ class Textmark(Channel):
             Set to `True` to save Textmark figure to `path_save_figures`
         """
 
+        from spike2py import plot
+
         plot.plot_channel(self, save=save)
         return self
 
@@ -225,6 +310,114 @@ class Waveform(Channel, sig_proc.SignalProcessing):
     def __repr__(self) -> str:
         return "Waveform channel"
 
+    def _window_indices(self, start: float, end: float) -> Tuple[int, int]:
+        """Sample indices computed from the start time and sampling frequency
+
+        Channels whose `times` do not match `sampling_frequency` (e.g. after
+        interpolation) have their indices looked up in `times` instead. Open
+        windows (`start` or `end` infinite) are first limited to one sample
+        beyond the recording.
+        """
+        n_samples = len(self.times)
+        sampling_frequency = self.info.sampling_frequency
+        if (n_samples < 2) or (sampling_frequency is None):
+            return super()._window_indices(start, end)
+        expected_duration = (n_samples - 1) / sampling_frequency
+        if not math.isclose(
+            self.times[-1] - self.times[0],
+            expected_duration,
+            abs_tol=0.5 / sampling_frequency,
+        ):
+            return super()._window_indices(start, end)
+        lowest = self.times[0] - 1 / sampling_frequency
+        highest = self.times[-1] + 1 / sampling_frequency
+        start = min(max(start, lowest), highest)
+        end = min(max(end, lowest), highest)
+        first = math.ceil((start - self.times[0]) * sampling_frequency - 1e-6)
+        last = math.floor((end - self.times[0]) * sampling_frequency + 1e-6) + 1
+        return min(max(first, 0), n_samples), min(max(last, 0), n_samples)
+
+    def _slice(self, first: int, last: int) -> None:
+        # Later processing starts from the windowed values
+        self.recipe = ()
+        self._fingerprint = None
+        self._step = None
+        # The pyramid summarises the whole recording, not the window
+        vars(self).pop("_pyramid", None)
+        vars(self).pop("_pyramid_values", None)
+        n_samples = len(self.times)
+        times_pre_interp = getattr(self, "times_pre_interp", None)
+        if times_pre_interp is not None:
+            if last > first:
+                start, end = self.times[first], self.times[last - 1]
+            else:
+                start, end = np.inf, -np.inf
+            pre_first, pre_last = _searchsorted_window(times_pre_interp, start, end)
+        for name in self._sample_attributes():
+            value = getattr(self, name)
+            if (len(value) == n_samples) and (name != "times_pre_interp"):
+                setattr(self, name, value[first:last])
+            elif (times_pre_interp is not None) and (
+                len(value) == len(times_pre_interp)
+            ):
+                setattr(self, name, value[pre_first:pre_last])
+
+    def _sample_attributes(self) -> List[str]:
+        """Names of the arrays holding one value per sample
+
+        `times`, `values`, `raw_values`, `times_pre_interp` and the `proc_*`
+        values of each processing step; those preceding an interpolation have
+        one value per sample of `times_pre_interp`.
+        """
+        return [
+            name
+            for name, value in vars(self).items()
+            if (name in SAMPLE_ATTRIBUTES or name.startswith("proc_"))
+            and isinstance(value, (np.ndarray, segments.SegmentedArray))
+        ]
+
+    @property
+    def summary_pyramid(self) -> "pyramid.SummaryPyramid":
+        """Summary pyramid of the current `values`, or None if there is none
+
+        A pyramid built before `values` were processed or windowed is stale
+        and is not returned.
+        """
+        if getattr(self, "_pyramid_values", None) is not self.values:
+            return None
+        return self._pyramid
+
+    @profiling.stage("channels.build_pyramid")
+    def build_pyramid(self, base_block: int = pyramid.DEFAULT_BASE_BLOCK):
+        """Precompute min/max/mean/RMS of `values` at power-of-two resolutions
+
+        The pyramid is kept with the channel (and saved with the trial) and is
+        used by :meth:`windowed_stats` and by plots of the whole channel.
+        """
+        self._pyramid = pyramid.SummaryPyramid(
+            self.values, self.times[0], self.info.sampling_frequency, base_block
+        )
+        self._pyramid_values = self.values
+        return self
+
+    def windowed_stats(self, window: float) -> "pyramid.WindowedStats":
+        """Min, max, mean and RMS of `values` in consecutive windows
+
+        Answered from the summary pyramid when one is current; otherwise
+        `values` are scanned once.
+
+        Parameters
+        ----------
+        window
+            Window length in seconds, e.g. 1 for per-second statistics
+        """
+        summary = self.summary_pyramid
+        if summary is None:
+            summary = pyramid.SummaryPyramid(
+                self.values, self.times[0], self.info.sampling_frequency
+            )
+        return summary.windowed_stats(window, self.values)
+
     def plot(self, save: Literal[True, False] = None) -> None:
         """Save Waveform channel figure
 
@@ -233,6 +426,8 @@ class Waveform(Channel, sig_proc.SignalProcessing):
         save
             Set to `True` to save Waveform figure to `path_save_figures`
         """
+        from spike2py import plot
+
         plot.plot_channel(self, save=save)
         return self
 
@@ -253,6 +448,7 @@ class Wavemark(Channel):
         - ['times']: np.ndarray - Wavemark times in seconds
         - ['values']: np.ndarray - Waveform float values
         - ['action_potentials']: list of lists - Each list is a Wavemark
+        - ['codes']: np.ndarray of int - Unit assigned to each Wavemark (optional)
         - ['units']: str - Measurement units (e.g. 'Volts')
         - ['sampling_frequency']: int - Sampling frequency of Wavemark
     """
@@ -270,11 +466,26 @@ class Wavemark(Channel):
             data_dict["times"],
         )
         self.action_potentials = data_dict["action_potentials"]
+        self.codes = data_dict.get("codes")
         self._calc_instantaneous_firing_frequency()
 
     def __repr__(self) -> str:
         return "Wavemark channel"
 
+    def _slice(self, first: int, last: int) -> None:
+        n_spikes = len(self.times)
+        super()._slice(first, last)
+        if self.action_potentials is not None:
+            self.action_potentials = _slice_spikes(
+                self.action_potentials, n_spikes, first, last
+            )
+        if getattr(self, "codes", None) is not None:
+            self.codes = self.codes[first:last]
+        self.inst_firing_frequency = self.inst_firing_frequency[first:][
+            : max(last - first - 1, 0)
+        ]
+
+    @profiling.stage("channels.firing_frequency")
     def _calc_instantaneous_firing_frequency(self):
         time1: float = self.times[0]
         inst_firing_frequency = list()
@@ -291,5 +502,29 @@ class Wavemark(Channel):
         save
             Set to `True` to save Wavemark figure to `path_save_figures`
         """
+        from spike2py import plot
+
         plot.plot_channel(self, save=save)
         return self
+
+
+def _searchsorted_window(
+    times: np.ndarray, start: float, end: float
+) -> Tuple[int, int]:
+    return (
+        int(np.searchsorted(times, start, side="left")),
+        int(np.searchsorted(times, end, side="right")),
+    )
+
+
+def _slice_spikes(action_potentials, n_spikes: int, first: int, last: int):
+    """Slice action potentials, stored one per row or one per column"""
+    if _spikes_in_columns(action_potentials, n_spikes):
+        return np.asarray(action_potentials)[:, first:last]
+    return action_potentials[first:last]
+
+
+def _spikes_in_columns(action_potentials, n_spikes: int) -> bool:
+    return (len(action_potentials) != n_spikes) and (
+        np.shape(action_potentials)[-1] == n_spikes
+    )
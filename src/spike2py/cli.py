@@ -0,0 +1,417 @@
+"""The `spike2py` command: convert, inspect, plot and process Spike2 .mat files
+
+Sources are .mat files or study directories, searched for .mat files in all
+subfolders; with `--output`, results are written in a folder per subject
+(<output>/<subject_id>/data and .../figures), the subject being the first
+subfolder of the study directory. `plot` also accepts trials saved as .pkl
+files. For example::
+
+    spike2py info /data/study/sub01/trial1.mat
+    spike2py convert /data/study --output /data/converted --workers 8
+    spike2py convert trial1.mat --channels EMG1 Stim --start 10 --end 70 --format npz
+    spike2py plot /data/study --format pdf --rasterize --channels EMG1 --workers 8
+    spike2py process recipe.yaml /data/study --output /data/processed --workers 8
+
+`convert`, `plot` and `process` can be stopped and started again: trials whose
+outputs are already up to date are skipped, unless `--force` is given.
+"""
+
+import argparse
+import functools
+import json
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Literal, NamedTuple, Sequence
+
+import numpy as np
+
+from spike2py import catalogue, channels, read, recipe, trial
+
+if TYPE_CHECKING:
+    from spike2py import export
+
+NPZ_FIELDS = ("times", "values", "codes")
+STAMP_SUFFIX = ".convert.json"
+PLOT_STAMP_SUFFIX = ".plot.json"
+
+
+class ConvertOptions(NamedTuple):
+    """How :func:`convert` writes each trial
+
+    file_format
+        'pkl' saves the Trial (see :meth:`spike2py.trial.Trial.save`), to be
+        opened with :func:`spike2py.trial.load`; 'npz' saves the `times`,
+        `values` and `codes` of each channel as '<channel>.<field>' arrays,
+        with its '<channel>.sampling_frequency', readable without spike2py;
+        Wavemark `codes` are unit assignments, and their
+        '<channel>.action_potentials' hold one action potential per row
+    start, end
+        Time window in seconds; defaults to the whole trial
+    force
+        Convert trials even when their output is up to date
+    """
+
+    file_format: Literal["pkl", "npz"] = "pkl"
+    start: float = None
+    end: float = None
+    force: bool = False
+
+
+def convert(
+    sources: Sequence[Path],
+    output_directory: Path = None,
+    channels: Sequence[str] = None,
+    options: ConvertOptions = None,
+    workers: int = None,
+    progress: Callable[["recipe.TrialReport"], None] = None,
+) -> "recipe.RunReport":
+    """Convert .mat files to saved trials (.pkl) or NumPy archives (.npz)
+
+    Outputs are written to a temporary file first and renamed once complete,
+    so an interrupted conversion leaves no partial file and is resumed by
+    running it again. A trial is skipped when its .mat file and the
+    conversion settings are unchanged since its output was written, as
+    recorded in a '<output>.convert.json' file next to it.
+
+    Parameters
+    ----------
+    sources
+        .mat files, or study directories searched for .mat files
+    output_directory
+        Directory of the subject folders outputs are written in; defaults to
+        the 'data' folder next to each .mat file
+    channels
+        Channel names, as they appeared in the original .smr file; defaults
+        to all channels
+    options
+        Output format, time window and whether to overwrite up-to-date
+        outputs; defaults to ConvertOptions()
+    workers
+        Number of processes; defaults to converting in this process
+    progress
+        Function called with the report of each trial once it is converted
+
+    Returns
+    -------
+    spike2py.recipe.RunReport
+        Status and duration of each trial, in the order of `sources`
+    """
+    infos = catalogue.trial_infos(sources, output_directory)
+    for info in infos:
+        info.channels = list(channels) if channels else None
+    task = functools.partial(_convert_trial, options=options or ConvertOptions())
+    return recipe.map_trials(task, infos, workers, progress)
+
+
+def main(argv: Sequence[str] = None) -> int:
+    """Run the `spike2py` command; returns 1 if any trial failed, else 0"""
+    args = _parser().parse_args(argv)
+    if args.command is None:
+        _parser().print_help()
+        return 2
+    return args.run(args)
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="spike2py",
+        description="Convert, inspect, plot and process Spike2 .mat files",
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    info = subparsers.add_parser("info", help="list the channels of .mat files")
+    info.add_argument("sources", nargs="+", type=Path, help=".mat files or directories")
+    info.add_argument("--channels", nargs="+", help="channels to list")
+    info.set_defaults(run=_info)
+
+    convert_parser = subparsers.add_parser(
+        "convert", help="convert .mat files to saved trials (.pkl) or .npz archives"
+    )
+    _add_common_arguments(convert_parser)
+    convert_parser.add_argument(
+        "--format", choices=["pkl", "npz"], default="pkl", dest="file_format"
+    )
+    _add_window_arguments(convert_parser)
+    convert_parser.add_argument(
+        "--force", action="store_true", help="also convert up-to-date trials"
+    )
+    convert_parser.set_defaults(run=_convert)
+
+    plot = subparsers.add_parser(
+        "plot", help="save trial and channel figures of .mat or saved .pkl trials"
+    )
+    _add_common_arguments(plot)
+    plot.add_argument(
+        "--format", choices=["png", "pdf"], default="png", dest="file_format"
+    )
+    _add_window_arguments(plot)
+    plot.add_argument(
+        "--no-trial", action="store_true", help="skip whole-trial figures"
+    )
+    plot.add_argument("--no-channels", action="store_true", help="skip channel figures")
+    plot.add_argument(
+        "--rasterize", action="store_true", help="rasterise lines in PDFs"
+    )
+    plot.add_argument("--dpi", type=float, help="resolution of PNGs and rasters")
+    plot.add_argument(
+        "--force", action="store_true", help="also plot up-to-date trials"
+    )
+    plot.set_defaults(run=_plot)
+
+    process = subparsers.add_parser(
+        "process", help="apply a JSON or YAML processing recipe"
+    )
+    process.add_argument("recipe", type=Path, help="recipe file (.json, .yaml)")
+    process.add_argument(
+        "sources", nargs="+", type=Path, help=".mat files or directories"
+    )
+    process.add_argument(
+        "--output", type=Path, help="directory where outputs are written"
+    )
+    process.add_argument("--workers", type=int, help="number of processes")
+    process.add_argument(
+        "--force", action="store_true", help="also process up-to-date trials"
+    )
+    process.set_defaults(run=_process)
+    return parser
+
+
+def _add_common_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "sources", nargs="+", type=Path, help=".mat files or directories"
+    )
+    parser.add_argument(
+        "--output", type=Path, help="directory where outputs are written"
+    )
+    parser.add_argument("--channels", nargs="+", help="channels, as named in Spike2")
+    parser.add_argument("--workers", type=int, help="number of processes")
+
+
+def _add_window_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--start", type=float, help="start of time window in seconds")
+    parser.add_argument("--end", type=float, help="end of time window in seconds")
+
+
+def _info(args: argparse.Namespace) -> int:
+    status = 0
+    for file in catalogue.study_files(args.sources):
+        try:
+            headers = read.headers(file, args.channels)
+        except (Exception, SystemExit) as error:
+            print(f"{file}: {type(error).__name__}: {error}", file=sys.stderr)
+            status = 1
+            continue
+        print(file)
+        print(
+            f"  {'channel':<20}{'type':<10}{'units':<8}{'Hz':>8}"
+            f"{'samples':>10}{'start':>10}{'end':>10}"
+        )
+        for header in headers.values():
+            print(
+                f"  {header.name:<20}{header.ch_type:<10}{header.units or '':<8}"
+                f"{header.sampling_frequency or '':>8}{header.length:>10}"
+                f"{header.start:>10.3f}{header.end:>10.3f}"
+            )
+    return status
+
+
+def _convert(args: argparse.Namespace) -> int:
+    options = ConvertOptions(args.file_format, args.start, args.end, args.force)
+    report = convert(
+        args.sources,
+        output_directory=args.output,
+        channels=args.channels,
+        options=options,
+        workers=args.workers,
+        progress=_progress_printer(),
+    )
+    return _summary(report)
+
+
+def _plot(args: argparse.Namespace) -> int:
+    from spike2py import export
+
+    options = export.ExportOptions(
+        file_format=args.file_format,
+        channel_names=(
+            [name.title() for name in args.channels] if args.channels else None
+        ),
+        include_trial=not args.no_trial,
+        include_channels=not args.no_channels,
+        rasterize=args.rasterize,
+        dpi=args.dpi or "figure",
+    )
+    task = functools.partial(
+        _plot_trial, options=options, start=args.start, end=args.end, force=args.force
+    )
+    infos = catalogue.trial_infos(args.sources, args.output)
+    report = recipe.map_trials(task, infos, args.workers, _progress_printer())
+    return _summary(report)
+
+
+def _process(args: argparse.Namespace) -> int:
+    task = functools.partial(
+        recipe.run_trial, recipe.read_recipe(args.recipe), force=args.force
+    )
+    infos = catalogue.trial_infos(args.sources, args.output)
+    report = recipe.map_trials(task, infos, args.workers, _progress_printer())
+    return _summary(report)
+
+
+def _convert_trial(
+    info: "trial.TrialInfo", options: ConvertOptions
+) -> "recipe.TrialReport":
+    start = time.perf_counter()
+    file = Path(info.file)
+    try:
+        output = _output_file(info, options.file_format)
+        stamp_file = output.with_name(f"{output.name}{STAMP_SUFFIX}")
+        stamp = _stamp(
+            file,
+            file_format=options.file_format,
+            start=options.start,
+            end=options.end,
+            channels=info.channels,
+        )
+        if not options.force and _up_to_date(stamp_file, stamp):
+            return recipe.TrialReport(file, "skipped", time.perf_counter() - start)
+        spike2py_trial = trial.Trial(info)
+        spike2py_trial.load_channels()
+        spike2py_trial = _window(spike2py_trial, options.start, options.end)
+        if options.file_format == "npz":
+            _save_npz(spike2py_trial, output)
+        else:
+            spike2py_trial.save()
+        _write_stamp(stamp_file, stamp, [output])
+    except (Exception, SystemExit) as error:
+        message = f"{type(error).__name__}: {error}"
+        return recipe.TrialReport(file, "failed", time.perf_counter() - start, message)
+    return recipe.TrialReport(file, "done", time.perf_counter() - start)
+
+
+def _plot_trial(
+    info: "trial.TrialInfo",
+    options: "export.ExportOptions",
+    start: float,
+    end: float,
+    force: bool,
+) -> "recipe.TrialReport":
+    from spike2py import export
+
+    started = time.perf_counter()
+    file = Path(info.file)
+    try:
+        stamp_file = _output_file(info, f"{options.file_format}{PLOT_STAMP_SUFFIX}")
+        stamp = _stamp(file, start=start, end=end, **options._asdict())
+        if not force and _up_to_date(stamp_file, stamp):
+            return recipe.TrialReport(file, "skipped", time.perf_counter() - started)
+        if file.suffix == ".pkl":
+            spike2py_trial = trial.load(file)
+            if info.path_save_figures is not None:
+                spike2py_trial.info.path_save_figures = info.path_save_figures
+        else:
+            spike2py_trial = trial.Trial(info)
+        spike2py_trial = _window(spike2py_trial, start, end)
+        saved = export.export_trial(spike2py_trial, options)
+        _write_stamp(stamp_file, stamp, saved)
+    except (Exception, SystemExit) as error:
+        message = f"{type(error).__name__}: {error}"
+        return recipe.TrialReport(
+            file, "failed", time.perf_counter() - started, message
+        )
+    return recipe.TrialReport(file, "done", time.perf_counter() - started)
+
+
+def _window(spike2py_trial: "trial.Trial", start: float, end: float) -> "trial.Trial":
+    if start is None and end is None:
+        return spike2py_trial
+    start = -np.inf if start is None else start
+    end = np.inf if end is None else end
+    return spike2py_trial.window(start, end)
+
+
+def _output_file(info: "trial.TrialInfo", file_format: str) -> Path:
+    file = Path(info.file)
+    path_save_trial = Path(info.path_save_trial or file.parent / "data")
+    return path_save_trial / f"{info.name or file.stem}.{file_format}"
+
+
+def _stamp(file: Path, **settings) -> Dict:
+    """Settings of an output and the size and modification time of its .mat file"""
+    stat = file.stat()
+    return {
+        **settings,
+        "file": str(file.absolute()),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+
+
+def _write_stamp(stamp_file: Path, stamp: Dict, outputs: Sequence[Path]) -> None:
+    stamp_file.parent.mkdir(parents=True, exist_ok=True)
+    stamp_file.write_text(
+        json.dumps(dict(stamp, outputs=[str(output) for output in outputs]))
+    )
+
+
+def _up_to_date(stamp_file: Path, stamp: Dict) -> bool:
+    """Whether the outputs listed in `stamp_file` exist and were made with `stamp`"""
+    try:
+        previous = json.loads(stamp_file.read_text())
+    except (OSError, ValueError):
+        return False
+    outputs = previous.pop("outputs", None)
+    return (
+        outputs is not None
+        and previous == json.loads(json.dumps(stamp))
+        and all(Path(output).exists() for output in outputs)
+    )
+
+
+def _save_npz(spike2py_trial: "trial.Trial", output: Path) -> None:
+    arrays = dict()
+    for name, _ in spike2py_trial.channels:
+        channel = getattr(spike2py_trial, name)
+        for field in NPZ_FIELDS:
+            if getattr(channel, field, None) is not None:
+                arrays[f"{name}.{field}"] = np.asarray(getattr(channel, field))
+        if getattr(channel, "action_potentials", None) is not None:
+            arrays[f"{name}.action_potentials"] = _spikes_in_rows(channel)
+        if getattr(channel.info, "sampling_frequency", None) is not None:
+            arrays[f"{name}.sampling_frequency"] = np.asarray(
+                channel.info.sampling_frequency
+            )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    temporary = output.with_name(f"{output.stem}.tmp.npz")
+    np.savez(temporary, **arrays)
+    temporary.replace(output)
+
+
+def _spikes_in_rows(wavemark: "channels.Wavemark") -> np.ndarray:
+    action_potentials = np.asarray(wavemark.action_potentials)
+    if channels._spikes_in_columns(action_potentials, len(wavemark.times)):
+        return action_potentials.T
+    return action_potentials
+
+
+def _progress_printer() -> Callable[["recipe.TrialReport"], None]:
+    count = 0
+
+    def print_progress(report: "recipe.TrialReport") -> None:
+        nonlocal count
+        count += 1
+        error = f" ({report.error})" if report.error else ""
+        print(
+            f"[{count}] {report.file}: {report.status} in {report.seconds:.2f} s{error}"
+        )
+
+    return print_progress
+
+
+def _summary(report: "recipe.RunReport") -> int:
+    print(
+        f"{report.count('done')} done, {report.count('skipped')} skipped, "
+        f"{report.count('failed')} failed"
+    )
+    return 1 if report.count("failed") else 0
@@ -0,0 +1,175 @@
+from typing import Literal, Tuple
+
+import numpy as np
+
+from spike2py import channels
+
+DEFAULT_CHUNK_SIZE = 10_000_000
+
+
+def threshold(
+    waveform: "channels.Waveform",
+    high: float,
+    low: float = None,
+    edge: Literal["rising", "falling"] = "rising",
+    min_duration: float = 0,
+    min_gap: float = 0,
+    name: str = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> "channels.Event":
+    """Detect threshold crossings of a Waveform and return them as an Event channel
+
+    A sample switches the detector on when it exceeds `high` and off when it
+    falls below `low` (hysteresis). The signal is considered to be off before
+    its first sample. Detection is vectorised and processed in chunks of
+    `chunk_size` samples, carrying the detector state across chunks.
+
+    Parameters
+    ----------
+    waveform
+        Waveform channel to detect crossings in
+    high
+        Value that must be exceeded to switch the detector on
+    low
+        Value the signal must fall below to switch the detector off;
+        defaults to `high` (no hysteresis)
+    edge
+        'rising' returns the times the detector switched on (e.g. burst or
+        torque onsets, TTL rising edges), 'falling' the times it switched off
+    min_duration
+        Periods on for less than `min_duration` seconds are discarded
+    min_gap
+        Refractory gap in seconds; periods separated by less than `min_gap`
+        are merged into one
+    name
+        Name of the new Event channel; defaults to '<waveform name>_<edge>'
+    chunk_size
+        Number of samples processed at a time
+
+    Returns
+    -------
+    channels.Event
+        Event channel that can be added to a trial with `Trial.add_channel`
+    """
+    if edge not in ("rising", "falling"):
+        raise ValueError("edge must be 'rising' or 'falling'")
+    onsets, offsets = _on_periods(
+        waveform, high, low, min_duration, min_gap, chunk_size
+    )
+    indices = onsets if edge == "rising" else offsets[offsets < len(waveform.times)]
+    if name is None:
+        name = f"{waveform.info.name}_{edge}"
+    return _event_from_times(waveform, name, waveform.times[indices])
+
+
+def bursts(
+    waveform: "channels.Waveform",
+    high: float,
+    low: float = None,
+    min_duration: float = 0,
+    min_gap: float = 0,
+    name: str = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Tuple["channels.Event", "channels.Event"]:
+    """Detect bursts of activity and return their onsets and offsets
+
+    Uses the same hysteresis detector as :func:`threshold`. A burst still
+    active at the end of the recording ends at the last sample.
+
+    Returns
+    -------
+    Tuple[channels.Event, channels.Event]
+        Onset and offset Event channels, named '<name>_onsets' and '<name>_offsets';
+        `name` defaults to the waveform name.
+    """
+    onsets, offsets = _on_periods(
+        waveform, high, low, min_duration, min_gap, chunk_size
+    )
+    offsets = np.minimum(offsets, len(waveform.times) - 1)
+    if name is None:
+        name = waveform.info.name
+    return (
+        _event_from_times(waveform, f"{name}_onsets", waveform.times[onsets]),
+        _event_from_times(waveform, f"{name}_offsets", waveform.times[offsets]),
+    )
+
+
+def _on_periods(
+    waveform: "channels.Waveform",
+    high: float,
+    low: float,
+    min_duration: float,
+    min_gap: float,
+    chunk_size: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Sample indices where the detector switches on and off
+
+    Offsets are the index of the first sample after each period; a period still
+    on at the end of the recording has an offset equal to the number of samples.
+    """
+    low = high if low is None else low
+    if low > high:
+        raise ValueError("low must be less than or equal to high")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive whole number")
+    values = waveform.values
+    onsets, offsets = list(), list()
+    state = False
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:][:chunk_size]
+        chunk_onsets, chunk_offsets, state = _transitions(chunk, high, low, state)
+        onsets.append(chunk_onsets + start)
+        offsets.append(chunk_offsets + start)
+    onsets = np.concatenate(onsets or [np.array([], dtype=int)])
+    offsets = np.concatenate(offsets or [np.array([], dtype=int)])
+    if state:
+        offsets = np.append(offsets, len(values))
+    sampling_frequency = waveform.info.sampling_frequency
+    onsets, offsets = _merge_short_gaps(onsets, offsets, min_gap * sampling_frequency)
+    return _drop_short_periods(onsets, offsets, min_duration * sampling_frequency)
+
+
+def _transitions(
+    values: np.ndarray, high: float, low: float, initial_state: bool
+) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """Vectorised hysteresis detector for a single chunk"""
+    above = values > high
+    below = values < low
+    last_decided = np.where(above | below, np.arange(len(values)), -1)
+    np.maximum.accumulate(last_decided, out=last_decided)
+    state = np.where(last_decided >= 0, above[last_decided], initial_state)
+    changes = np.diff(state.astype(np.int8), prepend=np.int8(initial_state))
+    return np.flatnonzero(changes == 1), np.flatnonzero(changes == -1), bool(state[-1])
+
+
+def _merge_short_gaps(
+    onsets: np.ndarray, offsets: np.ndarray, min_gap_samples: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    if min_gap_samples <= 0 or len(onsets) < 2:
+        return onsets, offsets
+    keep_gap = (onsets[1:] - offsets[:-1]) >= min_gap_samples
+    return onsets[np.r_[True, keep_gap]], offsets[np.r_[keep_gap, True]]
+
+
+def _drop_short_periods(
+    onsets: np.ndarray, offsets: np.ndarray, min_duration_samples: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    if min_duration_samples <= 0:
+        return onsets, offsets
+    long_enough = (offsets - onsets) >= min_duration_samples
+    return onsets[long_enough], offsets[long_enough]
+
+
+def _event_from_times(
+    waveform: "channels.Waveform", name: str, times: np.ndarray
+) -> "channels.Event":
+    return channels.Event(
+        name,
+        {
+            "times": times,
+            "ch_type": "event",
+            "path_save_figures": waveform.info.path_save_figures,
+            "trial_name": waveform.info.trial_name,
+            "subject_id": waveform.info.subject_id,
+        },
+    )
@@ -0,0 +1,167 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Literal, NamedTuple, Sequence, Tuple, Union
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from spike2py import plot, trial
+from spike2py.types import trial_source
+
+
+class ExportOptions(NamedTuple):
+    """Options shared by all figures of a batch export
+
+    See :func:`export_figures` parameters for details.
+    """
+
+    file_format: Literal["png", "pdf"] = "png"
+    path_save_figures: Path = None
+    channel_names: Sequence[str] = None
+    include_trial: bool = True
+    include_channels: bool = True
+    rasterize: bool = False
+    dpi: Union[float, str] = "figure"
+
+
+def export_figures(
+    sources: Sequence[trial_source],
+    file_format: Literal["png", "pdf"] = "png",
+    path_save_figures: Union[Path, str] = None,
+    channel_names: Sequence[str] = None,
+    include_trial: bool = True,
+    include_channels: bool = True,
+    rasterize: bool = False,
+    dpi: Union[float, str] = "figure",
+    workers: int = None,
+) -> List[Path]:
+    """Save trial and channel figures of many trials, in parallel and without pyplot
+
+    Figures are drawn with the object-oriented Matplotlib API on Agg canvases,
+    so no pyplot state is shared, and each process reuses one figure per
+    layout for all the trials it renders. Figures are named as when saved with
+    `Trial.plot(save=True)` and `Channel.plot(save=True)`.
+
+    Parameters
+    ----------
+    sources
+        Trials to export, given as Trial or TrialInfo instances, or as paths to
+        Spike2 .mat files or saved (.pkl) trials
+    file_format
+        'png' or 'pdf'
+    path_save_figures
+        Directory where figures are saved; defaults to each trial's
+        `info.path_save_figures`
+    channel_names
+        Channels to export individually; defaults to all channels with data
+    include_trial
+        Export a figure of each whole trial
+    include_channels
+        Export a figure of each channel
+    rasterize
+        Rasterise lines so PDFs of dense waveforms stay small and fast to open;
+        axes and text remain vector graphics
+    dpi
+        Resolution of PNG figures and rasterised lines
+    workers
+        Number of processes; defaults to exporting in the current process
+
+    Returns
+    -------
+    List[Path]
+        Paths of the saved figures
+    """
+    if file_format not in ("png", "pdf"):
+        raise ValueError("file_format must be 'png' or 'pdf'")
+    options = ExportOptions(
+        file_format=file_format,
+        path_save_figures=Path(path_save_figures) if path_save_figures else None,
+        channel_names=channel_names,
+        include_trial=include_trial,
+        include_channels=include_channels,
+        rasterize=rasterize,
+        dpi=dpi,
+    )
+    if workers and workers > 1 and len(sources) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sources))) as executor:
+            results = list(
+                executor.map(export_trial, sources, [options] * len(sources))
+            )
+    else:
+        try:
+            results = [export_trial(source, options) for source in sources]
+        finally:
+            _templates.clear()
+    return [path for paths in results for path in paths]
+
+
+_templates: Dict[Tuple, Tuple[Figure, object, Dict[str, float]]] = dict()
+
+
+def export_trial(source: trial_source, options: ExportOptions) -> List[Path]:
+    """Save the figures of one trial; see :func:`export_figures`
+
+    Figures are drawn on the templates of the current process, which are kept
+    for the next trials exported in this process.
+    """
+    spike2py_trial = trial.from_source(source)
+    path_save_figures = (
+        options.path_save_figures or spike2py_trial.info.path_save_figures
+    )
+    saved = list()
+    if options.include_trial:
+        fig_size, n_subplots = plot.trial_layout(spike2py_trial)
+        fig, ax = _template(
+            ("trial", fig_size, n_subplots), plot.trial_axes, n_subplots
+        )
+        plot.draw_trial(spike2py_trial, ax)
+        fig_name = plot.figure_name(spike2py_trial.info, options.file_format)
+        saved.append(_save(fig, path_save_figures / fig_name, options))
+    if not options.include_channels:
+        return saved
+    for name, channel_type in spike2py_trial.channels:
+        channel = getattr(spike2py_trial, name)
+        selected = (options.channel_names is None) or (name in options.channel_names)
+        if (not selected) or (len(channel.times) == 0):
+            continue
+        fig_size = plot.channel_fig_size(channel)
+        key = ("channel", fig_size, channel_type == "wavemark")
+        fig, ax = _template(key, plot.channel_axes, channel)
+        plot.draw_channel(channel, ax)
+        fig_name = plot.figure_name(channel.info, options.file_format)
+        saved.append(_save(fig, path_save_figures / fig_name, options))
+    return saved
+
+
+def _template(
+    key: Tuple, make_axes: Callable[..., object], *args
+) -> Tuple[Figure, object]:
+    """Figure and axes for a layout, created once per process and then cleared
+
+    Clearing the axes keeps the figure, canvas, grid layout and shared axes,
+    which are the same for every trial with this layout. Subplot parameters
+    and axis visibility, which clearing keeps, are reset to those of the new
+    figure: drawing Event-like channels applies a tight layout and hides the
+    y axis, which must not carry over to the next figure.
+    """
+    if key not in _templates:
+        fig = Figure(figsize=key[1])
+        FigureCanvasAgg(fig)
+        ax = make_axes(fig, *args)
+        _templates[key] = fig, ax, dict(vars(fig.subplotpars))
+    fig, ax, subplot_parameters = _templates[key]
+    for axis in fig.axes:
+        axis.clear()
+        axis.xaxis.set_visible(True)
+        axis.yaxis.set_visible(True)
+    fig.subplots_adjust(**subplot_parameters)
+    return fig, ax
+
+
+def _save(fig: Figure, fig_path: Path, options: ExportOptions) -> Path:
+    for axis in fig.axes:
+        for artist in axis.lines + axis.collections:
+            artist.set_rasterized(options.rasterize)
+    fig_path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(fig_path, format=options.file_format, dpi=options.dpi)
+    return fig_path
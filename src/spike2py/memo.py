@@ -0,0 +1,223 @@
+"""Opt-in disk cache of processed signals, keyed by processing recipe
+
+Each processing step of a Waveform (see :mod:`spike2py.sig_proc`) is recorded
+in the channel's `recipe`: the step's name and parameters, after the steps
+before it. Once enabled, the result of every step is saved under a hash of the
+recipe and of a fingerprint of the data it started from, so running the same
+steps on the same data again, in this or a later session, memory-maps the
+saved result instead of computing it. For example::
+
+    spike2py.memo.enable("/data/study/.spike2py-cache", max_bytes=20_000_000_000)
+    trial1.Emg.remove_mean().bandpass([20, 450]).rect().lowpass(6)
+
+Saved results are evicted, least recently used first, to keep the cache
+directory under `max_bytes`. The directory is only scanned when enabled and
+once the results saved since then take it over `max_bytes`.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Tuple, Union
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 10 * (1 << 30)
+
+step = Tuple[str, Dict]
+
+_directory: Path = None
+_max_bytes = DEFAULT_MAX_BYTES
+# Bytes in the cache directory at the last scan, plus results saved since
+_bytes_used = 0
+
+
+class CachedStep(NamedTuple):
+    """Saved result of a processing step
+
+    name
+        Attribute the step's result is stored under, e.g. 'proc_rect'
+    values
+        Read-only memory map of the processed values
+    times
+        Read-only memory map of the new time axis, for steps changing it
+        (e.g. interpolation); otherwise None
+    """
+
+    name: str
+    values: np.ndarray
+    times: np.ndarray
+
+
+def enable(directory: Union[Path, str], max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+    """Save and reuse processing results in `directory` until :func:`disable`
+
+    Parameters
+    ----------
+    directory
+        Cache directory, created if needed; can be shared by processes
+    max_bytes
+        Size above which the least recently used results are deleted
+    """
+    global _directory, _max_bytes
+    _directory = Path(directory)
+    _directory.mkdir(parents=True, exist_ok=True)
+    _max_bytes = max_bytes
+    _evict()
+
+
+def disable() -> None:
+    """Stop saving and reusing results; saved results are kept on disk"""
+    global _directory
+    _directory = None
+
+
+def is_enabled() -> bool:
+    return _directory is not None
+
+
+def clear() -> None:
+    """Delete all saved results"""
+    global _bytes_used
+    if _directory is not None:
+        for files in _entries():
+            _delete(files)
+        _bytes_used = 0
+
+
+def size() -> int:
+    """Bytes of saved results"""
+    if _directory is None:
+        return 0
+    return sum(_entry_bytes(files) for files in _entries())
+
+
+def fingerprint(values: np.ndarray, times: np.ndarray, sampling_frequency) -> str:
+    """Hash of the data a recipe starts from"""
+    digest = hashlib.blake2b(digest_size=20)
+    for array in (values, times):
+        if array is None:
+            digest.update(b"None")
+            continue
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.data)
+    digest.update(repr(sampling_frequency).encode())
+    return digest.hexdigest()
+
+
+def canonical(value):
+    """JSON-compatible form of a step parameter; arrays and channels are hashed"""
+    times = getattr(value, "times", None)
+    if isinstance(times, np.ndarray) and not isinstance(value, np.ndarray):
+        value = times
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        digest = hashlib.blake2b(array.data, digest_size=20).hexdigest()
+        return {"array": digest, "dtype": array.dtype.str, "shape": list(array.shape)}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def key(fingerprint: str, recipe: List[step]) -> str:
+    """Hash identifying the result of `recipe` run on data with `fingerprint`"""
+    text = json.dumps([fingerprint, list(recipe)], sort_keys=True, default=repr)
+    return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+
+def load(recipe_key: str) -> CachedStep:
+    """Saved result of `recipe_key`, or None"""
+    if _directory is None:
+        return None
+    metadata_file = _directory / f"{recipe_key}.json"
+    try:
+        metadata = json.loads(metadata_file.read_text())
+        values = np.load(_directory / f"{recipe_key}.npy", mmap_mode="r")
+        times = None
+        if metadata["times"]:
+            times = np.load(_directory / f"{recipe_key}.times.npy", mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None
+    os.utime(metadata_file)
+    return CachedStep(metadata["name"], values, times)
+
+
+def store(recipe_key: str, name: str, values: np.ndarray, times: np.ndarray = None):
+    """Save the result of `recipe_key`, then evict results above the size limit"""
+    global _bytes_used
+    if _directory is None:
+        return
+    files = [_directory / f"{recipe_key}.json", _directory / f"{recipe_key}.npy"]
+    _save_array(files[1], values)
+    if times is not None:
+        files.append(_directory / f"{recipe_key}.times.npy")
+        _save_array(files[2], times)
+    metadata = {"name": name, "times": times is not None}
+    _replace(files[0], json.dumps(metadata).encode())
+    _bytes_used += _entry_bytes(files)
+    if _bytes_used > _max_bytes:
+        _evict()
+
+
+def _save_array(file: Path, array: np.ndarray) -> None:
+    temporary = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as array_file:
+        np.save(array_file, np.asarray(array))
+    os.replace(temporary, file)
+
+
+def _replace(file: Path, content: bytes) -> None:
+    temporary = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(content)
+    os.replace(temporary, file)
+
+
+def _entries() -> Iterator[List[Path]]:
+    """Files of each saved result, the metadata file first"""
+    for metadata_file in _directory.glob("*.json"):
+        recipe_key = metadata_file.stem
+        yield [metadata_file] + [
+            file
+            for file in (
+                _directory / f"{recipe_key}.npy",
+                _directory / f"{recipe_key}.times.npy",
+            )
+            if file.exists()
+        ]
+
+
+def _entry_bytes(files: List[Path]) -> int:
+    try:
+        return sum(file.stat().st_size for file in files)
+    except OSError:
+        return 0
+
+
+def _evict() -> None:
+    global _bytes_used
+    entries = list()
+    for files in _entries():
+        try:
+            last_used = files[0].stat().st_mtime_ns
+        except OSError:
+            continue
+        entries.append((last_used, _entry_bytes(files), files))
+    total = sum(n_bytes for _, n_bytes, _ in entries)
+    for _, n_bytes, files in sorted(entries, key=lambda entry: entry[0]):
+        if total <= _max_bytes:
+            break
+        _delete(files)
+        total -= n_bytes
+    _bytes_used = total
+
+
+def _delete(files: List[Path]) -> None:
+    for file in files:
+        try:
+            file.unlink()
+        except OSError:
+            pass
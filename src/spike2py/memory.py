@@ -0,0 +1,188 @@
+"""Memory accounting of channel arrays, and spilling of intermediates to disk
+
+Channels hold many arrays that may share memory: `raw_values` is `values`
+until the first processing step, each `proc_*` array is the `values` of its
+step, and windowed channels hold views of the original arrays. Arrays are
+therefore counted by the buffer that owns their memory, once per buffer.
+"""
+
+import mmap
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+
+INTERMEDIATE_PREFIX = "proc_"
+INTERMEDIATE_ATTRIBUTES = ("times_pre_interp", "raw_values")
+MAX_DEPTH = 3
+
+
+class MemoryUsage(NamedTuple):
+    """Bytes held by the array attributes of channels
+
+    attributes
+        Bytes of memory owned by each attribute (e.g. 'values', or
+        'Emg1.values' for a trial). Memory shared with an attribute listed
+        earlier is not counted again.
+    aliases
+        Attributes whose arrays only share memory with earlier attributes,
+        with the attribute they share it with
+    spilled
+        Bytes of attributes read from files on disk (see
+        :meth:`spike2py.trial.Trial.compact`); not included in `total`
+    """
+
+    attributes: Dict[str, int]
+    aliases: Dict[str, str]
+    spilled: Dict[str, int]
+
+    @property
+    def total(self) -> int:
+        """Bytes of memory held by all attributes"""
+        return sum(self.attributes.values())
+
+    def __repr__(self) -> str:
+        lines = [f"{'attribute':<40}{'MB':>10}"]
+        for name, n_bytes in self.attributes.items():
+            shared = f"  (shares {self.aliases[name]})" if name in self.aliases else ""
+            lines.append(f"{name:<40}{n_bytes / 1e6:>10.2f}{shared}")
+        for name, n_bytes in self.spilled.items():
+            lines.append(f"{name:<40}{n_bytes / 1e6:>10.2f}  (on disk)")
+        lines.append(f"{'total':<40}{self.total / 1e6:>10.2f}")
+        return "\n".join(lines)
+
+
+def memory_usage(named_objects: Dict[str, object]) -> MemoryUsage:
+    """Memory held by the array attributes of `named_objects`
+
+    Parameters
+    ----------
+    named_objects
+        Objects (usually channels) keyed by the prefix of their attribute
+        names in the result; an empty prefix gives bare attribute names
+    """
+    attributes, aliases, spilled = dict(), dict(), dict()
+    owners: Dict[int, str] = dict()
+    for prefix, obj in named_objects.items():
+        for attribute, value in vars(obj).items():
+            name = f"{prefix}.{attribute}" if prefix else attribute
+            buffers = list(_buffers(value))
+            if not buffers:
+                continue
+            if all(_is_mapped(buffer) for buffer in buffers):
+                spilled[name] = sum(buffer.nbytes for buffer in buffers)
+                continue
+            n_bytes = 0
+            for buffer in buffers:
+                if id(buffer) in owners or _is_mapped(buffer):
+                    continue
+                owners[id(buffer)] = name
+                n_bytes += buffer.nbytes
+            attributes[name] = n_bytes
+            if n_bytes == 0:
+                aliases[name] = owners[id(buffers[0])]
+    return MemoryUsage(attributes, aliases, spilled)
+
+
+def compact(
+    named_objects: Dict[str, object], budget: int, directory: Path, drop: bool = False
+) -> MemoryUsage:
+    """Spill or drop intermediate arrays until `named_objects` hold at most `budget` bytes
+
+    Intermediates are `proc_*` arrays and `times_pre_interp`, largest first,
+    then `raw_values`. Intermediates sharing memory with other attributes
+    (e.g. the `proc_*` array of the last processing step, which is `values`)
+    free nothing and are kept. Spilled arrays are written to .npy files in
+    `directory` and replaced by read-only memory maps of these files.
+
+    Returns
+    -------
+    MemoryUsage
+        Memory held after compacting; `total` may still exceed `budget` if
+        removing all intermediates was not enough
+    """
+    usage = memory_usage(named_objects)
+    excess = usage.total - budget
+    if excess <= 0:
+        return usage
+    for group in _intermediate_groups(named_objects):
+        if excess <= 0:
+            break
+        spilled_arrays: Dict[int, np.ndarray] = dict()
+        for prefix, obj, attribute in group.attributes:
+            if drop:
+                delattr(obj, attribute)
+                continue
+            array = getattr(obj, attribute)
+            if id(array) not in spilled_arrays:
+                spilled_arrays[id(array)] = _spill(
+                    array, Path(directory) / f"{prefix}.{attribute}.npy"
+                )
+            setattr(obj, attribute, spilled_arrays[id(array)])
+        excess -= group.n_bytes
+    return memory_usage(named_objects)
+
+
+class _Group(NamedTuple):
+    """Intermediate attributes sharing one buffer"""
+
+    n_bytes: int
+    is_raw: bool
+    attributes: List[Tuple[str, object, str]]
+
+
+def _intermediate_groups(named_objects: Dict[str, object]) -> List[_Group]:
+    """Groups of intermediates whose buffers no other attribute holds"""
+    groups: Dict[int, _Group] = dict()
+    protected = set()
+    for prefix, obj in named_objects.items():
+        for attribute, value in vars(obj).items():
+            buffers = [buffer for buffer in _buffers(value) if not _is_mapped(buffer)]
+            if not (_is_intermediate(attribute) and isinstance(value, np.ndarray)):
+                protected.update(id(buffer) for buffer in buffers)
+                continue
+            if not buffers:
+                continue
+            buffer = buffers[0]
+            group = groups.setdefault(id(buffer), _Group(buffer.nbytes, False, list()))
+            group.attributes.append((prefix, obj, attribute))
+            if attribute == "raw_values":
+                groups[id(buffer)] = group._replace(is_raw=True)
+    spillable = [group for key, group in groups.items() if key not in protected]
+    return sorted(spillable, key=lambda group: (group.is_raw, -group.n_bytes))
+
+
+def _is_intermediate(attribute: str) -> bool:
+    return attribute.startswith(INTERMEDIATE_PREFIX) or (
+        attribute in INTERMEDIATE_ATTRIBUTES
+    )
+
+
+def _spill(array: np.ndarray, file: Path) -> np.ndarray:
+    file.parent.mkdir(parents=True, exist_ok=True)
+    np.save(file, array)
+    return np.load(file, mmap_mode="r")
+
+
+def _buffers(value, depth: int = 0) -> Iterator[np.ndarray]:
+    """Arrays owning the memory of arrays in `value` or nested in its attributes"""
+    if isinstance(value, np.ndarray):
+        yield _owner(value)
+    elif depth >= MAX_DEPTH or isinstance(value, (str, bytes, Path)):
+        return
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _buffers(item, depth + 1)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        for item in vars(value).values():
+            yield from _buffers(item, depth + 1)
+
+
+def _owner(array: np.ndarray) -> np.ndarray:
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def _is_mapped(buffer: np.ndarray) -> bool:
+    return isinstance(buffer.base, mmap.mmap)
@@ -0,0 +1,206 @@
+"""Batch pipelines that read upcoming trials while the current one is processed
+
+Reading and decompressing .mat files is mostly spent waiting on the disk (or
+network) and in zlib, which release the GIL, so background threads can read
+the next trials while the caller filters the current one. For example::
+
+    for trial in pipeline.prefetch(files, depth=2):
+        trial.Emg.remove_mean().lowpass(20)
+        trial.save()
+
+Asyncio applications can read trials without blocking their event loop with
+:func:`aload`, :func:`achannels` and :func:`aprefetch`, which run reading in
+an executor and limit how many reads run at once.
+"""
+
+import asyncio
+import collections
+import weakref
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Deque, Iterator, Sequence, Tuple
+
+from spike2py import channels, trial
+from spike2py.types import trial_source
+
+DEFAULT_DEPTH = 2
+DEFAULT_CONCURRENCY = 4
+
+_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def prefetch(
+    sources: Sequence[trial_source],
+    depth: int = DEFAULT_DEPTH,
+    workers: int = 1,
+    load_channels: bool = True,
+) -> Iterator["trial.Trial"]:
+    """Trials of `sources` in order, the next `depth` being read in the background
+
+    At most `depth` trials are read ahead of the trial being processed, so
+    about `depth` + 1 trials are held in memory at once. Trials that could not
+    be read raise their error when their turn comes. Leaving the loop early
+    cancels trials that were not started.
+
+    Parameters
+    ----------
+    sources
+        Trials given as Trial or TrialInfo instances, or as paths to Spike2
+        .mat files or saved (.pkl) trials
+    depth
+        Number of trials read ahead; 0 reads each trial when it is needed
+    workers
+        Number of threads reading trials
+    load_channels
+        Read all channels of each trial in the background; otherwise only the
+        file index is read and channels are read when first accessed
+
+    Yields
+    ------
+    Trial
+        Trials in the order of `sources`
+    """
+    if depth < 0:
+        raise ValueError("depth must be 0 or more")
+    if depth == 0:
+        for source in sources:
+            yield _read(source, load_channels)
+        return
+    pending: Deque[Future] = collections.deque()
+    remaining = iter(sources)
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(workers, depth)), thread_name_prefix="spike2py-prefetch"
+    )
+    try:
+        for source in remaining:
+            pending.append(executor.submit(_read, source, load_channels))
+            if len(pending) == depth:
+                break
+        while pending:
+            spike2py_trial = pending.popleft().result()
+            for source in remaining:
+                pending.append(executor.submit(_read, source, load_channels))
+                break
+            yield spike2py_trial
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _read(source: trial_source, load_channels: bool) -> "trial.Trial":
+    spike2py_trial = trial.from_source(source)
+    if load_channels:
+        spike2py_trial.load_channels()
+    return spike2py_trial
+
+
+async def aload(
+    source: trial_source,
+    load_channels: bool = True,
+    limit: asyncio.Semaphore = None,
+    executor: Executor = None,
+) -> "trial.Trial":
+    """Trial read without blocking the event loop
+
+    The file index and then each channel are read in `executor`, one call at
+    a time, so the task can be cancelled between channels. A read already
+    running when the task is cancelled completes in the background.
+
+    Parameters
+    ----------
+    source
+        Trial given as a Trial or TrialInfo instance, or as a path to a
+        Spike2 .mat file or a saved (.pkl) trial
+    load_channels
+        Read all channels; otherwise only the file index is read, and
+        channels can be read with :func:`achannels`
+    limit
+        Semaphore limiting the number of reads running at once; defaults to
+        one shared by all reads of the event loop, allowing
+        `DEFAULT_CONCURRENCY` reads
+    executor
+        Executor running the reads; defaults to the event loop's executor
+    """
+    spike2py_trial = await _run(executor, limit, trial.from_source, source)
+    if load_channels:
+        async for _ in achannels(spike2py_trial, limit=limit, executor=executor):
+            pass
+    return spike2py_trial
+
+
+async def achannels(
+    spike2py_trial: "trial.Trial",
+    names: Sequence[str] = None,
+    limit: asyncio.Semaphore = None,
+    executor: Executor = None,
+) -> AsyncIterator[Tuple[str, "channels.Channel"]]:
+    """Channel names and channels of a trial, each yielded once it is read
+
+    Parameters
+    ----------
+    spike2py_trial
+        Trial, e.g. from `aload(source, load_channels=False)`
+    names
+        Channel attribute names (e.g. 'Emg1'); defaults to all channels
+    limit, executor
+        As for :func:`aload`
+    """
+    if names is None:
+        names = [name for name, _ in spike2py_trial.channels]
+    for name in names:
+        yield name, await _run(executor, limit, getattr, spike2py_trial, name)
+
+
+async def aprefetch(
+    sources: Sequence[trial_source],
+    depth: int = DEFAULT_DEPTH,
+    load_channels: bool = True,
+    limit: asyncio.Semaphore = None,
+    executor: Executor = None,
+) -> AsyncIterator["trial.Trial"]:
+    """Trials of `sources` in order, the next `depth` being read concurrently
+
+    The asynchronous counterpart of :func:`prefetch`; reads still waiting
+    when the iteration stops or is cancelled are cancelled.
+
+    Parameters
+    ----------
+    sources
+        As for :func:`prefetch`
+    depth
+        Number of trials read ahead of the one being processed (at least 1)
+    load_channels, limit, executor
+        As for :func:`aload`
+    """
+    if depth < 1:
+        raise ValueError("depth must be 1 or more")
+    pending: Deque[asyncio.Task] = collections.deque()
+    remaining = iter(sources)
+
+    def schedule(source: trial_source) -> None:
+        pending.append(
+            asyncio.ensure_future(aload(source, load_channels, limit, executor))
+        )
+
+    try:
+        for source in remaining:
+            schedule(source)
+            if len(pending) == depth:
+                break
+        while pending:
+            spike2py_trial = await pending.popleft()
+            for source in remaining:
+                schedule(source)
+                break
+            yield spike2py_trial
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _run(executor: Executor, limit: asyncio.Semaphore, function: Callable, *args):
+    loop = asyncio.get_running_loop()
+    if limit is None:
+        limit = _limits.setdefault(loop, asyncio.Semaphore(DEFAULT_CONCURRENCY))
+    async with limit:
+        return await loop.run_in_executor(executor, function, *args)
@@ -1,17 +1,26 @@
+from collections import OrderedDict
 from typing import Literal, Tuple
 
 import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 
 
-from spike2py import channels, trial
+from spike2py import channels, profiling, trial
 from spike2py.types import all_channels, ticksline_channels
 
 LINE_WIDTH = 2
 FIG_SIZE = (12, 4)
 WAVEFORM_FIG_SIZE = (12, 8)
 MAX_TRIAL_FIG_HEIGHT = 30
+CODE_LABEL_SPACING_PX = 20
+TICKS_PER_PIXEL = 4
+MAX_ACTION_POTENTIALS = 500
+ZOOM_DEBOUNCE_MS = 100
+ZOOM_TILE_COLUMNS = 512
+ZOOM_TILE_CACHE_SIZE = 64
 LEGEND_LOC = "upper right"
 COLORS = [
     "tab:blue",
@@ -30,6 +39,7 @@ DEFAULT_COLOR = COLORS[0]
 matplotlib.rcParams.update({"font.size": 14})
 
 
+@profiling.stage("plot.plot_channel")
 def plot_channel(spike2py_channel: all_channels, save: Literal[True, False]) -> None:
     """Plot individual channels.
 
@@ -49,39 +59,57 @@ def plot_channel(spike2py_channel: all_channels, save: Literal[True, False]) ->
     if len(spike2py_channel.times) == 0:
         print("{spike2py_channel.info.name} channel has no data to plot.")
         return
-    channel_type = repr(spike2py_channel).split()[0]
-    if channel_type == "Waveform":
-        # Split axis generation and plotting to allow reuse of plotting with trial plotting
-        fig, ax = plt.subplots(figsize=WAVEFORM_FIG_SIZE)
+    fig = plt.figure(figsize=channel_fig_size(spike2py_channel))
+    draw_channel(spike2py_channel, channel_axes(fig, spike2py_channel))
+    if save:
+        _save_plot(spike2py_channel.info)
+    else:
+        plt.show()
+
+
+def channel_fig_size(spike2py_channel: all_channels) -> Tuple[int, int]:
+    """Figure size used to plot `spike2py_channel`"""
+    if repr(spike2py_channel).split()[0] == "Waveform":
+        return WAVEFORM_FIG_SIZE
+    return FIG_SIZE
+
+
+def channel_axes(fig: Figure, spike2py_channel: all_channels) -> plt.Axes:
+    """Create the axes of a channel figure on `fig`
+
+    Wavemark channels get a second, narrower axis for their action potentials.
+    """
+    if repr(spike2py_channel).split()[0] == "Wavemark":
+        return fig.subplots(1, 2, gridspec_kw={"width_ratios": [3, 1]})
+    return fig.subplots()
+
+
+@profiling.stage("plot.draw_channel")
+def draw_channel(spike2py_channel: all_channels, ax: plt.Axes) -> None:
+    """Draw `spike2py_channel` and its title on axes from :func:`channel_axes`
+
+    Only the object-oriented Matplotlib API is used, so figures can be drawn
+    without pyplot, for example by :mod:`spike2py.export`.
+    """
+    if repr(spike2py_channel).split()[0] == "Waveform":
         _plot_waveform(spike2py_channel, ax)
     else:
-        ticks_line = _TicksLine(spike2py_channel)
-        if ticks_line.ch_type == "Wavemark":
-            fig, ax = plt.subplots(
-                1, 2, figsize=FIG_SIZE, gridspec_kw={"width_ratios": [3, 1]}
-            )
-            ticks_line.plot(ax)
-        else:
-            fig, ax = plt.subplots(figsize=FIG_SIZE)
-            ticks_line.plot(ax)
+        _TicksLine(spike2py_channel).plot(ax)
     title = (
         f"{spike2py_channel.info.subject_id}_"
         f"{spike2py_channel.info.name}_"
-        f"{spike2py_channel.info.file.name}"
+        f"{spike2py_channel.info.trial_name}"
     )
-    ax.text(
+    title_ax = ax[0] if isinstance(ax, np.ndarray) else ax
+    title_ax.text(
         0,
         0,
         title,
         horizontalalignment="left",
         verticalalignment="top",
-        transform=ax.transAxes,
+        transform=title_ax.transAxes,
         fontsize=10,
     )
-    if save:
-        _save_plot(spike2py_channel.info)
-    else:
-        plt.show()
 
 
 def _get_color(index: int) -> str:
@@ -92,9 +120,18 @@ def _plot_waveform(
     waveform: "channels.Waveform",
     ax: plt.Axes,
     color: str = DEFAULT_COLOR,
+    interactive: bool = False,
 ) -> None:
-    ax.plot(waveform.times, waveform.values, label=waveform.info.name, color=color)
+    n_columns = _pixel_columns(ax, per_pixel=1)
+    summary = waveform.summary_pyramid
+    if (summary is not None) and (len(waveform.values) > 2 * n_columns):
+        times, values = summary.envelope(n_columns)
+    else:
+        times, values = _decimate_min_max(waveform.times, waveform.values, n_columns)
+    (line,) = ax.plot(times, values, label=waveform.info.name, color=color)
     ax.set_xlim(waveform.times[0], waveform.times[-1])
+    if interactive:
+        _ZoomUpdater(waveform, line, ax)
     units = waveform.info.units if waveform.info.units is True else "a.u."
     ax.set_ylabel(f"amplitude ({units})")
     ax.legend(loc=LEGEND_LOC)
@@ -102,20 +139,130 @@ def _plot_waveform(
     ax.grid()
 
 
-def _save_plot(channel_info: "channels.ChannelInfo") -> None:
-    try:
-        fig_name = (
-            f"{channel_info.subject_id}_"
-            f"{channel_info.trial_name}_"
-            f"{channel_info.name}.pdf"
+def _decimate_min_max(
+    times: np.ndarray, values: np.ndarray, n_columns: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep only the minimum and maximum sample of each of `n_columns` bins
+
+    A line drawn through the kept samples, in time order, covers exactly the
+    same pixels as the full signal when each bin spans at most one pixel
+    column, so visual extremes are preserved. Signals with no more than two
+    samples per bin are returned unchanged.
+    """
+    n_samples = min(len(times), len(values))
+    if n_samples <= 2 * n_columns:
+        return times[:n_samples], values[:n_samples]
+    bin_size = -(-n_samples // n_columns)
+    n_full_bins = n_samples // bin_size
+    full_length = n_full_bins * bin_size
+    full_bins = np.asarray(values[:full_length]).reshape(n_full_bins, bin_size)
+    argmins = np.argmin(full_bins, axis=1)
+    argmaxs = np.argmax(full_bins, axis=1)
+    if full_length < n_samples:
+        last_bin = values[full_length:n_samples]
+        argmins = np.append(argmins, np.argmin(last_bin))
+        argmaxs = np.append(argmaxs, np.argmax(last_bin))
+    bin_starts = np.arange(0, n_samples, bin_size)[:, np.newaxis]
+    indices = np.column_stack(
+        [np.minimum(argmins, argmaxs), np.maximum(argmins, argmaxs)]
+    )
+    indices = (indices + bin_starts).ravel()
+    return times[indices], values[indices]
+
+
+class _ZoomUpdater:
+    """Redraw a Waveform line at the resolution of the visible x-range
+
+    The visible range is covered by tiles of `ZOOM_TILE_COLUMNS` min/max pairs,
+    each summarising a power-of-two number of samples. Tiles come from the
+    Waveform's summary pyramid when it has one, otherwise from `values`, and
+    the most recently used tiles are cached so panning and zooming back are
+    served without touching the signal. Updates are debounced by
+    `ZOOM_DEBOUNCE_MS` so a drag triggers a single redraw.
+    """
+
+    def __init__(
+        self, waveform: "channels.Waveform", line: plt.Line2D, ax: plt.Axes
+    ) -> None:
+        self.waveform = waveform
+        self.line = line
+        self.ax = ax
+        self.tiles = OrderedDict()
+        self.timer = None
+        if ZOOM_DEBOUNCE_MS > 0:
+            self.timer = ax.figure.canvas.new_timer(interval=ZOOM_DEBOUNCE_MS)
+            self.timer.single_shot = True
+            self.timer.add_callback(self.update)
+        # A plain function is held strongly by the callback registry, which
+        # keeps this updater alive for as long as the axes exist
+        ax.callbacks.connect("xlim_changed", lambda ax: self.schedule())
+
+    def schedule(self) -> None:
+        if self.timer is None:
+            self.update()
+        else:
+            self.timer.stop()
+            self.timer.start()
+
+    def update(self) -> None:
+        times = self.waveform.times
+        n_samples = min(len(times), len(self.waveform.values))
+        start, end = self.ax.get_xlim()
+        first = max(int(np.searchsorted(times[:n_samples], start)) - 1, 0)
+        last = min(int(np.searchsorted(times[:n_samples], end)) + 1, n_samples)
+        n_columns = _pixel_columns(self.ax, per_pixel=1)
+        samples_per_column = max((last - first) // n_columns, 1)
+        level = int(np.log2(samples_per_column))
+        tile_samples = ZOOM_TILE_COLUMNS * 2**level
+        tiles = [
+            self._tile(level, index, tile_samples, n_samples)
+            for index in range(first // tile_samples, -(-last // tile_samples))
+        ]
+        self.line.set_data(
+            np.concatenate([tile[0] for tile in tiles]),
+            np.concatenate([tile[1] for tile in tiles]),
         )
-    except AttributeError:
-        fig_name = f"{channel_info.subject_id}_" f"{channel_info.name}.pdf"
-    fig_path = channel_info.path_save_figures / fig_name
+        self.ax.figure.canvas.draw_idle()
+
+    def _tile(
+        self, level: int, index: int, tile_samples: int, n_samples: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        key = (level, index)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+        first = index * tile_samples
+        last = min(first + tile_samples, n_samples)
+        summary = self.waveform.summary_pyramid
+        if (summary is not None) and (2**level >= summary.levels[0].block_size):
+            tile = summary.envelope(ZOOM_TILE_COLUMNS, first, last)
+        else:
+            tile = _decimate_min_max(
+                self.waveform.times[first:last],
+                self.waveform.values[first:last],
+                ZOOM_TILE_COLUMNS,
+            )
+        self.tiles[key] = tile
+        if len(self.tiles) > ZOOM_TILE_CACHE_SIZE:
+            self.tiles.popitem(last=False)
+        return tile
+
+
+@profiling.stage("plot.save", label=lambda info: info.name)
+def _save_plot(channel_info: "channels.ChannelInfo") -> None:
+    fig_path = channel_info.path_save_figures / figure_name(channel_info)
     plt.savefig(fig_path, dpi="figure")
     plt.close()
 
 
+def figure_name(info: "channels.ChannelInfo", file_format: str = "pdf") -> str:
+    """File name of the figure of a channel (ChannelInfo) or trial (TrialInfo)"""
+    try:
+        return f"{info.subject_id}_{info.trial_name}_{info.name}.{file_format}"
+    except AttributeError:
+        return f"{info.subject_id}_{info.name}.{file_format}"
+
+
 class _TicksLine:
     """Class that manages plotting of Event, Keyboard and Wavemark channels"""
 
@@ -165,13 +312,15 @@ class _TicksLine:
         if (self.ch_type == "Wavemark") and ax2:
             self._plot_action_potentials(ax2)
 
-        plt.tight_layout()
+        ax1.figure.tight_layout()
 
     def _plot_ticks_line(self, ax1: plt.Axes):
-        for time in self.ch.times:
-            ax1.plot(
-                (time, time), self.tick_y_vals, linewidth=LINE_WIDTH, color=self.color
-            )
+        times = self.ch.times[_thin_labels(self.ch.times, _pixel_columns(ax1))]
+        ax1.plot(
+            *_ticks_xy(times, self.tick_y_vals),
+            linewidth=LINE_WIDTH,
+            color=self.color,
+        )
         ax1.plot(
             self.line_start_end,
             self.line_y_vals,
@@ -181,14 +330,36 @@ class _TicksLine:
         )
 
     def _plot_codes(self, ax1: plt.Axes):
-        for time, code in zip(self.ch.times, self.ch.codes):
+        if self.ch.codes is None:
+            return
+        codes = np.asarray(self.ch.codes, dtype=object)
+        n_codes = min(len(self.ch.times), len(codes))
+        shown = _thin_labels(self.ch.times[:n_codes], _max_labels(ax1))
+        for time, code in zip(self.ch.times[shown], codes[shown]):
             ax1.text(
                 time, self.tick_y_vals[1] + 0.2, code, color=self.color, fontsize=10
             )
 
     def _plot_action_potentials(self, ax2: plt.Axes):
-        for action_potential in self.ch.action_potentials:
-            ax2.plot(action_potential, color=self.color, alpha=0.5)
+        action_potentials = np.asarray(self.ch.action_potentials, dtype=float)
+        if action_potentials.ndim == 2 and len(action_potentials) > 0:
+            shown = np.unique(
+                np.linspace(
+                    0, len(action_potentials) - 1, MAX_ACTION_POTENTIALS
+                ).astype(int)
+            )
+            action_potentials = action_potentials[shown]
+            samples = np.broadcast_to(
+                np.arange(action_potentials.shape[1]), action_potentials.shape
+            )
+            ax2.add_collection(
+                LineCollection(
+                    np.stack([samples, action_potentials], axis=-1),
+                    color=self.color,
+                    alpha=0.5,
+                )
+            )
+            ax2.autoscale_view()
         ax2.get_yaxis().set_visible(False)
         ax2.get_xaxis().set_visible(False)
 
@@ -199,20 +370,102 @@ class _TicksLine:
         ax1.grid()
 
 
-def plot_trial(spike2py_trial: "trial.Trial", save: Literal[True, False]) -> None:
+def _ticks_xy(
+    times: np.ndarray, tick_y_vals: Tuple[float, float]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Vertices of all ticks as a single line, with NaN breaks between ticks
+
+    Drawing one line keeps rendering time nearly independent of the number of
+    ticks, unlike one artist (or one path in a collection) per tick.
+    """
+    x_vals = np.repeat(np.asarray(times, dtype=float), 3)
+    x_vals[2::3] = np.nan
+    y_vals = np.tile([tick_y_vals[0], tick_y_vals[1], np.nan], len(times))
+    return x_vals, y_vals
+
+
+def _pixel_columns(ax: plt.Axes, per_pixel: int = TICKS_PER_PIXEL) -> int:
+    """Number of distinct x positions worth drawing across the width of `ax`
+
+    Ticks closer together than a fraction of a pixel are drawn on top of each
+    other, so only the first of them is kept.
+    """
+    return max(int(ax.get_window_extent().width * per_pixel), 1)
+
+
+def _max_labels(ax: plt.Axes) -> int:
+    """Number of code labels that fit across the width of `ax` without overlapping"""
+    width_px = ax.get_window_extent().width
+    return max(int(width_px / CODE_LABEL_SPACING_PX), 1)
+
+
+def _thin_labels(times: np.ndarray, max_labels: int) -> np.ndarray:
+    """Indices of ticks or labels to draw so at most one falls in each of
+    `max_labels` equal slices of the time axis; the first of each slice is kept."""
+    if len(times) <= 1:
+        return np.arange(len(times))
+    span = times[-1] - times[0]
+    if span <= 0:
+        return np.array([0])
+    slice_index = np.floor((times - times[0]) / span * max_labels).astype(np.int64)
+    return np.flatnonzero(np.diff(slice_index, prepend=-1) != 0)
+
+
+@profiling.stage("plot.plot_trial")
+def plot_trial(
+    spike2py_trial: "trial.Trial",
+    save: Literal[True, False],
+    interactive: bool = False,
+) -> None:
+    """Plot all channels of a trial on a shared time axis
+
+    Parameters
+    ----------
+    spike2py_trial:
+        Trial to plot
+    save:
+        Whether or not to save the generated figure.
+    interactive:
+        Redraw Waveform channels at the resolution of the visible time range
+        when zooming or panning, instead of keeping the whole-trial overview.
+    """
     fig_height, n_subplots = _fig_height_n_subplots(spike2py_trial)
     if n_subplots == 1:
         print(
             f"The trial `{spike2py_trial.info.name}` has only one plottable channel."
             "\nPlease use `trial_name.ch_name.plot()` instead."
         )
-    fig, ax = plt.subplots(
+    fig = plt.figure(figsize=(12, fig_height))
+    draw_trial(spike2py_trial, trial_axes(fig, n_subplots), interactive)
+
+    if save:
+        _save_plot(spike2py_trial.info)
+    else:
+        plt.show()
+
+
+def trial_layout(spike2py_trial: "trial.Trial") -> Tuple[Tuple[int, int], int]:
+    """Figure size and number of subplots used to plot `spike2py_trial`"""
+    fig_height, n_subplots = _fig_height_n_subplots(spike2py_trial)
+    return (12, fig_height), n_subplots
+
+
+def trial_axes(fig: Figure, n_subplots: int) -> np.ndarray:
+    """Create `n_subplots` stacked axes sharing the time axis on `fig`"""
+    return fig.subplots(
         sharex=True,
         nrows=n_subplots,
-        figsize=(12, fig_height),
         gridspec_kw={"hspace": 0},
-    )
-    _plot_trial(spike2py_trial, ax)
+        squeeze=False,
+    )[:, 0]
+
+
+@profiling.stage("plot.draw_trial")
+def draw_trial(
+    spike2py_trial: "trial.Trial", ax: np.ndarray, interactive: bool = False
+) -> None:
+    """Draw all channels of `spike2py_trial` on axes from :func:`trial_axes`"""
+    _plot_trial(spike2py_trial, ax, interactive)
     title = (
         f"{spike2py_trial.info.subject_id}_"
         f"{spike2py_trial.info.name}_"
@@ -228,11 +481,6 @@ def plot_trial(spike2py_trial: "trial.Trial", save: Literal[True, False]) -> Non
         fontsize=10,
     )
 
-    if save:
-        _save_plot(spike2py_trial.info)
-    else:
-        plt.show()
-
 
 def _fig_height_n_subplots(spike2py_trial: "trial.Trial") -> Tuple[int, int]:
     """Determine height and number of subplots to plot trial.
@@ -244,7 +492,7 @@ def _fig_height_n_subplots(spike2py_trial: "trial.Trial") -> Tuple[int, int]:
     n_subplots = 0
     plottable_ticks_line = False
     for channel, channel_type in spike2py_trial.channels:
-        current_channel = spike2py_trial.__getattribute__(channel)
+        current_channel = getattr(spike2py_trial, channel)
         if (
             (channel_type in ["event", "keyboard", "wavemark"])
             and (not plottable_ticks_line)
@@ -260,17 +508,18 @@ def _fig_height_n_subplots(spike2py_trial: "trial.Trial") -> Tuple[int, int]:
     return fig_height, n_subplots
 
 
-def _plot_trial(spike2py_trial: "trial.Trial", ax: plt.Axes):
+def _plot_trial(spike2py_trial: "trial.Trial", ax: plt.Axes, interactive: bool = False):
     waveform_counter = 1
     other_ch_counter = 0
     n_subplots = len(ax)
     for channel, channel_type in spike2py_trial.channels:
-        current_channel = spike2py_trial.__getattribute__(channel)
+        current_channel = getattr(spike2py_trial, channel)
         if channel_type == "waveform":
             _plot_waveform(
                 waveform=current_channel,
                 ax=ax[n_subplots - waveform_counter],
                 color=_get_color(waveform_counter - 1),
+                interactive=interactive,
             )
             waveform_counter += 1
         elif len(current_channel.times) != 0:
@@ -0,0 +1,317 @@
+"""Opt-in timing and memory instrumentation of reading, processing and plotting
+
+Stages of :mod:`spike2py.read`, :mod:`spike2py.trial`,
+:mod:`spike2py.sig_proc` and :mod:`spike2py.plot` are wrapped with
+:func:`stage`. While profiling is disabled (the default) a wrapped stage costs
+one flag check; once enabled, each call produces a :class:`StageRecord` that is:
+
+- added to the `profile` of the trial it was run on (e.g. ``trial1.profile``),
+- added to the profile of any enclosing :func:`profile` context,
+- passed to every callback registered with :func:`add_callback`.
+
+For example::
+
+    with spike2py.profiling.profile(memory=True) as prof:
+        trial1 = spike2py.trial.Trial(info)
+        trial1.Emg.lowpass(20)
+    print(prof)
+"""
+
+import contextlib
+import functools
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, NamedTuple
+
+import numpy as np
+
+stage_callback = Callable[["StageRecord"], None]
+
+_enabled = False
+_trace_memory = False
+_started_tracemalloc = False
+_callbacks: List[stage_callback] = list()
+_local = threading.local()
+
+
+class StageRecord(NamedTuple):
+    """Timing and memory of one call of an instrumented stage
+
+    stage
+        Name of the stage, e.g. 'read.read_channel' or 'sig_proc.lowpass'
+    label
+        What the stage was run on, usually a channel or trial name; may be None
+    seconds
+        Wall time of the call
+    allocated_bytes
+        Peak memory traced by `tracemalloc` during the call, above what was
+        allocated when it started; None unless memory profiling is enabled
+    array_bytes
+        Size of the NumPy arrays returned by the call (or held by the object
+        it returned)
+    """
+
+    stage: str
+    label: str
+    seconds: float
+    allocated_bytes: int
+    array_bytes: int
+
+
+class StageSummary(NamedTuple):
+    """Totals of all records of one stage; see :meth:`Profile.summary`"""
+
+    calls: int
+    seconds: float
+    allocated_bytes: int
+    array_bytes: int
+
+
+class Profile:
+    """Stage records collected while profiling was enabled"""
+
+    def __init__(self) -> None:
+        self.records: List[StageRecord] = list()
+
+    def __repr__(self) -> str:
+        lines = [
+            f"{'stage':<32}{'calls':>7}{'seconds':>11}{'peak MB':>10}{'arrays MB':>11}"
+        ]
+        for name, summary in self.summary().items():
+            peak = "-"
+            if summary.allocated_bytes is not None:
+                peak = f"{summary.allocated_bytes / 1e6:.2f}"
+            lines.append(
+                f"{name:<32}{summary.calls:>7}{summary.seconds:>11.4f}{peak:>10}"
+                f"{summary.array_bytes / 1e6:>11.2f}"
+            )
+        return "\n".join(lines)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[StageRecord]:
+        return iter(self.records)
+
+    def add(self, record: StageRecord) -> None:
+        self.records.append(record)
+
+    def clear(self) -> None:
+        self.records.clear()
+
+    def summary(self) -> Dict[str, StageSummary]:
+        """Number of calls, total time, largest peak and total array size per stage
+
+        Time of nested stages is included in the stages that called them (e.g.
+        'trial.create_channel' includes 'read.read_channel').
+        """
+        summaries = dict()
+        for record in self.records:
+            calls, seconds, allocated, array_bytes = summaries.get(
+                record.stage, (0, 0.0, None, 0)
+            )
+            if record.allocated_bytes is not None:
+                allocated = max(allocated or 0, record.allocated_bytes)
+            summaries[record.stage] = StageSummary(
+                calls + 1,
+                seconds + record.seconds,
+                allocated,
+                array_bytes + record.array_bytes,
+            )
+        return summaries
+
+
+def enable(memory: bool = False) -> None:
+    """Record instrumented stages until :func:`disable` is called
+
+    Parameters
+    ----------
+    memory
+        Also record peak allocated memory with `tracemalloc`. This slows down
+        Python allocations, so timings are less representative.
+    """
+    global _enabled, _trace_memory, _started_tracemalloc
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _trace_memory = memory
+    _enabled = True
+
+
+def disable() -> None:
+    """Stop recording stages (and stop `tracemalloc` if :func:`enable` started it)"""
+    global _enabled, _trace_memory, _started_tracemalloc
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    _enabled = False
+    _trace_memory = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def add_callback(callback: stage_callback) -> None:
+    """Pass every :class:`StageRecord` to `callback`, e.g. to export metrics
+
+    Callbacks are called in the thread that ran the stage, while profiling
+    is enabled, so they should be quick.
+    """
+    _callbacks.append(callback)
+
+
+def remove_callback(callback: stage_callback) -> None:
+    _callbacks.remove(callback)
+
+
+@contextlib.contextmanager
+def profile(memory: bool = False) -> Iterator[Profile]:
+    """Enable profiling and collect the stages run in this thread within the context
+
+    Profiling is restored to its previous state on exit.
+
+    Parameters
+    ----------
+    memory
+        Also record peak allocated memory; see :func:`enable`
+    """
+    global _trace_memory, _started_tracemalloc
+    was_enabled, traced_memory = _enabled, _trace_memory
+    had_started_tracemalloc = _started_tracemalloc
+    enable(memory or traced_memory)
+    collected = Profile()
+    _collectors().append(collected)
+    try:
+        yield collected
+    finally:
+        _collectors().remove(collected)
+        if not was_enabled:
+            disable()
+        else:
+            if _started_tracemalloc and not had_started_tracemalloc:
+                tracemalloc.stop()
+                _started_tracemalloc = False
+            _trace_memory = traced_memory
+
+
+def stage(name: str, label: Callable[..., str] = None) -> Callable:
+    """Decorator that records calls of the decorated function as stage `name`
+
+    Parameters
+    ----------
+    name
+        Stage name, by convention '<module>.<function>'
+    label
+        Function of the decorated function's arguments returning what the
+        stage was run on. Defaults to the name of the channel or trial passed
+        as first argument.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            return _run_stage(name, label, func, args, kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _run_stage(name: str, label: Callable, func: Callable, args, kwargs):
+    collectors = _collectors()
+    owner = _owner_profile(args)
+    pushed = (owner is not None) and all(owner is not item for item in collectors)
+    if pushed:
+        collectors.append(owner)
+    try:
+        memory = _trace_memory and tracemalloc.is_tracing()
+        if memory:
+            frame = _start_memory_frame()
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            allocated_bytes = _stop_memory_frame(frame) if memory else None
+        record = StageRecord(
+            name,
+            label(*args, **kwargs) if label else _default_label(args),
+            seconds,
+            allocated_bytes,
+            _array_bytes(result),
+        )
+        for collector in collectors:
+            collector.add(record)
+    finally:
+        if pushed:
+            collectors.pop()
+    for callback in list(_callbacks):
+        callback(record)
+    return result
+
+
+def _collectors() -> List[Profile]:
+    return _local.__dict__.setdefault("collectors", list())
+
+
+def _start_memory_frame() -> List[int]:
+    """Memory at the start of a stage and the largest peak of its nested stages
+
+    `tracemalloc` has a single peak, reset at the start of every stage; the
+    peak reached so far is kept by the enclosing stage before it is reset.
+    """
+    frames = _local.__dict__.setdefault("memory_frames", list())
+    current, peak = tracemalloc.get_traced_memory()
+    if frames:
+        frames[-1][1] = max(frames[-1][1], peak)
+    tracemalloc.reset_peak()
+    frame = [current, current]
+    frames.append(frame)
+    return frame
+
+
+def _stop_memory_frame(frame: List[int]) -> int:
+    frames = _local.memory_frames
+    peak = max(tracemalloc.get_traced_memory()[1], frame[1])
+    frames.remove(frame)
+    if frames:
+        frames[-1][1] = max(frames[-1][1], peak)
+    return peak - frame[0]
+
+
+def _owner_profile(args) -> Profile:
+    """Profile of the trial or channel passed as first argument, if any"""
+    if not args:
+        return None
+    owner = args[0]
+    if isinstance(owner, (list, tuple)):
+        owner = owner[0] if owner else None
+    owner_profile = getattr(owner, "profile", None)
+    return owner_profile if isinstance(owner_profile, Profile) else None
+
+
+def _default_label(args) -> str:
+    if not args:
+        return None
+    owners = args[0] if isinstance(args[0], (list, tuple)) else [args[0]]
+    names = [getattr(getattr(owner, "info", None), "name", None) for owner in owners]
+    names = [str(name) for name in names if name is not None]
+    return ",".join(names) if names else None
+
+
+def _array_bytes(result) -> int:
+    """Bytes of distinct arrays in `result`, its values (dict) or its attributes"""
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, dict):
+        items = result.values()
+    elif hasattr(result, "__dict__"):
+        items = vars(result).values()
+    else:
+        return 0
+    arrays = {id(item): item for item in items if isinstance(item, np.ndarray)}
+    return sum(array.nbytes for array in arrays.values())
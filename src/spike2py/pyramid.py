@@ -0,0 +1,248 @@
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+DEFAULT_BASE_BLOCK = 16
+
+
+class PyramidLevel(NamedTuple):
+    """Per-block summaries of a signal at one resolution
+
+    block_size
+        Number of samples summarised by each block (the last block may be shorter)
+    min, max, sum, sum_sq
+        Minimum, maximum, sum and sum of squares of each block
+    """
+
+    block_size: int
+    min: np.ndarray
+    max: np.ndarray
+    sum: np.ndarray
+    sum_sq: np.ndarray
+
+
+class WindowedStats(NamedTuple):
+    """Statistics of consecutive windows of a Waveform
+
+    times
+        Start time of each window in seconds
+    min, max, mean, rms
+        Minimum, maximum, mean and root-mean-square value of each window
+    """
+
+    times: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+    mean: np.ndarray
+    rms: np.ndarray
+
+
+class SummaryPyramid:
+    """Multi-resolution min/max/mean/RMS summary of a Waveform
+
+    The finest level summarises blocks of `base_block` samples and is computed
+    in a single pass over `values`. Each coarser level halves the number of
+    blocks by combining pairs of blocks from the level below, so the whole
+    pyramid costs about 1/`base_block` of the memory of the signal.
+
+    Parameters
+    ----------
+    values
+        Waveform values
+    start_time
+        Time of the first sample in seconds
+    sampling_frequency
+        In Hertz
+    base_block
+        Number of samples per block in the finest level; must be a power of two
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        start_time: float,
+        sampling_frequency: int,
+        base_block: int = DEFAULT_BASE_BLOCK,
+    ) -> None:
+        if (base_block < 1) or (base_block & (base_block - 1)):
+            raise ValueError("base_block must be a power of two")
+        self.n_samples = len(values)
+        self.start_time = start_time
+        self.sampling_frequency = sampling_frequency
+        self.levels = _build_levels(np.asarray(values, dtype=float), base_block)
+
+    def __repr__(self) -> str:
+        block_sizes = [level.block_size for level in self.levels]
+        return f"SummaryPyramid(n_samples={self.n_samples}, block_sizes={block_sizes})"
+
+    def windowed_stats(self, window: float, values: np.ndarray = None) -> WindowedStats:
+        """Min, max, mean and RMS of consecutive windows of `window` seconds
+
+        Windows start at the first sample; the last window may be shorter.
+        Whole blocks of the most suitable level are used inside each window and
+        only the partial blocks at window edges are read from `values`, so the
+        cost depends on the number of windows rather than the number of
+        samples. If `values` is not given, or the window length is a multiple
+        of a block size, results come from the pyramid alone.
+
+        Parameters
+        ----------
+        window
+            Window length in seconds
+        values
+            The values the pyramid was built from, used for partial blocks
+        """
+        window_samples = int(round(window * self.sampling_frequency))
+        if window_samples < 1:
+            raise ValueError("window must be at least one sample long")
+        starts = np.arange(0, self.n_samples, window_samples)
+        stops = np.minimum(starts + window_samples, self.n_samples)
+        level = self._level_for_window(window_samples, values is not None)
+        block_size = level.block_size
+        block_starts = -(-starts // block_size)
+        block_stops = stops // block_size
+        block_stops[stops == self.n_samples] = len(level.min)
+        block_stops = np.maximum(block_stops, block_starts)
+        stats = {
+            name: _reduce_ranges(ufunc, getattr(level, name), block_starts, block_stops)
+            for name, ufunc in _REDUCTIONS.items()
+        }
+        if values is not None:
+            edges = [
+                (starts, np.minimum(block_starts * block_size, stops)),
+                (block_stops * block_size, stops),
+            ]
+            for edge_starts, edge_stops in edges:
+                edge_starts = np.minimum(edge_starts, stops)
+                edge_stops = np.clip(edge_stops, edge_starts, stops)
+                _combine(stats, _raw_stats(values, edge_starts, edge_stops))
+        counts = stops - starts
+        return WindowedStats(
+            times=self.start_time + starts / self.sampling_frequency,
+            min=stats["min"],
+            max=stats["max"],
+            mean=stats["sum"] / counts,
+            rms=np.sqrt(stats["sum_sq"] / counts),
+        )
+
+    def envelope(
+        self, n_columns: int, first: int = 0, last: int = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Min/max envelope with at least `n_columns` blocks, for plotting
+
+        Returns times and values alternating between the minimum and maximum
+        of each block of the coarsest level with at least `n_columns` blocks
+        between samples `first` and `last` (defaults to the whole signal).
+        Blocks partly inside the range are included.
+        """
+        last = self.n_samples if last is None else last
+        level = self.levels[0]
+        for candidate in self.levels:
+            if (last - first) / candidate.block_size >= n_columns:
+                level = candidate
+        first_block = first // level.block_size
+        last_block = -(-last // level.block_size)
+        block_times = (
+            self.start_time
+            + np.arange(first_block, last_block)
+            * level.block_size
+            / self.sampling_frequency
+        )
+        times = np.repeat(block_times, 2)
+        values = np.column_stack(
+            [level.min[first_block:last_block], level.max[first_block:last_block]]
+        ).ravel()
+        return times, values
+
+    def _level_for_window(
+        self, window_samples: int, partial_blocks: bool
+    ) -> PyramidLevel:
+        """Level with the fewest blocks plus edge samples to read per window"""
+
+        def cost(level: PyramidLevel) -> float:
+            aligned = window_samples % level.block_size == 0
+            return window_samples / level.block_size + (
+                0 if aligned else 2 * level.block_size
+            )
+
+        candidates = self.levels
+        if not partial_blocks:
+            candidates = [
+                level for level in self.levels if window_samples % level.block_size == 0
+            ]
+        if not candidates:
+            raise ValueError(
+                "Window length is not a multiple of any block size; "
+                "pass `values` to read partial blocks from the signal"
+            )
+        return min(candidates, key=cost)
+
+
+_REDUCTIONS = {
+    "min": np.minimum,
+    "max": np.maximum,
+    "sum": np.add,
+    "sum_sq": np.add,
+}
+
+
+def _build_levels(values: np.ndarray, base_block: int) -> List[PyramidLevel]:
+    n_full = len(values) // base_block
+    n_blocked = n_full * base_block
+    blocks = values[:n_blocked].reshape(n_full, base_block)
+    summaries = [
+        blocks.min(axis=1),
+        blocks.max(axis=1),
+        blocks.sum(axis=1),
+        np.einsum("ij,ij->i", blocks, blocks),
+    ]
+    last = values[n_blocked:]
+    if len(last):
+        tail = [last.min(), last.max(), last.sum(), np.dot(last, last)]
+        summaries = [np.append(summary, end) for summary, end in zip(summaries, tail)]
+    levels = [PyramidLevel(base_block, *summaries)]
+    while len(levels[-1].min) > 1:
+        levels.append(_coarsen(levels[-1]))
+    return levels
+
+
+def _coarsen(level: PyramidLevel) -> PyramidLevel:
+    pair_starts = np.arange(0, len(level.min), 2)
+    return PyramidLevel(
+        level.block_size * 2,
+        np.minimum.reduceat(level.min, pair_starts),
+        np.maximum.reduceat(level.max, pair_starts),
+        np.add.reduceat(level.sum, pair_starts),
+        np.add.reduceat(level.sum_sq, pair_starts),
+    )
+
+
+def _reduce_ranges(
+    ufunc: np.ufunc, array: np.ndarray, starts: np.ndarray, stops: np.ndarray
+) -> np.ndarray:
+    """Reduce array[starts[i]:stops[i]] for every i with a single reduceat call"""
+    identity = {np.minimum: np.inf, np.maximum: -np.inf, np.add: 0.0}[ufunc]
+    extended = np.append(array, identity)
+    indices = np.column_stack([starts, stops]).ravel()
+    reduced = ufunc.reduceat(extended, indices)[::2]
+    return np.where(stops > starts, reduced, identity)
+
+
+def _raw_stats(values: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> dict:
+    """Statistics of values[starts[i]:stops[i]], reading only those samples"""
+    lengths = stops - starts
+    offsets = np.cumsum(lengths) - lengths
+    indices = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+    gathered = np.asarray(values[indices], dtype=float)
+    gathered_stops = offsets + lengths
+    return {
+        "min": _reduce_ranges(np.minimum, gathered, offsets, gathered_stops),
+        "max": _reduce_ranges(np.maximum, gathered, offsets, gathered_stops),
+        "sum": _reduce_ranges(np.add, gathered, offsets, gathered_stops),
+        "sum_sq": _reduce_ranges(np.add, gathered**2, offsets, gathered_stops),
+    }
+
+
+def _combine(stats: dict, other: dict) -> None:
+    for name, ufunc in _REDUCTIONS.items():
+        stats[name] = ufunc(stats[name], other[name])
@@ -1,11 +1,26 @@
+import logging
 import sys
 from pathlib import Path
 import textwrap
-from typing import List, Final
+from typing import Dict, Iterator, List, Final, NamedTuple, Tuple
 
 import scipy.io as sio
 import numpy as np
 
+try:
+    # Private SciPy readers, used to read variable headers without their data.
+    # If a SciPy release changes them, whole variables are read with loadmat.
+    from scipy.io.matlab._mio5 import MatFile5Reader
+    from scipy.io.matlab._mio5_params import (
+        mxCHAR_CLASS,
+        mxDOUBLE_CLASS,
+        mxSTRUCT_CLASS,
+        mxUINT64_CLASS,
+    )
+except ImportError:
+    MatFile5Reader = None
+
+from spike2py import profiling
 from spike2py.types import (
     mat_data,
     parsed_wavemark,
@@ -26,12 +41,76 @@ CHANNEL_DATA_LENGTH: Final = {
 }
 
 
+CHANNEL_TYPES: Final = {
+    length: ch_type for ch_type, length in CHANNEL_DATA_LENGTH.items()
+}
+
+
+HEADER_FIELDS: Final = {
+    "event": ("times", "length"),
+    "keyboard": ("times", "length"),
+    "textmark": ("times", "length"),
+    "waveform": ("interval", "units", "start", "length"),
+    "wavemark": ("interval", "units", "times", "length"),
+}
+
+# Raised by the private SciPy readers if their API changed
+READER_ERRORS: Final = (ImportError, AttributeError, TypeError)
+
+_log = logging.getLogger(__name__)
+
+
 class WrongFileType(Exception):
     """Custom exception to use when `.mat` file not provided"""
 
     pass
 
 
+class ChannelLocation(NamedTuple):
+    """Where a channel is stored in a data file
+
+    name
+        Channel name, as it appeared in the original .smr file
+    ch_type
+        'event', 'keyboard', 'textmark', 'waveform' or 'wavemark'
+    offset
+        Byte offset of the channel variable in the .mat file; None if the
+        file was indexed with `scipy.io.loadmat`
+    """
+
+    name: str
+    ch_type: str
+    offset: int
+
+
+class ChannelHeader(NamedTuple):
+    """Metadata of a channel, read without its data; see :func:`headers`
+
+    name
+        Channel name, as it appeared in the original .smr file
+    ch_type
+        'event', 'keyboard', 'textmark', 'waveform' or 'wavemark'
+    units
+        Units of Waveform and Wavemark channels; None if not recorded
+    sampling_frequency
+        Sampling frequency of Waveform and Wavemark channels, in Hertz
+    length
+        Number of samples (Waveform) or of events, spikes or markers
+    start, end
+        Time span of the channel in seconds; event-like channels start at 0
+        and end at their last event
+    """
+
+    name: str
+    ch_type: str
+    units: str
+    sampling_frequency: int
+    length: int
+    start: float
+    end: float
+
+
+@profiling.stage("read.read")
 def read(file: Path, channels: List[str] = None) -> parsed_spike2py_data:
     """Interface to read data files
 
@@ -56,15 +135,293 @@ def read(file: Path, channels: List[str] = None) -> parsed_spike2py_data:
         are deeply nested numpy.ndarray
     """
 
+    _check_file_type(file)
+    return _parse_mat_data(_read_mat(file, channels))
+
+
+@profiling.stage("read.index")
+def index(file: Path, channels: List[str] = None) -> Dict[str, ChannelLocation]:
+    """Names, types and byte locations of channels, without reading their data
+
+    Only the header of each variable in the .mat file is read, so indexing
+    costs the same whatever the length of the recording.
+    Channels can then be read one at a time with :func:`read_channel`.
+
+    Parameters
+    ----------
+    file
+        Absolute path to data file. Only .mat files are currently supported.
+    channels
+        List of channel names, as they appeared in the original .smr file.
+        If not included, all channels are indexed.
+
+    Raises
+    ------
+    WrongFileType
+        `file` parameter is not a MATLAB 5 (or 7) `.mat` file
+
+    Returns
+    -------
+    dict
+        Channel locations with channel names as `keys`, in file order
+    """
+    file = Path(file)
+    try:
+        variables = [variable[:3] for variable in _struct_variables(file)]
+    except READER_ERRORS as error:
+        _log_reader_fallback(error)
+        variables = [
+            (name, None, fields) for name, fields in _loadmat_fields(file).items()
+        ]
+    locations = dict()
+    all_channels = list()
+    for name, offset, field_names in variables:
+        all_channels.append(name)
+        if _channel_type(name, field_names, file) is not None:
+            locations[name] = ChannelLocation(
+                name, CHANNEL_TYPES[len(field_names)], offset
+            )
+    if channels is None:
+        return locations
+    _verify_channels_exists(channels, all_channels, file)
+    return {name: location for name, location in locations.items() if name in channels}
+
+
+@profiling.stage("read.headers")
+def headers(file: Path, channels: List[str] = None) -> Dict[str, ChannelHeader]:
+    """Type, units, sampling frequency, length and time span of each channel
+
+    Only the small metadata fields that Spike2 writes before the data of each
+    channel (and the times of event-like channels) are read, so the samples
+    of Waveform channels are never decompressed.
+
+    Parameters
+    ----------
+    file
+        Absolute path to data file. Only .mat files are currently supported.
+    channels
+        List of channel names, as they appeared in the original .smr file.
+        If not included, all channels are read.
+
+    Returns
+    -------
+    dict
+        Channel headers with channel names as `keys`, in file order
+    """
+    file = Path(file)
+    try:
+        variables = list(_header_fields(file))
+    except READER_ERRORS as error:
+        _log_reader_fallback(error)
+        variables = [
+            (name, list(fields), fields)
+            for name, fields in _loadmat_fields(file, read_fields=True).items()
+        ]
+    channel_headers = dict()
+    all_channels = list()
+    for name, field_names, fields in variables:
+        all_channels.append(name)
+        ch_type = _channel_type(name, field_names, file)
+        if (ch_type is None) or ((channels is not None) and (name not in channels)):
+            continue
+        channel_headers[name] = _channel_header(name, ch_type, fields)
+    if channels is not None:
+        _verify_channels_exists(channels, all_channels, file)
+    return channel_headers
+
+
+def _header_fields(
+    file: Path,
+) -> Iterator[Tuple[str, List[str], Dict[str, np.ndarray]]]:
+    """Name, field names and header fields of each variable of a .mat file"""
+    for name, _, field_names, reader in _struct_variables(file):
+        fields = dict()
+        ch_type = CHANNEL_TYPES.get(len(field_names))
+        if ch_type is not None:
+            fields = _read_fields(reader, field_names, HEADER_FIELDS[ch_type])
+        yield name, field_names, fields
+
+
+def _channel_type(name: str, field_names: List[str], file: Path) -> str:
+    """Channel type of a variable, given its field names; None if not a channel"""
+    ch_type = CHANNEL_TYPES.get(len(field_names))
+    if ch_type is None:
+        _log.warning(
+            "Skipping variable %s of %s: not a Spike2 channel (fields: %s)",
+            name,
+            Path(file).name,
+            ", ".join(field_names) or "none",
+        )
+    return ch_type
+
+
+def _loadmat_fields(file: Path, read_fields: bool = False) -> Dict[str, Dict]:
+    """Field names (and values if `read_fields`) of variables, read with loadmat
+
+    Slower than reading headers, as the data of every variable is read.
+    """
+    try:
+        data = sio.loadmat(file)
+    except OSError:
+        print(
+            f"File {file.name} not found. Please verify path and file name and try again."
+        )
+        sys.exit(1)
+    variables = dict()
+    for name, value in data.items():
+        if name.startswith("__"):
+            continue
+        field_names = value.dtype.names or ()
+        variables[name] = {
+            field: (value[field][0, 0] if read_fields else None)
+            for field in field_names
+        }
+    return variables
+
+
+def _log_reader_fallback(error: Exception) -> None:
+    _log.warning(
+        "Cannot read .mat headers with this SciPy version (%s: %s); "
+        "reading whole variables with scipy.io.loadmat instead",
+        type(error).__name__,
+        error,
+    )
+
+
+def _struct_variables(file: Path):
+    """Name, byte offset, field names and reader of each struct in a .mat file
+
+    The reader is positioned after the field names of the struct; the file is
+    moved to the next variable once the caller is done with it.
+    """
+    _check_file_type(file)
+    try:
+        mat_file = open(file, "rb")
+    except OSError:
+        print(
+            f"File {file.name} not found. Please verify path and file name and try again."
+        )
+        sys.exit(1)
+    with mat_file:
+        try:
+            major_version = sio.matlab.matfile_version(mat_file)[0]
+        except (sio.matlab.MatReadError, IndexError, ValueError):
+            major_version = None
+        if major_version != 1:
+            raise WrongFileType(
+                f"{file.name} is not a MATLAB 5 file."
+                "\nIn Spike2 export the data to .mat and start over."
+            )
+        reader = _mat_reader(mat_file)
+        mat_file.seek(0)
+        reader.initialize_read()
+        reader.read_file_header()
+        while not reader.end_of_stream():
+            offset = mat_file.tell()
+            header, next_position = reader.read_var_header()
+            name = header.name.decode("latin1")
+            field_names = list()
+            if header.mclass == mxSTRUCT_CLASS:
+                field_names = reader._matrix_reader.read_fieldnames()
+            yield name, offset, field_names, reader
+            mat_file.seek(next_position)
+
+
+def _mat_reader(mat_file) -> "MatFile5Reader":
+    if MatFile5Reader is None:
+        raise ImportError("scipy.io.matlab._mio5 is not available")
+    return MatFile5Reader(mat_file)
+
+
+def _read_fields(
+    reader: "MatFile5Reader", field_names: List[str], wanted: Tuple[str, ...]
+) -> Dict[str, np.ndarray]:
+    """Read struct fields in file order until all `wanted` fields are read"""
+    matrix_reader = reader._matrix_reader
+    fields = dict()
+    for field_name in field_names:
+        if all(name in fields for name in wanted):
+            break
+        _, n_bytes = matrix_reader.read_full_tag()
+        if n_bytes == 0:
+            fields[field_name] = np.empty(0)
+            continue
+        header = matrix_reader.read_header(True)
+        if header.mclass == mxCHAR_CLASS:
+            fields[field_name] = matrix_reader.read_char(header)
+        elif mxDOUBLE_CLASS <= header.mclass <= mxUINT64_CLASS:
+            fields[field_name] = matrix_reader.read_real_complex(header)
+        else:
+            break
+    return fields
+
+
+def _channel_header(
+    name: str, ch_type: str, fields: Dict[str, np.ndarray]
+) -> ChannelHeader:
+    units = "".join(fields.get("units", np.empty(0)).flatten()) or None
+    if ch_type == "wavemark":
+        # Spike2's wavemark length is the number of samples per action potential
+        length = len(fields["times"].flatten())
+    else:
+        length = int(fields["length"].flatten()[0]) if fields["length"].size else 0
+    sampling_frequency = None
+    if ch_type in ("waveform", "wavemark"):
+        interval = float(fields["interval"].flatten()[0])
+        sampling_frequency = int(1 / interval)
+    if ch_type == "waveform":
+        # The rounded sampling frequency would shift the end of long recordings
+        start = float(fields["start"].flatten()[0]) if fields["start"].size else 0.0
+        end = start + length * interval
+    else:
+        times = fields["times"].flatten()
+        start = 0.0
+        end = float(times.max()) if times.size else 0.0
+    return ChannelHeader(name, ch_type, units, sampling_frequency, length, start, end)
+
+
+@profiling.stage("read.read_channel", label=lambda file, location: location.name)
+def read_channel(file: Path, location: ChannelLocation) -> parsed_mat_data:
+    """Read and parse a single channel found by :func:`index`
+
+    Parameters
+    ----------
+    file
+        Absolute path to data file
+    location
+        Location of the channel, from :func:`index`
+
+    Returns
+    -------
+    dict
+        Channel data and metadata, as returned for each channel by :func:`read`
+    """
+    channel_data = None
+    if location.offset is not None:
+        try:
+            with open(file, "rb") as mat_file:
+                reader = _mat_reader(mat_file)
+                reader.initialize_read()
+                mat_file.seek(location.offset)
+                header, _ = reader.read_var_header()
+                channel_data = reader.read_var_array(header)
+        except READER_ERRORS as error:
+            _log_reader_fallback(error)
+    if channel_data is None:
+        channel_data = sio.loadmat(file, variable_names=[location.name])[location.name]
+    return _parse_mat_data({location.name: channel_data})[location.name]
+
+
+def _check_file_type(file: Path) -> None:
     file_extension = Path(file).suffix
     if file_extension != ".mat":
         raise WrongFileType(
             f"Processing {file_extension} files is not supported."
             "\nIn Spike2 export the data to .mat and start over."
         )
-    return _parse_mat_data(_read_mat(file, channels))
 
 
+@profiling.stage("read.loadmat")
 def _read_mat(mat_file: Path, channels: List[str]) -> mat_data:
     """Read Spike2 data exported to a Matlab .mat file
 
@@ -139,6 +496,7 @@ def _parse_mat_data(mat_data: mat_data) -> parsed_mat_data:
     return parsed_data
 
 
+@profiling.stage("read.parse_event")
 def _parse_mat_events(mat_events: np.ndarray) -> parsed_event:
     """Parse event channel data as exported by Spike2 to .mat
 
@@ -163,6 +521,7 @@ def _flatten_array(array):
     return array[0][0].flatten()
 
 
+@profiling.stage("read.parse_keyboard")
 def _parse_mat_keyboard(mat_keyboard: np.ndarray) -> parsed_keyboard:
     """Parse keyboard channel data as exported by Spike2 to .mat
 
@@ -188,6 +547,7 @@ def _parse_mat_keyboard(mat_keyboard: np.ndarray) -> parsed_keyboard:
     }
 
 
+@profiling.stage("read.parse_textmark")
 def _parse_mat_textmark(mat_textmark: np.ndarray) -> parsed_textmark:
     """Parse textmark ('Memory') channel data as exported by Spike2 to .mat
 
@@ -233,6 +593,7 @@ def _keyboard_codes_to_characters(keyboard_codes: List[int]) -> List[str]:
     ]
 
 
+@profiling.stage("read.parse_waveform")
 def _parse_mat_waveform(mat_waveform: np.ndarray) -> parsed_waveform:
     """Parse waveform channel data as exported by Spike2 to .mat
 
@@ -262,6 +623,7 @@ def _parse_mat_waveform(mat_waveform: np.ndarray) -> parsed_waveform:
     }
 
 
+@profiling.stage("read.parse_wavemark")
 def _parse_mat_wavemark(mat_wavemark: np.ndarray) -> parsed_wavemark:
     """Parse wavemark channel data as exported by Spike2 to .mat
 
@@ -280,6 +642,7 @@ def _parse_mat_wavemark(mat_wavemark: np.ndarray) -> parsed_wavemark:
     times = None
     sampling_frequency = None
     action_potentials = None
+    codes = None
 
     units_flattened = _flatten_array(mat_wavemark["units"])
 
@@ -288,15 +651,26 @@ def _parse_mat_wavemark(mat_wavemark: np.ndarray) -> parsed_wavemark:
         times = mat_wavemark["times"][0][0].flatten()
         sampling_frequency = int(1 / mat_wavemark["interval"][0][0].flatten()[0])
         action_potentials = _extract_wavemarks(mat_wavemark)
+        if "codes" in mat_wavemark.dtype.names:
+            codes = _extract_unit_codes(mat_wavemark, len(times))
     return {
         "units": units,
         "times": times,
         "sampling_frequency": sampling_frequency,
         "action_potentials": action_potentials,
+        "codes": codes,
         "ch_type": "wavemark",
     }
 
 
+def _extract_unit_codes(mat_wavemark: np.ndarray, n_spikes: int) -> np.ndarray:
+    """Unit assigned to each wavemark: the first of its four Spike2 marker codes"""
+    codes = mat_wavemark["codes"][0][0]
+    if codes.size == 0:
+        return None
+    return codes.reshape(n_spikes, -1)[:, 0].astype(int)
+
+
 def _extract_wavemarks(mat_wavemark: np.ndarray) -> List[List[int]]:
     """Helper function to flatten, extract and group wavemark values"""
     template_length = int(_flatten_array(mat_wavemark["length"])[0])
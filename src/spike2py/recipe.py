@@ -0,0 +1,432 @@
+"""Declarative processing recipes, run over every trial of a study
+
+A recipe selects channels, lists the processing steps to apply to them (the
+methods of :class:`spike2py.sig_proc.SignalProcessing`, in order) and the
+outputs to write for each trial. Recipes are written in JSON or YAML::
+
+    channels:
+      - select: "Emg*"
+        steps:
+          - remove_mean
+          - blank_artefacts: {event_times: Stim, pre: 0.001, post: 0.004}
+          - bandpass: {cutoff: [20, 450]}
+          - rect
+          - lowpass: {cutoff: 6}
+    outputs:
+      save: true
+      figures: png
+      epochs: {select: "Emg*", events: Stim, pre: 0.01, post: 0.05}
+
+`select` is a shell-style pattern matched against channel names (case
+insensitive); an optional `type` (e.g. waveform) restricts it further. A step
+is either a method name or a mapping of a method name to its parameters; a
+channel name given as `event_times` stands for that channel. Outputs are the
+saved trial (:meth:`spike2py.trial.Trial.save`), trial and channel figures
+('png' or 'pdf', see :func:`spike2py.export.export_figures`) and epochs of
+selected channels around events, saved with `numpy.savez`.
+
+:func:`run` applies a recipe to every trial of a directory, catalogue or list
+of files, in parallel, and skips trials whose outputs are up to date. From
+the command line (see :mod:`spike2py.cli`)::
+
+    spike2py process recipe.yaml /data/study --workers 8
+"""
+
+import fnmatch
+import functools
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Literal, NamedTuple, Sequence, Tuple, Union
+
+import numpy as np
+
+from spike2py import aggregate, catalogue, memo, sig_proc, trial
+
+RECIPE_SUFFIX = ".recipe.json"
+EPOCHS_SUFFIX = "_epochs.npz"
+STEPS = tuple(
+    name
+    for name in dir(sig_proc.SignalProcessing)
+    if not name.startswith("_") and callable(getattr(sig_proc.SignalProcessing, name))
+)
+# Steps applied to all the selected channels at once, by the sig_proc function
+MULTI_CHANNEL_STEPS = ("blank_artefacts", "remove_line_noise")
+
+
+class ChannelSteps(NamedTuple):
+    """Processing steps applied to the channels matching `select` and `ch_type`"""
+
+    select: str
+    ch_type: str
+    steps: List[Tuple[str, Dict]]
+
+
+class EpochOutput(NamedTuple):
+    """Epochs of the channels matching `select`, around the times of `events`"""
+
+    select: str
+    events: str
+    pre: float
+    post: float
+
+
+class Outputs(NamedTuple):
+    """Outputs written for each trial"""
+
+    save: bool = False
+    figures: Literal["png", "pdf"] = None
+    epochs: EpochOutput = None
+
+
+class Recipe(NamedTuple):
+    """Parsed recipe; see the module documentation for its format
+
+    channels
+        Processing steps of each channel selection, applied in order
+    outputs
+        Outputs written for each trial
+    """
+
+    channels: List[ChannelSteps]
+    outputs: Outputs
+
+    @property
+    def digest(self) -> str:
+        """Hash of the recipe, used to tell whether outputs are up to date"""
+        text = json.dumps(_to_json(self), sort_keys=True, default=memo.canonical)
+        return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+
+class TrialReport(NamedTuple):
+    """Result of running a recipe on one trial
+
+    status
+        'done', 'skipped' (outputs up to date) or 'failed'
+    """
+
+    file: Path
+    status: Literal["done", "skipped", "failed"]
+    seconds: float
+    error: str = None
+
+
+class RunReport(NamedTuple):
+    """Results of :func:`run`, one per trial"""
+
+    trials: List[TrialReport]
+
+    def count(self, status: str) -> int:
+        return sum(report.status == status for report in self.trials)
+
+    def __repr__(self) -> str:
+        lines = [f"{'trial':<40}{'status':>10}{'s':>10}"]
+        for report in self.trials:
+            error = f"  {report.error}" if report.error else ""
+            lines.append(
+                f"{Path(report.file).name:<40}{report.status:>10}"
+                f"{report.seconds:>10.2f}{error}"
+            )
+        lines.append(
+            f"{self.count('done')} done, {self.count('skipped')} skipped, "
+            f"{self.count('failed')} failed"
+        )
+        return "\n".join(lines)
+
+
+def read_recipe(file: Union[Path, str]) -> Recipe:
+    """Read a recipe from a .json, .yaml or .yml file
+
+    YAML recipes need the PyYAML package (`pip install pyyaml`).
+    """
+    file = Path(file)
+    text = file.read_text()
+    if file.suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as error:
+            raise ImportError("Reading YAML recipes requires PyYAML") from error
+        return parse(yaml.safe_load(text))
+    return parse(json.loads(text))
+
+
+def parse(recipe: Dict) -> Recipe:
+    """Recipe from its dict form (e.g. loaded from JSON)
+
+    Raises
+    ------
+    ValueError
+        If the recipe has unknown keys, steps or output formats
+    """
+    _check_keys(recipe, {"channels", "outputs"}, "recipe")
+    channels = list()
+    for selection in recipe.get("channels", []):
+        _check_keys(selection, {"select", "type", "steps"}, "channel selection")
+        steps = [_parse_step(step) for step in selection.get("steps", [])]
+        channels.append(
+            ChannelSteps(selection.get("select", "*"), selection.get("type"), steps)
+        )
+    outputs = dict(recipe.get("outputs", {}))
+    _check_keys(outputs, set(Outputs._fields), "outputs")
+    if outputs.get("figures") is True:
+        outputs["figures"] = "png"
+    if outputs.get("figures") not in (None, False, "png", "pdf"):
+        raise ValueError("Recipe figures output must be 'png' or 'pdf'")
+    if outputs.get("epochs"):
+        epochs = outputs["epochs"]
+        _check_keys(epochs, set(EpochOutput._fields), "epochs output")
+        outputs["epochs"] = EpochOutput(
+            epochs.get("select", "*"),
+            epochs["events"],
+            float(epochs["pre"]),
+            float(epochs["post"]),
+        )
+    return Recipe(
+        channels,
+        Outputs(
+            save=bool(outputs.get("save", False)),
+            figures=outputs.get("figures") or None,
+            epochs=outputs.get("epochs") or None,
+        ),
+    )
+
+
+def apply(recipe: Recipe, spike2py_trial: "trial.Trial") -> "trial.Trial":
+    """Apply the processing steps of `recipe` to the channels of a trial
+
+    Selected channels that cannot be processed (e.g. Event channels) are left
+    unchanged. Artefacts and line noise are removed from all the channels of
+    a selection at once (see :func:`spike2py.sig_proc.blank_artefacts` and
+    :func:`spike2py.sig_proc.remove_line_noise`).
+    """
+    for selection in recipe.channels:
+        waveforms = [
+            getattr(spike2py_trial, name)
+            for name in select_channels(
+                spike2py_trial, selection.select, selection.ch_type
+            )
+        ]
+        waveforms = [
+            channel
+            for channel in waveforms
+            if isinstance(channel, sig_proc.SignalProcessing)
+        ]
+        if not waveforms:
+            continue
+        for step, parameters in selection.steps:
+            parameters = dict(parameters)
+            if isinstance(parameters.get("event_times"), str):
+                parameters["event_times"] = getattr(
+                    spike2py_trial, parameters["event_times"]
+                )
+            if step in MULTI_CHANNEL_STEPS:
+                getattr(sig_proc, step)(waveforms, **parameters)
+                continue
+            for channel in waveforms:
+                getattr(channel, step)(**parameters)
+    return spike2py_trial
+
+
+def select_channels(
+    spike2py_trial: "trial.Trial", pattern: str, ch_type: str = None
+) -> List[str]:
+    """Names of the channels matching the shell-style `pattern` (case insensitive)"""
+    return [
+        name
+        for name, channel_type in spike2py_trial.channels
+        if fnmatch.fnmatch(name.lower(), pattern.lower())
+        and (ch_type is None or channel_type == ch_type)
+    ]
+
+
+def run(
+    recipe: Union[Recipe, Path, str],
+    sources: catalogue.study_source,
+    workers: int = None,
+    output_directory: Union[Path, str] = None,
+    force: bool = False,
+    progress: Callable[[TrialReport], None] = None,
+) -> RunReport:
+    """Apply a recipe to every trial of a study and write its outputs
+
+    A trial is skipped when the recipe, the data file and all outputs are
+    unchanged since it was last processed. This is recorded in a
+    '<trial name>.recipe.json' file saved with the trial's data.
+
+    Parameters
+    ----------
+    recipe
+        Recipe, or path of a JSON or YAML recipe file
+    sources
+        Directory (searched for .mat files in all subfolders), Catalogue (all
+        its trials) or list of .mat files and directories; see
+        :func:`spike2py.catalogue.trial_infos`
+    workers
+        Number of processes; defaults to processing trials in this process
+    output_directory
+        Directory where outputs are written, in a folder per subject
+        (<output_directory>/<subject_id>/data and .../figures); defaults to
+        the 'data' and 'figures' folders next to each .mat file
+    force
+        Process trials even when their outputs are up to date
+    progress
+        Function called with the :class:`TrialReport` of each trial as soon
+        as it is processed, e.g. `print`
+
+    Returns
+    -------
+    RunReport
+        Status and duration of each trial, in the order of `sources`
+    """
+    if not isinstance(recipe, Recipe):
+        recipe = read_recipe(recipe)
+    infos = catalogue.trial_infos(sources, output_directory)
+    task = functools.partial(run_trial, recipe, force=force)
+    return map_trials(task, infos, workers, progress)
+
+
+def map_trials(
+    task: Callable[["trial.TrialInfo"], TrialReport],
+    infos: Sequence["trial.TrialInfo"],
+    workers: int = None,
+    progress: Callable[[TrialReport], None] = None,
+) -> RunReport:
+    """Run `task` on each trial, in `workers` processes, and collect its reports
+
+    `task` must be picklable (e.g. a module-level function or a
+    `functools.partial` of one) and report errors rather than raise them.
+    """
+    reports: Dict[int, TrialReport] = dict()
+    if workers and workers > 1 and len(infos) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(infos))) as executor:
+            futures = {executor.submit(task, info): i for i, info in enumerate(infos)}
+            for future in as_completed(futures):
+                reports[futures[future]] = future.result()
+                if progress is not None:
+                    progress(reports[futures[future]])
+    else:
+        for i, info in enumerate(infos):
+            reports[i] = task(info)
+            if progress is not None:
+                progress(reports[i])
+    return RunReport([reports[i] for i in range(len(infos))])
+
+
+def run_trial(
+    recipe: Recipe, info: "trial.TrialInfo", force: bool = False
+) -> TrialReport:
+    """Apply a recipe to one trial and write its outputs, unless up to date"""
+    start = time.perf_counter()
+    file = Path(info.file)
+    try:
+        stamp = _stamp(recipe, file)
+        stamp_file = _output_paths(recipe, info)["stamp"]
+        if not force and _up_to_date(recipe, info, stamp):
+            return TrialReport(file, "skipped", time.perf_counter() - start)
+        spike2py_trial = apply(recipe, trial.Trial(info))
+        figures = _write_outputs(recipe, spike2py_trial)
+        stamp_file.parent.mkdir(parents=True, exist_ok=True)
+        stamp_file.write_text(
+            json.dumps(dict(stamp, figures=[str(figure) for figure in figures]))
+        )
+    except (Exception, SystemExit) as error:
+        message = f"{type(error).__name__}: {error}"
+        return TrialReport(file, "failed", time.perf_counter() - start, message)
+    return TrialReport(file, "done", time.perf_counter() - start)
+
+
+def _parse_step(step: Union[str, Dict]) -> Tuple[str, Dict]:
+    if isinstance(step, str):
+        name, parameters = step, dict()
+    elif isinstance(step, dict) and len(step) == 1:
+        name, parameters = next(iter(step.items()))
+        parameters = dict(parameters or {})
+    else:
+        raise ValueError(f"Recipe step must be a name or a single-key mapping: {step}")
+    if name not in STEPS:
+        raise ValueError(
+            f"Unknown recipe step '{name}'; steps are: {', '.join(sorted(STEPS))}"
+        )
+    return name, parameters
+
+
+def _check_keys(mapping: Dict, allowed: set, where: str) -> None:
+    unknown = set(mapping) - allowed
+    if unknown:
+        raise ValueError(f"Unknown {where} keys: {', '.join(sorted(unknown))}")
+
+
+def _to_json(value):
+    if hasattr(value, "_asdict"):
+        return {key: _to_json(item) for key, item in value._asdict().items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    return value
+
+
+def _output_paths(recipe: Recipe, info: "trial.TrialInfo") -> Dict[str, Path]:
+    file = Path(info.file)
+    name = info.name or file.stem
+    path_save_trial = Path(info.path_save_trial or file.parent / "data")
+    paths = {"stamp": path_save_trial / f"{name}{RECIPE_SUFFIX}"}
+    if recipe.outputs.save:
+        paths["save"] = path_save_trial / f"{name}.pkl"
+    if recipe.outputs.epochs:
+        paths["epochs"] = path_save_trial / f"{name}{EPOCHS_SUFFIX}"
+    return paths
+
+
+def _stamp(recipe: Recipe, file: Path) -> Dict:
+    stat = file.stat()
+    return {
+        "recipe": recipe.digest,
+        "file": str(file.absolute()),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+
+
+def _up_to_date(recipe: Recipe, info: "trial.TrialInfo", stamp: Dict) -> bool:
+    paths = _output_paths(recipe, info)
+    try:
+        previous = json.loads(paths["stamp"].read_text())
+    except (OSError, ValueError):
+        return False
+    figures = [Path(figure) for figure in previous.pop("figures", [])]
+    return previous == stamp and all(
+        path.exists() for path in [*paths.values(), *figures]
+    )
+
+
+def _write_outputs(recipe: Recipe, spike2py_trial: "trial.Trial") -> List[Path]:
+    """Write the outputs of a processed trial; returns the paths of its figures"""
+    outputs = recipe.outputs
+    if outputs.epochs:
+        events = getattr(spike2py_trial, outputs.epochs.events)
+        epochs = {
+            name: aggregate.epochs(
+                getattr(spike2py_trial, name),
+                events,
+                outputs.epochs.pre,
+                outputs.epochs.post,
+            )
+            for name in select_channels(
+                spike2py_trial, outputs.epochs.select, "waveform"
+            )
+        }
+        path_save_trial = spike2py_trial.info.path_save_trial
+        np.savez(
+            path_save_trial / f"{spike2py_trial.info.name}{EPOCHS_SUFFIX}", **epochs
+        )
+    figures = list()
+    if outputs.figures:
+        from spike2py import export
+
+        figures = export.export_figures([spike2py_trial], file_format=outputs.figures)
+    if outputs.save:
+        spike2py_trial.save()
+    return figures
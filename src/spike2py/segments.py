@@ -0,0 +1,298 @@
+"""Virtual arrays presenting consecutive segments as one, without copying them
+
+Long sessions are often saved in several consecutive Spike2 files. Trials
+merged with :func:`spike2py.trial.merge` hold the `times` and `values` of each
+Waveform channel as a :class:`SegmentedArray` of the per-file arrays, rather
+than a concatenated copy; the times of each file are shifted by an offset
+added as they are read. For example::
+
+    session = spike2py.trial.merge(["part1.mat", "part2.mat", "part3.mat"])
+    session.Emg.values[1000]                 # read from the right segment
+    session.Emg.window(1795, 1805).values    # a view, or a SegmentedArray across files
+    session.Emg.remove_mean().bandpass([20, 450]).rect()   # segment by segment
+
+Indexing and slicing resolve to the segments holding the requested samples.
+Elementwise operations (arithmetic, `abs`, ufuncs) and reductions (`mean`,
+`min`, `max`, `sum`) run segment by segment. Filters of
+:mod:`spike2py.sig_proc` filter each segment padded with samples of its
+neighbours, so results are continuous at segment boundaries. Other NumPy and
+SciPy functions receive a concatenated copy, through `numpy.asarray`.
+"""
+
+from typing import Callable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+
+class SegmentedArray(np.lib.mixins.NDArrayOperatorsMixin):
+    """One-dimensional array made of consecutive segments, which are not copied
+
+    Parameters
+    ----------
+    segments
+        One-dimensional arrays, in order
+    offsets
+        Value added to the samples of each segment when they are read, e.g.
+        the start time of each file of merged times; defaults to none
+
+    Attributes
+    ----------
+    segments : List[np.ndarray]
+        Segment arrays, without their offsets
+    offsets : np.ndarray
+        Value added to the samples of each segment
+    bounds : np.ndarray
+        Index of the first sample of each segment, followed by the length of
+        the array
+    """
+
+    def __init__(
+        self, segments: Sequence[np.ndarray], offsets: Sequence[float] = None
+    ) -> None:
+        segments = [np.asarray(segment) for segment in segments]
+        if not segments:
+            raise ValueError("A SegmentedArray needs at least one segment")
+        if any(segment.ndim != 1 for segment in segments):
+            raise ValueError("Segments must be one-dimensional arrays")
+        if offsets is None:
+            offsets = np.zeros(len(segments), dtype=np.result_type(*segments))
+        offsets = np.asarray(offsets)
+        if offsets.shape != (len(segments),):
+            raise ValueError("offsets must have one value per segment")
+        self.segments: List[np.ndarray] = segments
+        self.offsets = offsets
+        self.bounds = np.cumsum([0] + [len(segment) for segment in segments])
+        self.dtype = np.result_type(*segments, offsets)
+
+    def __repr__(self) -> str:
+        return (
+            f"SegmentedArray(length={len(self)}, segments={len(self.segments)}, "
+            f"dtype={self.dtype})"
+        )
+
+    def __len__(self) -> int:
+        return int(self.bounds[-1])
+
+    @property
+    def shape(self) -> Tuple[int]:
+        return (len(self),)
+
+    @property
+    def ndim(self) -> int:
+        return 1
+
+    @property
+    def size(self) -> int:
+        return len(self)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(segment.nbytes for segment in self.segments)
+
+    def __iter__(self) -> Iterator:
+        for i in range(len(self.segments)):
+            yield from self.segment(i)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        if not self.offsets.any():
+            array = np.concatenate(self.segments)
+        else:
+            array = np.empty(len(self), dtype=self.dtype)
+            for segment, offset, first in zip(self.segments, self.offsets, self.bounds):
+                np.add(segment, offset, out=array[first:][: len(segment)])
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def segment(self, i: int) -> np.ndarray:
+        """Samples of segment `i`, with its offset added (the segment itself if none)"""
+        if self.offsets[i]:
+            return self.segments[i] + self.offsets[i]
+        return self.segments[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self._item(int(index))
+        if isinstance(index, slice):
+            return self._slice(index)
+        index = np.asarray(index)
+        if index.dtype == bool:
+            if index.shape != self.shape:
+                raise IndexError("Boolean index must have the length of the array")
+            index = np.flatnonzero(index)
+        return self.take(index)
+
+    def _item(self, index: int):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Index {index} out of bounds for length {len(self)}")
+        segment = np.searchsorted(self.bounds, index, side="right") - 1
+        return self.segments[segment][index - self.bounds[segment]] + (
+            self.offsets[segment]
+        )
+
+    def _slice(self, index: slice):
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            return self.take(np.arange(start, stop, step))
+        stop = max(start, stop)
+        pieces, offsets = list(), list()
+        for i, (first, last) in enumerate(zip(self.bounds, self.bounds[1:])):
+            if (first < stop) and (last > start):
+                skipped = max(start - first, 0)
+                pieces.append(self.segments[i][skipped:][: stop - max(start, first)])
+                offsets.append(self.offsets[i])
+        if not pieces:
+            return self.segments[0][:0].astype(self.dtype)
+        if len(pieces) == 1 and not offsets[0]:
+            return pieces[0]
+        return SegmentedArray(pieces, offsets)
+
+    def take(self, indices: np.ndarray) -> np.ndarray:
+        """Samples at `indices` (negative indices count from the end), as an array"""
+        indices = np.asarray(indices, dtype=np.int64)
+        indices = np.where(indices < 0, indices + len(self), indices)
+        if np.any((indices < 0) | (indices >= len(self))):
+            raise IndexError(f"Index out of bounds for length {len(self)}")
+        result = np.empty(indices.shape, dtype=self.dtype)
+        segment_of = np.searchsorted(self.bounds, indices, side="right") - 1
+        for i, segment in enumerate(self.segments):
+            selected = segment_of == i
+            if selected.any():
+                result[selected] = (
+                    segment[indices[selected] - self.bounds[i]] + self.offsets[i]
+                )
+        return result
+
+    def replace(self, indices: np.ndarray, values) -> "SegmentedArray":
+        """Copy with the samples at `indices` set to `values`
+
+        Only the segments containing some of `indices` are copied; the others
+        are shared with this array.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        values = np.broadcast_to(np.asarray(values), indices.shape)
+        segment_of = np.searchsorted(self.bounds, indices, side="right") - 1
+        segments = list()
+        for i, segment in enumerate(self.segments):
+            selected = segment_of == i
+            if selected.any():
+                segment = segment.astype(np.result_type(segment, values), copy=True)
+                segment[indices[selected] - self.bounds[i]] = (
+                    values[selected] - self.offsets[i]
+                )
+            segments.append(segment)
+        return SegmentedArray(segments, self.offsets)
+
+    def searchsorted(self, value, side: str = "left", sorter=None):
+        """As `numpy.searchsorted`, for arrays sorted across all segments"""
+        if sorter is not None:
+            raise ValueError("sorter is not supported by SegmentedArray")
+        value = np.asarray(value)
+        positions = sum(
+            _searchsorted_offset(segment, offset, value, side)
+            for segment, offset in zip(self.segments, self.offsets)
+        )
+        return positions if value.ndim else int(positions)
+
+    def map_segments(self, function: Callable[[np.ndarray], np.ndarray]):
+        """SegmentedArray of `function` applied to each segment, offset added"""
+        return SegmentedArray(
+            [function(self.segment(i)) for i in range(len(self.segments))]
+        )
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if (method != "__call__") or ("out" in kwargs) or (ufunc.nout != 1):
+            inputs = [
+                np.asarray(x) if isinstance(x, SegmentedArray) else x for x in inputs
+            ]
+            return getattr(ufunc, method)(*inputs, **kwargs)
+        segmented = [x for x in inputs if isinstance(x, SegmentedArray)]
+        bounds = segmented[0].bounds
+        if any(not np.array_equal(x.bounds, bounds) for x in segmented) or any(
+            np.ndim(x) > 0 and not isinstance(x, SegmentedArray) for x in inputs
+        ):
+            inputs = [
+                np.asarray(x) if isinstance(x, SegmentedArray) else x for x in inputs
+            ]
+            return ufunc(*inputs, **kwargs)
+        return SegmentedArray(
+            [
+                ufunc(
+                    *[
+                        x.segment(i) if isinstance(x, SegmentedArray) else x
+                        for x in inputs
+                    ],
+                    **kwargs,
+                )
+                for i in range(len(bounds) - 1)
+            ]
+        )
+
+    def astype(self, dtype, copy: bool = True) -> "SegmentedArray":
+        return SegmentedArray(
+            [segment.astype(dtype, copy=copy) for segment in self.segments],
+            self.offsets.astype(dtype),
+        )
+
+    def sum(self, axis=None, dtype=None, out=None, **kwargs):
+        self._check_reduction(axis, out)
+        return np.sum(
+            [
+                np.sum(segment, dtype=dtype) + offset * len(segment)
+                for segment, offset in zip(self.segments, self.offsets)
+            ]
+        )
+
+    def mean(self, axis=None, dtype=None, out=None, **kwargs):
+        self._check_reduction(axis, out)
+        if len(self) == 0:
+            return np.mean(self.segments[0])
+        dtype = dtype or np.result_type(self.dtype, np.float64)
+        return self.sum(dtype=dtype) / len(self)
+
+    def min(self, axis=None, out=None, **kwargs):
+        self._check_reduction(axis, out)
+        return np.min(
+            [
+                np.min(segment) + offset
+                for segment, offset in zip(self.segments, self.offsets)
+                if len(segment)
+            ]
+        )
+
+    def max(self, axis=None, out=None, **kwargs):
+        self._check_reduction(axis, out)
+        return np.max(
+            [
+                np.max(segment) + offset
+                for segment, offset in zip(self.segments, self.offsets)
+                if len(segment)
+            ]
+        )
+
+    def _check_reduction(self, axis, out) -> None:
+        if (axis not in (None, 0, -1)) or (out is not None):
+            raise ValueError("SegmentedArray reductions only support axis=None")
+
+
+def _searchsorted_offset(segment: np.ndarray, offset, value, side: str):
+    """Position of `value` in `segment + offset`, without computing the sum
+
+    `value - offset` is searched in `segment`, then positions are moved by one
+    sample where rounding differs from comparing `value` with `segment + offset`.
+    """
+    positions = np.searchsorted(segment, value - offset, side=side)
+    if not offset or not len(segment):
+        return positions
+    n_samples = len(segment)
+
+    def before(samples):
+        return (samples < value) if side == "left" else (samples <= value)
+
+    previous = segment[np.maximum(positions - 1, 0)] + offset
+    following = segment[np.minimum(positions, n_samples - 1)] + offset
+    return (
+        positions
+        - ((positions > 0) & ~before(previous))
+        + ((positions < n_samples) & before(following))
+    )
@@ -0,0 +1,208 @@
+"""Transport of trials and channels between processes through shared memory
+
+Results returned by worker processes (e.g. with `concurrent.futures`) are
+pickled and copied to the parent process, arrays included. :func:`share`
+instead copies the arrays of a trial or channel once into a shared memory
+block and returns a small :class:`SharedObject` descriptor, which is what gets
+pickled. The receiving process rebuilds the object with arrays that are views
+of the block, without copying them. For example::
+
+    def process(file):
+        trial = spike2py.trial.Trial(spike2py.trial.TrialInfo(file=file))
+        trial.Emg.remove_mean().lowpass(20)
+        return trial.share()
+
+    with ProcessPoolExecutor() as executor:
+        for handle in executor.map(process, files):
+            trial = handle.load()
+            ...
+            del trial
+            handle.close()
+            handle.unlink()
+
+Blocks are not freed automatically: each must be unlinked once, usually by the
+receiving process after it is done with the object.
+"""
+
+import io
+import os
+import pickle
+import sys
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+ALIGNMENT = 64
+DEFAULT_MIN_BYTES = 1 << 16
+# Before Python 3.13, attaching to a block registers it with the resource
+# tracker of the process, which unlinks it when the process exits
+_UNTRACK_ON_ATTACH = (os.name == "posix") and (sys.version_info < (3, 13))
+
+
+class ArrayLayout(NamedTuple):
+    """Position of an array in a shared memory block"""
+
+    offset: int
+    shape: Tuple[int, ...]
+    dtype: np.dtype
+
+
+class SharedObject:
+    """Picklable descriptor of an object whose arrays are in a shared memory block
+
+    Attributes
+    ----------
+    name : str
+        Name of the shared memory block
+    size : int
+        Bytes of array data in the block
+    """
+
+    def __init__(
+        self, name: str, size: int, payload: bytes, layouts: List[ArrayLayout]
+    ):
+        self.name = name
+        self.size = size
+        self._payload = payload
+        self._layouts = layouts
+        self._memory: shared_memory.SharedMemory = None
+
+    def __repr__(self) -> str:
+        return (
+            f"SharedObject(name={self.name!r}, arrays={len(self._layouts)}, "
+            f"size={self.size})"
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_memory"] = None
+        return state
+
+    def load(self):
+        """Rebuild the object, its arrays being views of the shared memory block
+
+        The block stays mapped in this process until :meth:`close`.
+        """
+        if self._memory is None:
+            self._memory = _attach(self.name)
+        arrays = [_view(self._memory, layout) for layout in self._layouts]
+        return _Unpickler(io.BytesIO(self._payload), arrays).load()
+
+    def close(self) -> None:
+        """Unmap the block from this process
+
+        Raises
+        ------
+        BufferError
+            If arrays of loaded objects are still in use; delete them first
+        """
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+
+    def unlink(self) -> None:
+        """Free the block once every process has closed it
+
+        Must be called exactly once, in any process; the object can no longer
+        be loaded afterwards.
+        """
+        memory = self._memory or _attach(self.name)
+        if _UNTRACK_ON_ATTACH:
+            # SharedMemory.unlink unregisters the block from the tracker
+            resource_tracker.register(memory._name, "shared_memory")
+        memory.unlink()
+        if self._memory is None:
+            memory.close()
+
+
+def share(obj, min_bytes: int = None) -> SharedObject:
+    """Copy the arrays of `obj` into a new shared memory block
+
+    Parameters
+    ----------
+    obj
+        Any picklable object, usually a Trial or a Channel (see
+        :meth:`spike2py.trial.Trial.share`)
+    min_bytes
+        Arrays smaller than this are pickled with the descriptor instead;
+        defaults to DEFAULT_MIN_BYTES. Arrays of Python objects are always
+        pickled.
+
+    Returns
+    -------
+    SharedObject
+        Descriptor owning the block, to be unlinked by whoever uses it last
+    """
+    if min_bytes is None:
+        min_bytes = DEFAULT_MIN_BYTES
+    arrays: List[np.ndarray] = list()
+    payload = io.BytesIO()
+    _Pickler(payload, arrays, min_bytes).dump(obj)
+    layouts, size = list(), 0
+    for array in arrays:
+        layouts.append(ArrayLayout(size, array.shape, array.dtype))
+        size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        for array, layout in zip(arrays, layouts):
+            block = _view(memory, layout)
+            block[...] = array
+            del block
+    except BaseException:
+        memory.close()
+        memory.unlink()
+        raise
+    if os.name == "posix":
+        # The block must outlive this process; its descriptor now owns it
+        resource_tracker.unregister(memory._name, "shared_memory")
+    memory.close()
+    return SharedObject(memory.name, size, payload.getvalue(), layouts)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Map an existing block, without this process taking ownership of it"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    memory = shared_memory.SharedMemory(name)
+    if _UNTRACK_ON_ATTACH:
+        resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
+
+
+def _view(memory: shared_memory.SharedMemory, layout: ArrayLayout) -> np.ndarray:
+    """Array of the block; the block cannot be closed while the array is in use"""
+    count = int(np.prod(layout.shape))
+    if count == 0:
+        return np.empty(layout.shape, layout.dtype)
+    array = np.frombuffer(memory.buf, layout.dtype, count, layout.offset)
+    return array.reshape(layout.shape)
+
+
+class _Pickler(pickle.Pickler):
+    """Pickler leaving large arrays out, to be stored in shared memory"""
+
+    def __init__(self, file: io.BytesIO, arrays: List[np.ndarray], min_bytes: int):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._arrays = arrays
+        self._min_bytes = min_bytes
+        self._indices: Dict[int, int] = dict()
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, np.ndarray):
+            return None
+        if obj.dtype.hasobject or obj.nbytes < self._min_bytes:
+            return None
+        if id(obj) not in self._indices:
+            self._indices[id(obj)] = len(self._arrays)
+            self._arrays.append(obj)
+        return self._indices[id(obj)]
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file: io.BytesIO, arrays: List[np.ndarray]):
+        super().__init__(file)
+        self._arrays = arrays
+
+    def persistent_load(self, pid: int) -> np.ndarray:
+        return self._arrays[pid]
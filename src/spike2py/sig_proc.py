@@ -1,17 +1,114 @@
-from typing import List, Literal
+import functools
+import inspect
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, List, Literal, Sequence, Tuple
 
 import numpy as np
-from scipy.signal import butter, filtfilt, detrend
 
-from spike2py.types import filt_cutoff_single, filt_cutoff_pair, filt_cutoff
+from spike2py import memo, profiling, segments
+from spike2py.types import (
+    filt_cutoff_single,
+    filt_cutoff_pair,
+    filt_cutoff,
+    artefact_times,
+)
+
+DEFAULT_LINE_NOISE_QUALITY = 30
+CHUNK_TRANSIENT_TOLERANCE = 1e-12
+# Parameters that do not change the result of a step, left out of recipes
+UNRECORDED_PARAMETERS = ("workers",)
+
+
+def _processing_step(method):
+    """Record a step in `recipe`, and reuse its saved result (see :mod:`spike2py.memo`)"""
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        self._start_step()
+        recipe = self.recipe + (
+            (method.__name__, _step_parameters(arguments.arguments)),
+        )
+        recipe_key = None
+        if memo.is_enabled() and (self._fingerprint is not None):
+            recipe_key = memo.key(self._fingerprint, recipe)
+            cached = memo.load(recipe_key)
+            if cached is not None and cached.name is not None:
+                self.values = cached.values
+                if cached.times is not None:
+                    self.times_pre_interp = self.times
+                    self.times = cached.times
+                self._setattr(cached.name)
+                self.recipe = recipe
+                return self
+        times = getattr(self, "times", None)
+        result = method(self, *args, **kwargs)
+        self.recipe = recipe
+        if recipe_key is not None:
+            new_times = getattr(self, "times", None)
+            new_times = None if new_times is times else new_times
+            memo.store(recipe_key, self._step, self.values, new_times)
+        return result
+
+    return wrapper
+
+
+def _step_parameters(arguments: dict) -> dict:
+    return {
+        name: memo.canonical(value)
+        for name, value in list(arguments.items())[1:]
+        if name not in UNRECORDED_PARAMETERS
+    }
 
 
 class SignalProcessing:
-    """Mixin class that adds signal processing methods"""
+    """Mixin class that adds signal processing methods
+
+    Attributes
+    ----------
+    recipe : Tuple[Tuple[str, dict], ...]
+        Processing steps applied since the channel was read (or windowed),
+        in order, as pairs of method names and parameters. For example:
+        (('remove_mean', {'first_n_samples': None}), ('rect', {}))
+    """
+
+    recipe: Tuple[memo.step, ...] = ()
+    _fingerprint: str = None
+    # `proc_*` attribute holding the result of the last processing step
+    _step: str = None
 
     def _setattr(self, name: str):
         setattr(self, name, self.values)
+        self._step = name
+
+    def _start_step(self):
+        """Prepare `recipe` for a step that is about to change `values`
+
+        The recipe starts again if `values` were assigned since the last step,
+        and the input of a new recipe is fingerprinted when memoising.
+        """
+        if self.recipe and self._values_replaced():
+            self.recipe = ()
+            self._fingerprint = None
+        if memo.is_enabled() and not self.recipe:
+            self._fingerprint = memo.fingerprint(
+                self.values,
+                getattr(self, "times", None),
+                getattr(getattr(self, "info", None), "sampling_frequency", None),
+            )
+
+    def _values_replaced(self) -> bool:
+        """Whether `values` were assigned since the last processing step"""
+        return (self._step is None) or (
+            getattr(self, self._step, None) is not self.values
+        )
 
+    @profiling.stage("sig_proc.remove_mean")
+    @_processing_step
     def remove_mean(self, first_n_samples: int = None):
         """Subtract mean of first n samples (default is all samples)"""
         values_slice = slice(0, -1)
@@ -24,14 +121,16 @@ class SignalProcessing:
             if not isinstance(first_n_samples, int):
                 raise TypeError("first_n_samples must be a whole number, an integer")
             values_slice = slice(0, first_n_samples)
-        self.values -= np.mean(self.values[values_slice])
+        self.values = self.values - np.mean(self.values[values_slice])
         self._setattr("proc_remove_mean")
         return self
 
+    @profiling.stage("sig_proc.remove_value")
+    @_processing_step
     def remove_value(self, value: float):
         """Subtracts value from `values`"""
         try:
-            self.values -= value
+            self.values = self.values - value
             str_value = self._float_to_string_with_underscore(value)
             self._setattr(f"proc_remove_value_{str_value}")
             return self
@@ -41,24 +140,48 @@ class SignalProcessing:
     def _float_to_string_with_underscore(self, float_value: float):
         return str(abs(float_value)).replace(".", "_")
 
-    def lowpass(self, cutoff: filt_cutoff_single, order: int = 4):
-        """Apply dual-pass Butterworth lowpass filter to `values`"""
-        self._filt(cutoff, order, "lowpass")
+    @profiling.stage("sig_proc.lowpass")
+    @_processing_step
+    def lowpass(self, cutoff: filt_cutoff_single, order: int = 4, workers: int = None):
+        """Apply dual-pass Butterworth lowpass filter to `values`
+
+        Set `workers` to filter long channels in overlapping chunks on that many
+        threads; see :func:`filtfilt_chunked`.
+        """
+        self._filt(cutoff, order, "lowpass", workers)
         return self
 
-    def highpass(self, cutoff: filt_cutoff_single, order: int = 4):
-        """Apply dual-pass Butterworth highpass filter to `values`"""
-        self._filt(cutoff, order, "highpass")
+    @profiling.stage("sig_proc.highpass")
+    @_processing_step
+    def highpass(self, cutoff: filt_cutoff_single, order: int = 4, workers: int = None):
+        """Apply dual-pass Butterworth highpass filter to `values`
+
+        Set `workers` to filter long channels in overlapping chunks on that many
+        threads; see :func:`filtfilt_chunked`.
+        """
+        self._filt(cutoff, order, "highpass", workers)
         return self
 
-    def bandpass(self, cutoff: filt_cutoff_pair, order: int = 4):
-        """Apply dual-pass Butterworth bandpass filter to `values`"""
-        self._filt(cutoff, order, "bandpass")
+    @profiling.stage("sig_proc.bandpass")
+    @_processing_step
+    def bandpass(self, cutoff: filt_cutoff_pair, order: int = 4, workers: int = None):
+        """Apply dual-pass Butterworth bandpass filter to `values`
+
+        Set `workers` to filter long channels in overlapping chunks on that many
+        threads; see :func:`filtfilt_chunked`.
+        """
+        self._filt(cutoff, order, "bandpass", workers)
         return self
 
-    def bandstop(self, cutoff: filt_cutoff_pair, order: int = 4):
-        """Apply dual-pass Butterworth bandstop filter to `values`"""
-        self._filt(cutoff, order, "bandstop")
+    @profiling.stage("sig_proc.bandstop")
+    @_processing_step
+    def bandstop(self, cutoff: filt_cutoff_pair, order: int = 4, workers: int = None):
+        """Apply dual-pass Butterworth bandstop filter to `values`
+
+        Set `workers` to filter long channels in overlapping chunks on that many
+        threads; see :func:`filtfilt_chunked`.
+        """
+        self._filt(cutoff, order, "bandstop", workers)
         return self
 
     def _filt(
@@ -66,13 +189,31 @@ class SignalProcessing:
         cutoff: filt_cutoff,
         order: int,
         filt_type: Literal["lowpass", "highpass", "bandstop", "bandpass"],
+        workers: int = None,
     ):
+        from scipy.signal import butter, filtfilt
+
         cutoff_1d_array = self._convert_cutoff_to_1d_array(cutoff)
         self._check_valid_cutoff(cutoff_1d_array)
         self._check_valid_filter_order(order)
         critical_fq = cutoff_1d_array / (self.info.sampling_frequency / 2)
         filt_coef_b, filt_coef_a = butter(order, critical_fq, filt_type)
-        self.values = filtfilt(filt_coef_b, filt_coef_a, self.values)
+        if isinstance(self.values, segments.SegmentedArray):
+            padding = _transient_length(filt_coef_a) + 3 * max(
+                len(filt_coef_a), len(filt_coef_b)
+            )
+            self.values = filter_segments(
+                functools.partial(filtfilt, filt_coef_b, filt_coef_a),
+                self.values,
+                padding,
+                workers,
+            )
+        elif workers is None:
+            self.values = filtfilt(filt_coef_b, filt_coef_a, self.values)
+        else:
+            self.values = filtfilt_chunked(
+                filt_coef_b, filt_coef_a, self.values, workers
+            )
         self._setattr(
             f"proc_filt_{self._cutoff_to_string(cutoff_1d_array)}_{filt_type}"
         )
@@ -104,6 +245,8 @@ class SignalProcessing:
         else:
             return self._float_to_string_with_underscore(cutoff[0])
 
+    @profiling.stage("sig_proc.calibrate")
+    @_processing_step
     def calibrate(self, slope: float, offset: float = None):
         """Calibrate `values` using linear formula y=slope*x+offset"""
         if not offset:
@@ -113,30 +256,40 @@ class SignalProcessing:
         self._setattr("proc_calib")
         return self
 
+    @profiling.stage("sig_proc.norm_percentage")
+    @_processing_step
     def norm_percentage(self):
         """Normalise `values` to be between 0-100%"""
         self.values = (self.values / np.max(self.values)) * 100
         self._setattr("proc_norm_percentage")
         return self
 
+    @profiling.stage("sig_proc.norm_proportion")
+    @_processing_step
     def norm_proportion(self):
         """Normalise `values` to be between 0-1"""
         self.values = self.values / np.max(self.values)
         self._setattr("proc_norm_proportion")
         return self
 
+    @profiling.stage("sig_proc.norm_percent_value")
+    @_processing_step
     def norm_percent_value(self, value: float):
         """Normalise `values` to a percentage of `value`"""
         self.values = (self.values / value) * 100
         self._setattr("proc_norm_value")
         return self
 
+    @profiling.stage("sig_proc.rect")
+    @_processing_step
     def rect(self):
         """Rectify values"""
         self.values = abs(self.values)
         self._setattr("proc_rect")
         return self
 
+    @profiling.stage("sig_proc.interp_new_times")
+    @_processing_step
     def interp_new_times(self, new_times: List[float]):
         """Interpolate `values` to a new time axis
 
@@ -160,6 +313,8 @@ class SignalProcessing:
                 "in duration than current time axis."
             )
 
+    @profiling.stage("sig_proc.interp_new_fs")
+    @_processing_step
     def interp_new_fs(self, new_sampling_frequency: int):
         """Interpolate `values` to a new sampling frequency"""
         new_times = np.arange(
@@ -174,8 +329,383 @@ class SignalProcessing:
         self.times_pre_interp = self.times
         self.times = new_times
 
+    @profiling.stage("sig_proc.linear_detrend")
+    @_processing_step
     def linear_detrend(self):
         """Remove linear trend from `values`"""
+        from scipy.signal import detrend
+
         self.values = detrend(self.values, type="linear")
         self._setattr("proc_linear_detrend")
         return self
+
+    def blank_artefacts(
+        self,
+        event_times: artefact_times,
+        pre: float = 0.001,
+        post: float = 0.005,
+        method: Literal["interp", "zero"] = "interp",
+    ):
+        """Blank stimulus artefacts around event times
+
+        All events are processed in a single vectorised pass.
+
+        Parameters
+        ----------
+        event_times
+            Event channel (e.g. stimulator triggers) or array of times in seconds
+        pre
+            Seconds blanked before each event
+        post
+            Seconds blanked after each event
+        method
+            'interp' replaces blanked samples by linear interpolation between the
+            samples either side of the artefact; 'zero' sets them to zero
+        """
+        blank_artefacts([self], event_times, pre, post, method)
+        return self
+
+    def remove_line_noise(
+        self,
+        frequency: float = 50,
+        harmonics: int = 3,
+        quality: float = DEFAULT_LINE_NOISE_QUALITY,
+    ):
+        """Remove line noise with dual-pass notch filters at `frequency` and its harmonics
+
+        Parameters
+        ----------
+        frequency
+            Line frequency in Hertz (e.g. 50 or 60)
+        harmonics
+            Number of harmonics, including the fundamental, to remove.
+            Harmonics at or above the Nyquist frequency are skipped.
+        quality
+            Quality factor of each notch; higher values give narrower notches
+        """
+        remove_line_noise([self], frequency, harmonics, quality)
+        return self
+
+
+def filtfilt_chunked(
+    filt_coef_b: np.ndarray,
+    filt_coef_a: np.ndarray,
+    values: np.ndarray,
+    workers: int,
+    chunk_size: int = None,
+) -> np.ndarray:
+    """Zero-phase filter a long signal in overlapping chunks on a thread pool
+
+    `values` is split into `workers` chunks (or chunks of `chunk_size` samples).
+    Each chunk is padded on both sides with enough of the neighbouring signal
+    for the filter transient to decay below `CHUNK_TRANSIENT_TOLERANCE`
+    (1e-12) of its initial size, filtered with `scipy.signal.filtfilt`, and
+    trimmed back before the chunks are stitched together. SciPy releases the
+    GIL while filtering, so chunks run in parallel.
+
+    Because the transients are truncated at that level, the stitched output
+    differs from one-shot `filtfilt` only by floating-point rounding in the
+    recursive filter: typically less than 1e-9 times the peak absolute value
+    of `values`, and up to about 1e-5 times for cutoffs very low relative to
+    the sampling frequency, where one-shot `filtfilt` is itself only accurate
+    to that level. Signals too short to benefit from chunking are filtered in
+    one shot.
+
+    Parameters
+    ----------
+    filt_coef_b, filt_coef_a
+        Numerator and denominator coefficients of the filter
+    values
+        Signal to filter
+    workers
+        Number of threads
+    chunk_size
+        Number of output samples per chunk; defaults to an even split across
+        `workers`
+    """
+    from scipy.signal import filtfilt
+
+    if workers < 1:
+        raise ValueError("workers must be a whole number greater than 0")
+    n_samples = len(values)
+    padding = _transient_length(filt_coef_a) + 3 * max(
+        len(filt_coef_a), len(filt_coef_b)
+    )
+    if chunk_size is None:
+        chunk_size = math.ceil(n_samples / workers)
+    chunk_size = max(chunk_size, 2 * padding)
+    if (workers == 1) or (chunk_size >= n_samples):
+        return filtfilt(filt_coef_b, filt_coef_a, values)
+    starts = range(0, n_samples, chunk_size)
+
+    def filter_chunk(start: int) -> np.ndarray:
+        stop = min(start + chunk_size, n_samples)
+        return _filter_span(
+            functools.partial(filtfilt, filt_coef_b, filt_coef_a),
+            values,
+            start,
+            stop,
+            padding,
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return np.concatenate(list(executor.map(filter_chunk, starts)))
+
+
+def filter_segments(
+    filter_function: Callable[[np.ndarray], np.ndarray],
+    values: "segments.SegmentedArray",
+    padding: int,
+    workers: int = None,
+) -> "segments.SegmentedArray":
+    """Zero-phase filter a SegmentedArray one segment at a time
+
+    As in :func:`filtfilt_chunked`, each segment is filtered padded with
+    `padding` samples of the neighbouring segments on both sides, then trimmed,
+    so the result matches filtering the concatenated signal and is continuous
+    at segment boundaries. Only about one padded segment per worker is copied
+    at a time.
+
+    Parameters
+    ----------
+    filter_function
+        Zero-phase filter of an array, e.g. a `functools.partial` of
+        `scipy.signal.filtfilt`
+    values
+        Signal to filter
+    padding
+        Samples of neighbouring segments needed for the filter transient to
+        decay, see `CHUNK_TRANSIENT_TOLERANCE`
+    workers
+        Number of threads filtering segments; defaults to 1
+    """
+    spans = list(zip(values.bounds[:-1], values.bounds[1:]))
+
+    def filter_segment(span: Tuple[int, int]) -> np.ndarray:
+        # Copied so the padding of each segment is released
+        return _filter_span(filter_function, values, *span, padding).copy()
+
+    with ThreadPoolExecutor(max_workers=workers or 1) as executor:
+        return segments.SegmentedArray(list(executor.map(filter_segment, spans)))
+
+
+def _filter_span(
+    filter_function: Callable[[np.ndarray], np.ndarray],
+    values: np.ndarray,
+    start: int,
+    stop: int,
+    padding: int,
+) -> np.ndarray:
+    """Filtered `values[start:stop]`, computed with `padding` samples either side"""
+    padded_start = max(start - padding, 0)
+    padded_stop = min(stop + padding, len(values))
+    filtered = filter_function(np.asarray(values[padded_start:padded_stop]))
+    offset = start - padded_start
+    return filtered[offset:][: stop - start]
+
+
+def _transient_length(filt_coef_a: np.ndarray) -> int:
+    """Samples needed for the slowest pole of the filter to decay to the tolerance"""
+    pole_radius = np.max(np.abs(np.roots(filt_coef_a)), initial=0)
+    if pole_radius == 0:
+        return 0
+    if pole_radius >= 1:
+        raise ValueError("Filter is unstable and cannot be applied in chunks")
+    return math.ceil(math.log(CHUNK_TRANSIENT_TOLERANCE) / math.log(pole_radius))
+
+
+@profiling.stage("sig_proc.blank_artefacts")
+def blank_artefacts(
+    waveforms: Sequence[SignalProcessing],
+    event_times: artefact_times,
+    pre: float = 0.001,
+    post: float = 0.005,
+    method: Literal["interp", "zero"] = "interp",
+) -> None:
+    """Blank stimulus artefacts around event times in several channels at once
+
+    Channels sharing a time axis are stacked and blanked together, so the
+    artefact mask and interpolation weights are computed once per group.
+    See :meth:`SignalProcessing.blank_artefacts` for parameter details.
+    """
+    if method not in ("interp", "zero"):
+        raise ValueError("method must be 'interp' or 'zero'")
+    if (pre < 0) or (post < 0):
+        raise ValueError("pre and post must be positive durations in seconds")
+    event_times = np.asarray(getattr(event_times, "times", event_times), dtype=float)
+    for waveform in waveforms:
+        waveform._start_step()
+    for group in _group_by_time_axis(waveforms):
+        times = group[0].times
+        blanked = _artefact_mask(times, event_times, pre, post)
+        if not blanked.any():
+            for waveform in group:
+                waveform._setattr("proc_blank_artefacts")
+            continue
+        interpolate = (method == "interp") and not blanked.all()
+        if interpolate:
+            left, right, weight = _interp_weights(times, blanked)
+        stacked = [
+            waveform
+            for waveform in group
+            if not isinstance(waveform.values, segments.SegmentedArray)
+        ]
+        if stacked:
+            values = np.vstack([waveform.values for waveform in stacked])
+            if interpolate:
+                values[:, blanked] = (
+                    values[:, left] * (1 - weight) + values[:, right] * weight
+                )
+            else:
+                values[:, blanked] = 0
+            for waveform, waveform_values in zip(stacked, values):
+                waveform.values = waveform_values
+        for waveform in group:
+            if isinstance(waveform.values, segments.SegmentedArray):
+                # Only the segments holding artefacts are copied
+                replacement = 0
+                if interpolate:
+                    replacement = (
+                        waveform.values.take(left) * (1 - weight)
+                        + waveform.values.take(right) * weight
+                    )
+                waveform.values = waveform.values.replace(
+                    np.flatnonzero(blanked), replacement
+                )
+            waveform._setattr("proc_blank_artefacts")
+    _record_step(
+        waveforms,
+        "blank_artefacts",
+        dict(event_times=event_times, pre=pre, post=post, method=method),
+    )
+
+
+@profiling.stage("sig_proc.remove_line_noise")
+def remove_line_noise(
+    waveforms: Sequence[SignalProcessing],
+    frequency: float = 50,
+    harmonics: int = 3,
+    quality: float = DEFAULT_LINE_NOISE_QUALITY,
+) -> None:
+    """Remove line noise from several channels at once
+
+    Notch filters are designed once per sampling frequency and applied to all
+    channels of a group in a single call. See
+    :meth:`SignalProcessing.remove_line_noise` for parameter details.
+    """
+    from scipy.signal import sosfiltfilt
+
+    if frequency <= 0:
+        raise ValueError("Line noise frequency must be greater than 0")
+    if harmonics not in range(1, 101):
+        raise ValueError("harmonics must be a whole number between 1 and 100")
+    for waveform in waveforms:
+        waveform._start_step()
+    for group in _group_by_time_axis(waveforms):
+        sos = _line_noise_sos(
+            group[0].info.sampling_frequency, frequency, harmonics, quality
+        )
+        stacked = [
+            waveform
+            for waveform in group
+            if not isinstance(waveform.values, segments.SegmentedArray)
+        ]
+        if stacked:
+            values = sosfiltfilt(
+                sos, np.vstack([waveform.values for waveform in stacked])
+            )
+            for waveform, waveform_values in zip(stacked, values):
+                waveform.values = waveform_values
+        for waveform in group:
+            if isinstance(waveform.values, segments.SegmentedArray):
+                padding = sum(_transient_length(section[3:]) for section in sos) + 3 * (
+                    2 * len(sos) + 1
+                )
+                waveform.values = filter_segments(
+                    functools.partial(sosfiltfilt, sos), waveform.values, padding
+                )
+            waveform._setattr(
+                f"proc_line_noise_{waveform._float_to_string_with_underscore(frequency)}"
+            )
+    _record_step(
+        waveforms,
+        "remove_line_noise",
+        dict(frequency=frequency, harmonics=harmonics, quality=quality),
+    )
+
+
+def _record_step(
+    waveforms: Sequence[SignalProcessing], name: str, parameters: dict
+) -> None:
+    """Add a step run on several channels at once to their recipes
+
+    Such steps are not saved by :mod:`spike2py.memo`, but the steps after
+    them are, as the input of each new recipe was fingerprinted before the
+    step (see :meth:`SignalProcessing._start_step`).
+    """
+    step = (name, {key: memo.canonical(value) for key, value in parameters.items()})
+    for waveform in waveforms:
+        waveform.recipe = waveform.recipe + (step,)
+
+
+@lru_cache(maxsize=32)
+def _line_noise_sos(
+    sampling_frequency: int, frequency: float, harmonics: int, quality: float
+) -> np.ndarray:
+    from scipy.signal import iirnotch, tf2sos
+
+    nyquist_fq = sampling_frequency / 2
+    notch_frequencies = [
+        frequency * harmonic
+        for harmonic in range(1, harmonics + 1)
+        if frequency * harmonic < nyquist_fq
+    ]
+    if not notch_frequencies:
+        raise ValueError(
+            f"Line noise frequency must be less than {int(sampling_frequency / 2)}"
+        )
+    return np.vstack(
+        [
+            tf2sos(*iirnotch(notch, quality, fs=sampling_frequency))
+            for notch in notch_frequencies
+        ]
+    )
+
+
+def _group_by_time_axis(
+    waveforms: Sequence[SignalProcessing],
+) -> List[List[SignalProcessing]]:
+    """Group channels with the same sampling frequency and time axis"""
+    groups = dict()
+    for waveform in waveforms:
+        key = (
+            waveform.info.sampling_frequency,
+            len(waveform.times),
+            waveform.times[0] if len(waveform.times) else None,
+        )
+        groups.setdefault(key, list()).append(waveform)
+    return list(groups.values())
+
+
+def _artefact_mask(
+    times: np.ndarray, event_times: np.ndarray, pre: float, post: float
+) -> np.ndarray:
+    starts = np.searchsorted(times, event_times - pre, side="left")
+    stops = np.searchsorted(times, event_times + post, side="right")
+    boundaries = np.zeros(len(times) + 1, dtype=np.int64)
+    np.add.at(boundaries, starts, 1)
+    np.add.at(boundaries, stops, -1)
+    return np.cumsum(boundaries[:-1]) > 0
+
+
+def _interp_weights(times: np.ndarray, blanked: np.ndarray):
+    """Indices of the kept samples either side of each blanked sample, and weights"""
+    kept = np.flatnonzero(~blanked)
+    blanked_index = np.flatnonzero(blanked)
+    position = np.searchsorted(kept, blanked_index)
+    left = kept[np.clip(position - 1, 0, len(kept) - 1)]
+    right = kept[np.clip(position, 0, len(kept) - 1)]
+    span = times[right] - times[left]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = np.where(span > 0, (times[blanked_index] - times[left]) / span, 0)
+    return left, right, weight
@@ -0,0 +1,311 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from spike2py import channels, trial
+from spike2py.types import channel_pair, time_window
+
+DEFAULT_NPERSEG = 1024
+
+
+class Coherence(NamedTuple):
+    """Coherence estimates for channel pairs
+
+    frequencies
+        Frequency bins in Hertz
+    values
+        Magnitude-squared coherence for each channel pair,
+        e.g. values[('Biceps', 'Triceps')]
+    n_segments
+        Number of (pooled) segments contributing to each estimate
+    """
+
+    frequencies: np.ndarray
+    values: Dict[channel_pair, np.ndarray]
+    n_segments: int
+
+
+class CrossCorrelation(NamedTuple):
+    """Normalised cross-correlation for channel pairs
+
+    lags
+        Lags in seconds; a positive lag means the second channel lags the first
+    values
+        Cross-correlation for each channel pair, e.g. values[('Biceps', 'Triceps')]
+    """
+
+    lags: np.ndarray
+    values: Dict[channel_pair, np.ndarray]
+
+
+class CrossSpectra:
+    """Segment spectra of several channels, computed once per channel
+
+    Each channel is split into overlapping, Hann-windowed segments that are
+    transformed with a single vectorised FFT. Segments from several epochs
+    and/or trials are pooled. Auto- and cross-spectra of any channel pair are
+    then formed from these cached spectra, so adding pairs costs no extra FFT.
+
+    Parameters
+    ----------
+    spectra
+        Complex segment spectra for each channel, shape (n_segments, n_frequencies)
+    frequencies
+        Frequency bins in Hertz
+    """
+
+    def __init__(self, spectra: Dict[str, np.ndarray], frequencies: np.ndarray) -> None:
+        self.spectra = spectra
+        self.frequencies = frequencies
+        self._auto_spectra = dict()
+
+    @property
+    def n_segments(self) -> int:
+        return len(next(iter(self.spectra.values())))
+
+    def auto_spectrum(self, channel: str) -> np.ndarray:
+        """Mean power spectrum of `channel` across pooled segments"""
+        if channel not in self._auto_spectra:
+            segments = self.spectra[channel]
+            self._auto_spectra[channel] = np.mean(
+                segments.real**2 + segments.imag**2, axis=0
+            )
+        return self._auto_spectra[channel]
+
+    def cross_spectrum(self, channel1: str, channel2: str) -> np.ndarray:
+        """Mean cross-spectrum of `channel1` and `channel2` across pooled segments"""
+        return np.mean(np.conj(self.spectra[channel1]) * self.spectra[channel2], axis=0)
+
+    def coherence(
+        self, pairs: Sequence[channel_pair] = None, workers: int = None
+    ) -> Coherence:
+        """Magnitude-squared coherence for channel pairs
+
+        Parameters
+        ----------
+        pairs
+            Channel name pairs, e.g. [('Biceps', 'Triceps')].
+            Defaults to all pairs of cached channels.
+        workers
+            Number of processes used to form the pairs. Worth it only for large
+            grids of pairs; defaults to computing in the current process.
+        """
+        pairs = _check_pairs(pairs, list(self.spectra))
+        if workers and workers > 1 and len(pairs) > 1:
+            values = self._coherence_in_processes(pairs, workers)
+        else:
+            values = {pair: self._pair_coherence(*pair) for pair in pairs}
+        return Coherence(self.frequencies, values, self.n_segments)
+
+    def _pair_coherence(self, channel1: str, channel2: str) -> np.ndarray:
+        cross_spectrum = self.cross_spectrum(channel1, channel2)
+        power_product = self.auto_spectrum(channel1) * self.auto_spectrum(channel2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            coherence = (
+                cross_spectrum.real**2 + cross_spectrum.imag**2
+            ) / power_product
+        return np.nan_to_num(coherence)
+
+    def _coherence_in_processes(
+        self, pairs: List[channel_pair], workers: int
+    ) -> Dict[channel_pair, np.ndarray]:
+        chunks = [pairs[i::workers] for i in range(workers) if pairs[i::workers]]
+        with ProcessPoolExecutor(
+            max_workers=len(chunks),
+            initializer=_init_worker,
+            initargs=(self.spectra, self.frequencies),
+        ) as executor:
+            results = executor.map(_worker_coherence, chunks)
+        values = dict()
+        for result in results:
+            values.update(result)
+        return {pair: values[pair] for pair in pairs}
+
+
+_worker_spectra: CrossSpectra = None
+
+
+def _init_worker(spectra: Dict[str, np.ndarray], frequencies: np.ndarray) -> None:
+    global _worker_spectra
+    _worker_spectra = CrossSpectra(spectra, frequencies)
+
+
+def _worker_coherence(pairs: List[channel_pair]) -> Dict[channel_pair, np.ndarray]:
+    return {pair: _worker_spectra._pair_coherence(*pair) for pair in pairs}
+
+
+def cross_spectra(
+    trials: Sequence["trial.Trial"],
+    channel_names: Sequence[str],
+    nperseg: int = DEFAULT_NPERSEG,
+    noverlap: int = None,
+    epochs: Sequence[time_window] = None,
+) -> CrossSpectra:
+    """Compute segment spectra of channels, pooled across trials and epochs
+
+    Parameters
+    ----------
+    trials
+        Trials containing the Waveform channels named in `channel_names`
+    channel_names
+        Names of Waveform channels, as they appear as Trial attributes
+    nperseg
+        Number of samples per FFT segment
+    noverlap
+        Number of samples shared by consecutive segments; defaults to nperseg // 2
+    epochs
+        (start, end) times in seconds, e.g. [(1.5, 3.5), (10, 12)].
+        Only data within these epochs is used. Defaults to the whole trial.
+
+    Returns
+    -------
+    CrossSpectra
+        Cached segment spectra from which pairs of channels can be formed
+    """
+    noverlap = nperseg // 2 if noverlap is None else noverlap
+    if not 0 <= noverlap < nperseg:
+        raise ValueError("noverlap must be between 0 and nperseg - 1")
+    sampling_frequency = _common_sampling_frequency(trials, channel_names)
+    window = np.hanning(nperseg + 1)[:-1]
+    segments_per_channel = {channel: list() for channel in channel_names}
+    for spike2py_trial in trials:
+        waveforms = [getattr(spike2py_trial, channel) for channel in channel_names]
+        for start, stop in _epoch_slices(waveforms, epochs):
+            for channel, waveform in zip(channel_names, waveforms):
+                segments_per_channel[channel].append(
+                    _segment_spectra(
+                        waveform.values[start:stop], window, nperseg - noverlap
+                    )
+                )
+    spectra = {
+        channel: np.concatenate(segments)
+        for channel, segments in segments_per_channel.items()
+    }
+    if len(next(iter(spectra.values()))) == 0:
+        raise ValueError(f"Not enough data for a single segment of {nperseg} samples")
+    frequencies = np.fft.rfftfreq(nperseg, d=1 / sampling_frequency)
+    return CrossSpectra(spectra, frequencies)
+
+
+def coherence(
+    trials: Sequence["trial.Trial"],
+    pairs: Sequence[channel_pair],
+    nperseg: int = DEFAULT_NPERSEG,
+    noverlap: int = None,
+    epochs: Sequence[time_window] = None,
+    workers: int = None,
+) -> Coherence:
+    """Pooled magnitude-squared coherence of channel pairs across trials
+
+    Segments from all `trials` and `epochs` are pooled before the
+    auto- and cross-spectra are averaged. See :func:`cross_spectra` for
+    parameter details.
+    """
+    channel_names = list(dict.fromkeys(channel for pair in pairs for channel in pair))
+    spectra = cross_spectra(trials, channel_names, nperseg, noverlap, epochs)
+    return spectra.coherence(pairs, workers)
+
+
+def cross_correlation(
+    spike2py_trial: "trial.Trial",
+    pairs: Sequence[channel_pair],
+    max_lag: float = None,
+) -> CrossCorrelation:
+    """FFT-based normalised cross-correlation of channel pairs
+
+    Each channel is demeaned and transformed once; pairs are then formed in
+    the frequency domain.
+
+    Parameters
+    ----------
+    spike2py_trial
+        Trial containing the Waveform channels named in `pairs`
+    pairs
+        Channel name pairs, e.g. [('Biceps', 'Triceps')]
+    max_lag
+        Largest lag, in seconds, to return. Defaults to all lags.
+    """
+    from scipy.fft import next_fast_len
+
+    channel_names = list(dict.fromkeys(channel for pair in pairs for channel in pair))
+    sampling_frequency = _common_sampling_frequency([spike2py_trial], channel_names)
+    waveforms = [getattr(spike2py_trial, channel) for channel in channel_names]
+    n_samples = min(len(waveform.values) for waveform in waveforms)
+    n_fft = next_fast_len(2 * n_samples - 1, real=True)
+    ffts = dict()
+    norms = dict()
+    for channel, waveform in zip(channel_names, waveforms):
+        values = waveform.values[:n_samples] - np.mean(waveform.values[:n_samples])
+        ffts[channel] = np.fft.rfft(values, n_fft)
+        norms[channel] = np.sqrt(np.dot(values, values))
+    max_lag_samples = n_samples - 1
+    if max_lag is not None:
+        max_lag_samples = min(int(round(max_lag * sampling_frequency)), n_samples - 1)
+    lag_index = np.arange(-max_lag_samples, max_lag_samples + 1)
+    values = dict()
+    for channel1, channel2 in pairs:
+        correlation = np.fft.irfft(np.conj(ffts[channel1]) * ffts[channel2], n_fft)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values[(channel1, channel2)] = np.nan_to_num(
+                correlation[lag_index] / (norms[channel1] * norms[channel2])
+            )
+    return CrossCorrelation(lag_index / sampling_frequency, values)
+
+
+def all_pairs(channel_names: Sequence[str]) -> List[channel_pair]:
+    """All unique pairs of `channel_names`"""
+    return list(combinations(channel_names, 2))
+
+
+def _check_pairs(
+    pairs: Sequence[channel_pair], channel_names: List[str]
+) -> List[channel_pair]:
+    if pairs is None:
+        return all_pairs(channel_names)
+    pairs = [tuple(pair) for pair in pairs]
+    for pair in pairs:
+        for channel in pair:
+            if channel not in channel_names:
+                raise ValueError(f"No spectra were computed for channel {channel}")
+    return pairs
+
+
+def _common_sampling_frequency(
+    trials: Sequence["trial.Trial"], channel_names: Sequence[str]
+) -> int:
+    sampling_frequencies = {
+        getattr(spike2py_trial, channel).info.sampling_frequency
+        for spike2py_trial in trials
+        for channel in channel_names
+    }
+    if len(sampling_frequencies) != 1:
+        raise ValueError(
+            "All channels must have the same sampling frequency; "
+            f"found {sorted(sampling_frequencies)}"
+        )
+    return sampling_frequencies.pop()
+
+
+def _epoch_slices(
+    waveforms: List["channels.Waveform"],
+    epochs: Sequence[time_window],
+) -> List[Tuple[int, int]]:
+    n_samples = min(len(waveform.values) for waveform in waveforms)
+    if epochs is None:
+        return [(0, n_samples)]
+    times = waveforms[0].times[:n_samples]
+    return [
+        (np.searchsorted(times, start), np.searchsorted(times, end))
+        for start, end in epochs
+    ]
+
+
+def _segment_spectra(values: np.ndarray, window: np.ndarray, step: int) -> np.ndarray:
+    nperseg = len(window)
+    if len(values) < nperseg:
+        return np.empty((0, nperseg // 2 + 1), dtype=complex)
+    segments = np.lib.stride_tricks.sliding_window_view(values, nperseg)[::step]
+    segments = segments - segments.mean(axis=1, keepdims=True)
+    return np.fft.rfft(segments * window, axis=1)
@@ -1,10 +1,18 @@
+import copy
+import os
 import pickle
 from pathlib import Path
 from dataclasses import dataclass
-from typing import List, Literal, Union
+from typing import TYPE_CHECKING, Dict, List, Literal, Sequence, Union
 
-from spike2py import channels, read, plot
+import numpy as np
 
+from spike2py import channels, memory, profiling, read, sig_proc, spectral
+from spike2py import cache, segments
+from spike2py.types import artefact_times, channel_pair, time_window, trial_source
+
+if TYPE_CHECKING:
+    from spike2py import shared
 
 CHANNEL_GENERATOR = {
     "event": channels.Event,
@@ -28,6 +36,7 @@ class TrialInfo:
     subject_id: str = None
     path_save_figures: Path = None
     path_save_trial: Path = None
+    summary_pyramids: bool = False
 
     def __repr__(self):
         return (
@@ -38,6 +47,7 @@ class TrialInfo:
             f"\tsubject_id={repr(self.subject_id)},\n"
             f"\tpath_save_figures={repr(self.path_save_figures)},\n"
             f"\tpath_save_trial={repr(self.path_save_trial)},\n"
+            f"\tsummary_pyramids={repr(self.summary_pyramids)},\n"
             f")"
         )
 
@@ -64,6 +74,9 @@ class Trial:
         path_save_trial : pathlib.Path
             Path where trial data to be saved
             Defaults to new 'data' folder where .mat was retrieved
+        summary_pyramids : bool
+            Build a summary pyramid for each Waveform channel when the trial is
+            loaded and saved (see :meth:`build_pyramids`). Defaults to False
 
     Attributes
     ----------
@@ -75,6 +88,10 @@ class Trial:
     <Channels> : channels.Channel
         Each channel appears with its name as an attribute.
         For example: trial1.Torque
+        Channels are read from `info.file` the first time they are accessed.
+    profile : spike2py.profiling.Profile
+        Timing and memory of the stages run on the trial and its channels
+        while profiling is enabled (see :mod:`spike2py.profiling`)
 
     Raises
     ------
@@ -86,8 +103,8 @@ class Trial:
     def __init__(self, trial_info: TrialInfo) -> None:
         if not trial_info.file:
             raise ValueError("info must include a valid full path to a data file.")
-        self._add_defaults_to_trial_info(trial_info)
-        self._parse_trial_data()
+        self.profile = profiling.Profile()
+        self._open(trial_info)
 
     def __repr__(self) -> str:
         channel_text = list()
@@ -103,6 +120,14 @@ class Trial:
             f"\n\tchannels {channel_info}"
         )
 
+    @profiling.stage(
+        "trial.open",
+        label=lambda self, trial_info: trial_info.name or Path(trial_info.file).stem,
+    )
+    def _open(self, trial_info: TrialInfo):
+        self._add_defaults_to_trial_info(trial_info)
+        self._parse_trial_data()
+
     def _add_defaults_to_trial_info(self, trial_info: TrialInfo):
         name = trial_info.name if trial_info.name else Path(trial_info.file).stem
         subject_id = trial_info.subject_id if trial_info.subject_id else "sub"
@@ -121,40 +146,362 @@ class Trial:
             subject_id=subject_id,
             path_save_figures=path_save_figures,
             path_save_trial=path_save_trial,
+            summary_pyramids=trial_info.summary_pyramids,
         )
 
     def _parse_trial_data(self):
-        trial_data = self._import_trial_data()
-        channel_names = list()
-        for key, value in trial_data.items():
-            channel_names.append((key.title(), value["ch_type"]))
-            value["path_save_figures"] = self.info.path_save_figures
-            value["trial_name"] = self.info.name
-            value["subject_id"] = self.info.subject_id
+        self._channel_index = {
+            name.title(): location
+            for name, location in read.index(self.info.file, self.info.channels).items()
+        }
+        self.channels = [
+            (channel_name, location.ch_type)
+            for channel_name, location in self._channel_index.items()
+        ]
+
+    def __getattr__(self, name: str):
+        """Create channels from the data file on first access"""
+        channel_index = self.__dict__.get("_channel_index", {})
+        if name not in channel_index:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        return self._create_channel(name)
+
+    @profiling.stage("trial.create_channel", label=lambda self, name: name)
+    def _create_channel(self, name: str):
+        location = self._channel_index[name]
+        value = cache.read_channel(self.info.file, location)
+        value["path_save_figures"] = self.info.path_save_figures
+        value["trial_name"] = self.info.name
+        value["subject_id"] = self.info.subject_id
+        channel = CHANNEL_GENERATOR[location.ch_type](location.name, value)
+        channel.profile = self.profile
+        if self.info.summary_pyramids and (location.ch_type == "waveform"):
+            channel.build_pyramid()
+        setattr(self, name, channel)
+        return channel
+
+    def __dir__(self):
+        return list(super().__dir__()) + [
+            name
+            for name in self.__dict__.get("_channel_index", {})
+            if name not in self.__dict__
+        ]
+
+    def __getstate__(self):
+        """Create all channels before a trial is pickled or copied"""
+        self.load_channels()
+        return self.__dict__
+
+    @profiling.stage("trial.load_channels")
+    def load_channels(self):
+        """Create all channels now rather than on first access
+
+        Channels are otherwise read from the data file the first time they are
+        accessed, so opening a trial only costs reading the file's index.
+        """
+        for channel_name, _ in self.channels:
+            getattr(self, channel_name)
+        return self
+
+    def window(self, start: float, end: float):
+        """Restrict all channels to the time range `start` <= time <= `end`
+
+        Channels of the returned trial hold NumPy views of this trial's data;
+        see :meth:`spike2py.channels.Channel.window`.
+
+        Parameters
+        ----------
+        start
+            Start time in seconds
+        end
+            End time in seconds
+
+        Returns
+        -------
+        Trial
+            New trial with windowed channels
+        """
+        windowed = copy.copy(self)
+        windowed.channels = list(self.channels)
+        for channel_name, _ in self.channels:
             setattr(
-                self,
-                key.title(),
-                CHANNEL_GENERATOR[value["ch_type"]](key, value),
+                windowed, channel_name, getattr(self, channel_name).window(start, end)
             )
-        self.channels = channel_names
+        return windowed
+
+    def add_channel(self, channel: "channels.Channel", name: str = None) -> None:
+        """Add a channel, for example one created by :mod:`spike2py.detect`
+
+        Parameters
+        ----------
+        channel
+            Instance of spike2py.channels.<ch> where possible ch are
+            Event, Keyboard, Textmark, Waveform and Wavemark
+        name
+            Attribute name of the channel; defaults to channel.info.name.title()
+        """
+        name = name if name else channel.info.name.title()
+        channel_type = _channel_type(channel)
+        self.channels = [
+            (ch_name, ch_type) for ch_name, ch_type in self.channels if ch_name != name
+        ]
+        self.channels.append((name, channel_type))
+        if channel.profile is None:
+            channel.profile = self.profile
+        setattr(self, name, channel)
+
+    def plot(
+        self, save: Literal[True, False] = None, interactive: bool = False
+    ) -> None:
+        """Plot all channels of the trial
+
+        Parameters
+        ----------
+        save
+            Set to `True` to save trial figure to `info.path_save_figures`
+        interactive
+            Redraw Waveform channels at the resolution of the visible time
+            range when zooming or panning. Useful for long trials.
+        """
+        from spike2py import plot
+
+        plot.plot_trial(self, save=save, interactive=interactive)
+
+    def cross_spectra(
+        self,
+        channel_names: Sequence[str] = None,
+        nperseg: int = spectral.DEFAULT_NPERSEG,
+        noverlap: int = None,
+        epochs: Sequence[time_window] = None,
+    ) -> spectral.CrossSpectra:
+        """Compute segment spectra once per channel
+
+        Coherence of any pair of the included channels can then be formed with
+        :meth:`spike2py.spectral.CrossSpectra.coherence` without further FFTs.
+
+        Parameters
+        ----------
+        channel_names
+            Names of Waveform channels; defaults to all Waveform channels
+        nperseg
+            Number of samples per FFT segment
+        noverlap
+            Number of samples shared by consecutive segments; defaults to nperseg // 2
+        epochs
+            (start, end) times in seconds; segments from all epochs are pooled
+        """
+        if channel_names is None:
+            channel_names = self._waveform_names()
+        return spectral.cross_spectra([self], channel_names, nperseg, noverlap, epochs)
+
+    def coherence(
+        self,
+        pairs: Sequence[channel_pair] = None,
+        nperseg: int = spectral.DEFAULT_NPERSEG,
+        noverlap: int = None,
+        epochs: Sequence[time_window] = None,
+        workers: int = None,
+    ) -> spectral.Coherence:
+        """Magnitude-squared coherence between pairs of Waveform channels
+
+        Parameters
+        ----------
+        pairs
+            Channel name pairs, e.g. [('Biceps', 'Triceps')];
+            defaults to all pairs of Waveform channels
+        nperseg, noverlap, epochs
+            See :meth:`cross_spectra`
+        workers
+            Number of processes used to form pairs from the cached spectra
+        """
+        if pairs is None:
+            pairs = spectral.all_pairs(self._waveform_names())
+        channel_names = list(dict.fromkeys(name for pair in pairs for name in pair))
+        spectra = self.cross_spectra(channel_names, nperseg, noverlap, epochs)
+        return spectra.coherence(pairs, workers)
+
+    def cross_correlation(
+        self, pairs: Sequence[channel_pair] = None, max_lag: float = None
+    ) -> spectral.CrossCorrelation:
+        """FFT-based normalised cross-correlation between pairs of Waveform channels
+
+        Parameters
+        ----------
+        pairs
+            Channel name pairs, e.g. [('Biceps', 'Triceps')];
+            defaults to all pairs of Waveform channels
+        max_lag
+            Largest lag, in seconds, to return; defaults to all lags
+        """
+        if pairs is None:
+            pairs = spectral.all_pairs(self._waveform_names())
+        return spectral.cross_correlation(self, pairs, max_lag)
 
-    def _import_trial_data(self):
-        return read.read(self.info.file, self.info.channels)
+    def blank_artefacts(
+        self,
+        event_times: artefact_times,
+        channel_names: Sequence[str] = None,
+        pre: float = 0.001,
+        post: float = 0.005,
+        method: Literal["interp", "zero"] = "interp",
+    ):
+        """Blank stimulus artefacts in several Waveform channels in one pass
 
-    def plot(self, save: Literal[True, False] = None) -> None:
-        plot.plot_trial(self, save=save)
+        Parameters
+        ----------
+        event_times
+            Event channel (e.g. trial1.Stim) or array of times in seconds
+        channel_names
+            Names of Waveform channels; defaults to all Waveform channels
+        pre, post, method
+            See :meth:`spike2py.sig_proc.SignalProcessing.blank_artefacts`
+        """
+        sig_proc.blank_artefacts(
+            self._waveforms(channel_names), event_times, pre, post, method
+        )
+        return self
+
+    def remove_line_noise(
+        self,
+        channel_names: Sequence[str] = None,
+        frequency: float = 50,
+        harmonics: int = 3,
+        quality: float = sig_proc.DEFAULT_LINE_NOISE_QUALITY,
+    ):
+        """Remove line noise from several Waveform channels in one pass
+
+        Parameters
+        ----------
+        channel_names
+            Names of Waveform channels; defaults to all Waveform channels
+        frequency, harmonics, quality
+            See :meth:`spike2py.sig_proc.SignalProcessing.remove_line_noise`
+        """
+        sig_proc.remove_line_noise(
+            self._waveforms(channel_names), frequency, harmonics, quality
+        )
+        return self
 
+    def build_pyramids(
+        self, channel_names: Sequence[str] = None, rebuild: bool = False
+    ):
+        """Build summary pyramids of Waveform channels
+
+        Pyramids are saved with the trial and answer
+        :meth:`spike2py.channels.Waveform.windowed_stats` queries and channel
+        overviews without scanning `values`.
+
+        Parameters
+        ----------
+        channel_names
+            Names of Waveform channels; defaults to all Waveform channels
+        rebuild
+            Rebuild pyramids that are still current; by default only missing
+            or stale pyramids are built
+        """
+        for waveform in self._waveforms(channel_names):
+            if rebuild or (waveform.summary_pyramid is None):
+                waveform.build_pyramid()
+        return self
+
+    def memory_usage(self) -> memory.MemoryUsage:
+        """Bytes of memory held by each array attribute of the loaded channels
+
+        Attributes are named '<channel>.<attribute>' (e.g. 'Emg1.proc_rect').
+        Memory shared between attributes or channels is counted once; channels
+        not yet read from the data file hold no memory and are not listed.
+        """
+        return memory.memory_usage(self._loaded_channels())
+
+    def compact(
+        self, budget: int = 0, drop: bool = False, directory: Path = None
+    ) -> memory.MemoryUsage:
+        """Spill or drop intermediate arrays of channels to use at most `budget` bytes
+
+        Intermediate arrays (`proc_*` arrays and `times_pre_interp`, largest
+        first, then `raw_values`) are written to .npy files and replaced by
+        read-only memory maps of these files, so they stay available but their
+        memory can be reclaimed by the operating system. `values`, `times` and
+        intermediates sharing memory with them are never removed.
+
+        Parameters
+        ----------
+        budget
+            Bytes of memory the loaded channels may hold, as reported by
+            :meth:`memory_usage`; by default all intermediates are removed
+        drop
+            Delete intermediate attributes instead of spilling them to disk
+        directory
+            Where spilled arrays are written; defaults to a 'spill' folder in
+            `info.path_save_trial`
+
+        Returns
+        -------
+        spike2py.memory.MemoryUsage
+            Memory held after compacting
+        """
+        if directory is None:
+            directory = self.info.path_save_trial / "spill" / self.info.name
+        return memory.compact(self._loaded_channels(), budget, directory, drop)
+
+    def share(self, min_bytes: int = None) -> "shared.SharedObject":
+        """Copy the trial's arrays to shared memory and return a picklable descriptor
+
+        All channels are read first. Returning the descriptor from a worker
+        process sends only the trial's metadata; the receiving process
+        rebuilds the trial with :meth:`~spike2py.shared.SharedObject.load`,
+        without copying its arrays, and must free the memory with
+        :meth:`~spike2py.shared.SharedObject.unlink` (see
+        :mod:`spike2py.shared`).
+
+        Parameters
+        ----------
+        min_bytes
+            Arrays smaller than this are pickled with the descriptor instead;
+            defaults to :data:`spike2py.shared.DEFAULT_MIN_BYTES`
+        """
+        from spike2py import shared
+
+        return shared.share(self, min_bytes)
+
+    def _loaded_channels(self) -> Dict[str, "channels.Channel"]:
+        return {
+            name: self.__dict__[name]
+            for name, _ in self.channels
+            if name in self.__dict__
+        }
+
+    def _waveforms(
+        self, channel_names: Sequence[str] = None
+    ) -> List["channels.Waveform"]:
+        if channel_names is None:
+            channel_names = self._waveform_names()
+        return [getattr(self, name) for name in channel_names]
+
+    def _waveform_names(self) -> List[str]:
+        return [name for name, ch_type in self.channels if ch_type == "waveform"]
+
+    @profiling.stage("trial.save")
     def save(self):
         """Save trial
 
         Trial will be saved (pickled) to `info.path_save_trial` as info.name + '.pkl'
+        If `info.summary_pyramids` is True, missing or stale summary pyramids
+        are built first and saved with the trial.
 
         """
+        if self.info.summary_pyramids:
+            self.build_pyramids()
         if not self.info.path_save_trial.exists():
             self.info.path_save_trial.mkdir()
         pickle_file = self.info.path_save_trial / (self.info.name + ".pkl")
-        with open(pickle_file, "wb") as output:
+        # Written aside first, so an interrupted save never leaves a partial file
+        temporary = pickle_file.with_name(f"{pickle_file.name}.{os.getpid()}.tmp")
+        with open(temporary, "wb") as output:
             pickle.dump(self, output, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, pickle_file)
 
 
 def _check_make_path(path_to_check: Path, path_to_make: Path):
@@ -162,11 +509,19 @@ def _check_make_path(path_to_check: Path, path_to_make: Path):
         path_to_check = Path(path_to_check)
     else:
         path_to_check = path_to_make
-    if not path_to_check.exists():
-        path_to_check.mkdir(parents=True)
+    path_to_check.mkdir(parents=True, exist_ok=True)
     return path_to_check
 
 
+def _channel_type(channel: "channels.Channel") -> str:
+    """Channel type of a channel instance, as listed in `Trial.channels`"""
+    for ch_type, channel_class in CHANNEL_GENERATOR.items():
+        if isinstance(channel, channel_class):
+            return ch_type
+    raise TypeError(f"{type(channel).__name__} is not a spike2py channel type")
+
+
+@profiling.stage("trial.load", label=lambda file: Path(file).stem)
 def load(file: Union[Path, str]) -> Trial:
     """Load saved (pickled) trial
 
@@ -184,3 +539,164 @@ def load(file: Union[Path, str]) -> Trial:
     """
     with open(file, "rb") as trial_file:
         return pickle.load(trial_file)
+
+
+def from_source(source: trial_source) -> Trial:
+    """Trial from a Trial, a TrialInfo, or a path to a .mat or saved (.pkl) trial
+
+    Parameters
+    ----------
+    source
+        A Trial is returned as is; a TrialInfo or a .mat file is opened (its
+        channels are read when first accessed); a .pkl file is loaded with
+        :func:`load`
+    """
+    if isinstance(source, Trial):
+        return source
+    if isinstance(source, TrialInfo):
+        return Trial(source)
+    if Path(source).suffix == ".pkl":
+        return load(source)
+    return Trial(TrialInfo(file=source))
+
+
+@profiling.stage("trial.merge")
+def merge(
+    sources: Sequence[trial_source], offsets: Sequence[float] = None, name: str = None
+) -> Trial:
+    """Trial joining consecutive recordings, such as a session saved in several files
+
+    Each channel of the first trial is joined with the channel of the same
+    name in the other trials, whose times are shifted by their offset. The
+    `times` and `values` of Waveform channels are
+    :class:`spike2py.segments.SegmentedArray` of the arrays of each trial,
+    which are not copied; the times (and codes or action potentials) of other
+    channel types are concatenated. Processing steps of merged Waveforms run
+    segment by segment, with filters continuous across segment boundaries.
+
+    Parameters
+    ----------
+    sources
+        Trials in recording order, given as Trial or TrialInfo instances, or
+        as paths to Spike2 .mat files or saved (.pkl) trials
+    offsets
+        Seconds added to the times of each trial. Defaults to each trial
+        starting one sample after the last sample of the previous one.
+    name
+        Name of the merged trial; defaults to the name of the first trial
+
+    Returns
+    -------
+    Trial
+        Trial with the information of the first trial and merged channels
+
+    Raises
+    ------
+    ValueError
+        If a trial lacks a channel of the first trial, sampling frequencies
+        differ, or a trial starts before the end of the previous one
+    """
+    trials = [from_source(source) for source in sources]
+    if not trials:
+        raise ValueError("At least one trial is needed to merge trials")
+    if offsets is None:
+        offsets = _consecutive_offsets(trials)
+    if len(offsets) != len(trials):
+        raise ValueError("offsets must have one value per trial")
+    merged = copy.copy(trials[0])
+    merged.info = copy.copy(trials[0].info)
+    merged.info.name = name or trials[0].info.name
+    merged.profile = profiling.Profile()
+    merged.channels = list(trials[0].channels)
+    for channel_name, channel_type in merged.channels:
+        parts = list()
+        for spike2py_trial in trials:
+            if channel_name not in dict(spike2py_trial.channels):
+                raise ValueError(
+                    f"Trial {spike2py_trial.info.name} has no {channel_name} channel"
+                )
+            parts.append(getattr(spike2py_trial, channel_name))
+        channel = _merge_channel(parts, offsets, channel_type)
+        channel.info = channel.info._replace(trial_name=merged.info.name)
+        channel.profile = merged.profile
+        setattr(merged, channel_name, channel)
+    return merged
+
+
+def _consecutive_offsets(trials: List[Trial]) -> List[float]:
+    offsets = [0.0]
+    for spike2py_trial in trials[:-1]:
+        end = 0.0
+        for channel_name, channel_type in spike2py_trial.channels:
+            channel = getattr(spike2py_trial, channel_name)
+            if not len(channel.times):
+                continue
+            sample = 0.0
+            if channel_type == "waveform":
+                sample = 1 / channel.info.sampling_frequency
+            end = max(end, channel.times[-1] + sample)
+        offsets.append(offsets[-1] + end)
+    return offsets
+
+
+def _merge_channel(
+    parts: List["channels.Channel"], offsets: Sequence[float], channel_type: str
+) -> "channels.Channel":
+    spans = [
+        (part.times[0] + offset, part.times[-1] + offset)
+        for part, offset in zip(parts, offsets)
+        if len(part.times)
+    ]
+    for (_, previous_end), (following_start, _) in zip(spans, spans[1:]):
+        if following_start <= previous_end:
+            raise ValueError(
+                f"Channel {parts[0].info.name} of a trial starts before the end of the "
+                "previous trial; check the offsets"
+            )
+    merged = copy.copy(parts[0])
+    if channel_type == "waveform":
+        if len({part.info.sampling_frequency for part in parts}) > 1:
+            raise ValueError(
+                f"Channel {parts[0].info.name} has different sampling frequencies"
+            )
+        for attribute in list(vars(merged)):
+            if attribute.startswith(("proc_", "_pyramid")) or attribute in (
+                "times_pre_interp",
+                "recipe",
+                "_fingerprint",
+                "_step",
+            ):
+                delattr(merged, attribute)
+        # Offsets are added as times are read, so times are not copied either
+        merged.times = segments.SegmentedArray(
+            [part.times for part in parts], np.asarray(offsets, dtype=float)
+        )
+        merged.values = segments.SegmentedArray([part.values for part in parts])
+        merged.raw_values = merged.values
+        return merged
+    merged.times = np.concatenate(
+        [part.times + offset for part, offset in zip(parts, offsets)]
+    )
+    codes = [part.codes for part in parts if getattr(part, "codes", None) is not None]
+    if codes:
+        merged.codes = _concatenate(codes)
+    if channel_type == "wavemark":
+        action_potentials = [
+            (
+                np.asarray(part.action_potentials).T
+                if channels._spikes_in_columns(part.action_potentials, len(part.times))
+                else part.action_potentials
+            )
+            for part in parts
+            if part.action_potentials is not None
+        ]
+        if action_potentials:
+            merged.action_potentials = _concatenate(action_potentials)
+        merged._calc_instantaneous_firing_frequency()
+    return merged
+
+
+def _concatenate(parts: List) -> Union[list, np.ndarray]:
+    if all(isinstance(part, list) for part in parts):
+        return [item for part in parts for item in part]
+    return np.concatenate([np.asarray(part) for part in parts])
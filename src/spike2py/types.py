@@ -1,8 +1,9 @@
 from pathlib import Path
-from typing import List, Dict, Union
+from typing import List, Dict, Tuple, Union
 
 import numpy as np
 import spike2py.channels as channels
+import spike2py.trial as trial
 
 mat_data = Dict[str, np.ndarray]
 parsed_mat_data = Dict[str, dict]
@@ -20,4 +21,8 @@ filt_cutoff = Union[filt_cutoff_single, filt_cutoff_pair]
 all_channels = Union[
     "channels.Event", "channels.Keyboard", "channels.Waveform", "channels.Wavemark"
 ]
+artefact_times = Union["channels.Event", np.ndarray]
 ticksline_channels = Union["channels.Event", "channels.Keyboard", "channels.Wavemark"]
+channel_pair = Tuple[str, str]
+time_window = Tuple[float, float]
+trial_source = Union["trial.Trial", "trial.TrialInfo", Path, str]
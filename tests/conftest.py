@@ -9,7 +9,6 @@ import matplotlib.pyplot as plt
 
 from spike2py import channels, sig_proc
 
-
 ACTION_POTENTIALS = [[random.random() for i in range(62)] for _ in range(3)]
 PAYLOADS_DIR = Path(__file__).parent / "payloads"
 PATH = Path(".")
@@ -189,6 +188,8 @@ def mixin_methods():
         "_interp",
         "rect",
         "linear_detrend",
+        "blank_artefacts",
+        "remove_line_noise",
     ]
 
 
@@ -289,6 +290,129 @@ def motor_units_data():
     _remove_files_in_folder_in_payloads_dir(folder="data")
 
 
+def _spike2_waveform(values, sampling_frequency, units="V", start=0):
+    interval = 1 / sampling_frequency
+    return {
+        "title": "",
+        "comment": "",
+        "interval": interval,
+        "scale": 1.0,
+        "offset": 0.0,
+        "units": units,
+        "start": start,
+        "length": len(values),
+        "values": values.reshape(-1, 1),
+        "times": (start + np.arange(len(values)) * interval).reshape(-1, 1),
+    }
+
+
+def _spike2_event(times):
+    return {
+        "title": "",
+        "comment": "",
+        "interval": 0.0,
+        "times": times.reshape(-1, 1),
+        "length": len(times),
+    }
+
+
+def _spike2_keyboard(times, codes):
+    encoded = np.zeros((len(codes), 4), dtype=np.uint8)
+    encoded[:, 0] = [ord(code) for code in codes]
+    return {
+        "title": "Keyboard",
+        "comment": "",
+        "resolution": 1e-5,
+        "length": len(times),
+        "times": times.reshape(-1, 1),
+        "codes": encoded,
+    }
+
+
+def _spike2_wavemark(times, action_potentials, units, sampling_frequency):
+    """Wavemark with one action potential per row and its unit in codes[:, 0]"""
+    codes = np.zeros((len(times), 4), dtype=np.uint8)
+    codes[:, 0] = units
+    return {
+        "title": "",
+        "comment": "",
+        "interval": 1 / sampling_frequency,
+        "scale": 1.0,
+        "offset": 0.0,
+        "units": "V",
+        "trigger": 0,
+        "resolution": 1e-5,
+        "length": action_potentials.shape[1],
+        "items": 1,
+        "traces": 1,
+        "times": times.reshape(-1, 1),
+        "codes": codes,
+        "values": action_potentials.T,
+    }
+
+
+@pytest.fixture()
+def synthetic_trial_file(tmp_path):
+    """Small Spike2-style .mat file with two coupled EMG channels"""
+    rng = np.random.default_rng(42)
+    sampling_frequency = 1000
+    n_samples = 20 * sampling_frequency
+    times = np.arange(n_samples) / sampling_frequency
+    common = np.sin(2 * np.pi * 25 * times) + rng.normal(size=n_samples)
+    file = tmp_path / "synthetic.mat"
+    sio.savemat(
+        file,
+        {
+            "EMG1": _spike2_waveform(
+                common + rng.normal(size=n_samples), sampling_frequency
+            ),
+            "EMG2": _spike2_waveform(
+                np.roll(common, 3) + rng.normal(size=n_samples), sampling_frequency
+            ),
+            "Noise": _spike2_waveform(rng.normal(size=n_samples), sampling_frequency),
+            "Stim": _spike2_event(np.array([1.0, 5.0, 9.5, 14.25])),
+            "Keyboard": _spike2_keyboard(np.array([2.0, 12.0]), ["a", "b"]),
+        },
+    )
+    return file
+
+
+@pytest.fixture()
+def split_trial_files(synthetic_trial_file):
+    """The synthetic trial saved in three consecutive files, each starting at 0 s"""
+    data = sio.loadmat(synthetic_trial_file, squeeze_me=True, struct_as_record=False)
+    files = list()
+    for i, (start, end) in enumerate([(0, 6), (6, 13), (13, 20)]):
+        samples = slice(start * 1000, end * 1000)
+        part = {
+            name: _spike2_waveform(data[name].values[samples], 1000)
+            for name in ("EMG1", "EMG2", "Noise")
+        }
+        stim = np.atleast_1d(data["Stim"].times)
+        stim = stim[(stim >= start) & (stim < end)] - start
+        part["Stim"] = _spike2_event(stim)
+        keyboard = np.atleast_1d(data["Keyboard"].times)
+        in_part = (keyboard >= start) & (keyboard < end)
+        codes = ["ab"[code] for code in np.flatnonzero(in_part)]
+        part["Keyboard"] = _spike2_keyboard(keyboard[in_part] - start, codes)
+        files.append(synthetic_trial_file.with_name(f"part{i + 1}.mat"))
+        sio.savemat(files[-1], part)
+    return files
+
+
+@pytest.fixture()
+def wavemark_trial_file(tmp_path):
+    """Spike2-style .mat file with a Wavemark of two motor units"""
+    file = tmp_path / "wavemark.mat"
+    times = np.array([1.0, 1.5, 2.5, 3.0])
+    action_potentials = np.arange(4 * 5, dtype=float).reshape(4, 5)
+    sio.savemat(
+        file,
+        {"MU": _spike2_wavemark(times, action_potentials, [1, 2, 1, 2], 10_000)},
+    )
+    return file
+
+
 @pytest.fixture()
 def tutorial_data_dict():
     tmp = os.getenv("TMP", "/tmp")
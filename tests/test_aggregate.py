@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from spike2py import aggregate, trial
+
+
+def _emg_features(spike2py_trial):
+    return {
+        "epochs": aggregate.epochs(
+            spike2py_trial.Emg1, spike2py_trial.Stim, pre=0.01, post=0.02
+        ),
+        "values": spike2py_trial.Emg1.values,
+    }
+
+
+@pytest.fixture()
+def accumulators():
+    return {
+        "epochs": aggregate.Moments(),
+        "values": aggregate.QuantileSketch(),
+    }
+
+
+def test_moments_match_numpy_in_any_batches():
+    observations = np.random.default_rng(0).normal(3, 2, size=(101, 5))
+    moments = aggregate.Moments()
+    for batch in np.array_split(observations, 7):
+        moments.update(batch)
+    other = aggregate.Moments().update(observations[:10])
+    merged = aggregate.Moments().update(observations[10:]).merge(other)
+    for result in (moments, merged):
+        assert result.count == 101
+        np.testing.assert_allclose(result.mean, observations.mean(axis=0))
+        np.testing.assert_allclose(result.variance, observations.var(axis=0, ddof=1))
+    assert aggregate.Moments().update(observations[:1]).variance is None
+
+
+def test_histogram_counts_and_merges():
+    values = np.array([-1, 0, 0.5, 1, 2, np.nan])
+    histogram = aggregate.Histogram([0, 0.5, 1]).update(values)
+    np.testing.assert_array_equal(histogram.counts, [1, 2])
+    assert (histogram.underflow, histogram.overflow) == (1, 1)
+    histogram.merge(aggregate.Histogram([0, 0.5, 1]).update([0.25]))
+    assert histogram.count == 6
+    with pytest.raises(ValueError):
+        histogram.merge(aggregate.Histogram([0, 1]))
+
+
+def test_quantile_sketch_relative_accuracy():
+    values = np.random.default_rng(1).lognormal(size=10000) - 1
+    sketch = aggregate.QuantileSketch(relative_accuracy=0.01)
+    for batch in np.array_split(values, 3):
+        sketch.merge(aggregate.QuantileSketch(0.01).update(batch))
+    quantiles = [0.01, 0.25, 0.5, 0.9, 0.99]
+    expected = np.quantile(values, quantiles, method="lower")
+    np.testing.assert_allclose(sketch.quantile(quantiles), expected, rtol=0.02)
+    assert isinstance(sketch.quantile(0.5), float)
+    assert sketch.count == 10000
+
+
+def test_epochs(synthetic_trial_file):
+    trial1 = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    epochs = aggregate.epochs(trial1.Emg1, [0.005, 1.0, 19.999], pre=0.01, post=0.02)
+    assert epochs.shape == (1, 31)
+    np.testing.assert_array_equal(epochs[0], trial1.Emg1.values[990:1021])
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_reduce_trials(synthetic_trial_file, accumulators, workers):
+    sources = [synthetic_trial_file] * 3
+    result = aggregate.reduce_trials(sources, _emg_features, accumulators, workers)
+    assert accumulators["epochs"].count == 0
+    single = _emg_features(trial.Trial(trial.TrialInfo(file=synthetic_trial_file)))
+    assert result["epochs"].count == 3 * len(single["epochs"])
+    np.testing.assert_allclose(result["epochs"].mean, single["epochs"].mean(axis=0))
+    median = np.median(single["values"])
+    assert result["values"].quantile(0.5) == pytest.approx(median, rel=0.02, abs=0.01)
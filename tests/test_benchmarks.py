@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from spike2py import read
+
+REPO_ROOT = Path(__file__).parents[1]
+
+
+@pytest.fixture()
+def benchmarks(monkeypatch):
+    monkeypatch.syspath_prepend(str(REPO_ROOT))
+    import benchmarks.run
+    import benchmarks.synthetic
+
+    return benchmarks
+
+
+def test_synthetic_recording_has_all_channel_types(benchmarks, tmp_path):
+    file = benchmarks.synthetic.write_recording(
+        tmp_path / "synthetic.mat", benchmarks.synthetic.SIZES["tiny"]
+    )
+    data = read.read(file)
+    assert {name: channel["ch_type"] for name, channel in data.items()} == {
+        "EMG1": "waveform",
+        "EMG2": "waveform",
+        "Stim": "event",
+        "MU1": "wavemark",
+        "Keyboard": "keyboard",
+        "Memory": "textmark",
+    }
+    assert len(data["EMG1"]["values"]) == 5000
+
+
+def test_benchmarks_run_writes_results(benchmarks, tmp_path):
+    output = tmp_path / "results.json"
+    benchmarks.run.main(
+        [
+            "--size",
+            "tiny",
+            "--repeats",
+            "1",
+            "--only",
+            "read",
+            "sig_proc.rect",
+            "--output",
+            str(output),
+        ]
+    )
+    results = json.loads(output.read_text())
+    assert set(results["results"]) == {"read.read", "sig_proc.rect"}
+    assert results["metadata"]["size"] == "tiny"
+    assert results["results"]["read.read"]["peak_memory_bytes"] > 0
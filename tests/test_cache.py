@@ -0,0 +1,83 @@
+import gc
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from spike2py import cache, trial
+
+
+@pytest.fixture()
+def cached():
+    cache.enable()
+    yield
+    cache.disable()
+
+
+def _open(file):
+    return trial.Trial(trial.TrialInfo(file=file))
+
+
+def test_trials_share_read_only_arrays(synthetic_trial_file, cached):
+    trial1, trial2 = _open(synthetic_trial_file), _open(synthetic_trial_file)
+    assert trial1.Emg1.values is trial2.Emg1.values
+    assert trial1.Keyboard.codes == trial2.Keyboard.codes
+    assert trial1.Keyboard.codes is not trial2.Keyboard.codes
+    with pytest.raises(ValueError):
+        trial1.Emg1.values[0] = 0
+    raw = trial2.Emg1.values.copy()
+    trial1.Emg1.remove_mean().lowpass(20)
+    np.testing.assert_array_equal(trial2.Emg1.values, raw)
+    assert cache.info()[:3] == (2, 2, 2)
+
+
+def test_modified_file_is_read_again(synthetic_trial_file, cached):
+    values = _open(synthetic_trial_file).Emg1.values
+    stat = synthetic_trial_file.stat()
+    os.utime(synthetic_trial_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert _open(synthetic_trial_file).Emg1.values is not values
+    assert cache.info().misses == 2
+
+
+def test_evicted_channels_stay_shared_while_in_use(synthetic_trial_file):
+    cache.enable(max_bytes=0)
+    try:
+        trial1 = _open(synthetic_trial_file)
+        values = trial1.Emg1.values
+        assert cache.info().bytes == 0
+        assert _open(synthetic_trial_file).Emg1.values is values
+        del trial1, values
+        gc.collect()
+        _open(synthetic_trial_file).Emg1
+        assert cache.info()[:2] == (1, 2)
+    finally:
+        cache.disable()
+
+
+def test_least_recently_used_channels_evicted(synthetic_trial_file):
+    channel_bytes = _open(synthetic_trial_file).Emg1.values.nbytes * 2
+    cache.enable(max_bytes=int(channel_bytes * 1.5))
+    try:
+        spike2py_trial = _open(synthetic_trial_file)
+        for name in ("Emg1", "Emg2"):
+            getattr(spike2py_trial, name)
+        assert cache.info().channels == 1
+        cache.enable(max_bytes=cache.DEFAULT_MAX_BYTES)
+        spike2py_trial.Stim
+        assert cache.info().channels == 2
+    finally:
+        cache.disable()
+
+
+def test_concurrent_reads_of_a_channel_read_the_file_once(synthetic_trial_file, cached):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        emgs = list(executor.map(lambda _: _open(synthetic_trial_file).Emg1, range(8)))
+    assert all(emg.values is emgs[0].values for emg in emgs)
+    assert cache.info()[:2] == (7, 1)
+
+
+def test_disabled_cache_reads_independent_arrays(synthetic_trial_file):
+    trial1, trial2 = _open(synthetic_trial_file), _open(synthetic_trial_file)
+    assert trial1.Emg1.values is not trial2.Emg1.values
+    assert trial1.Emg1.values.flags.writeable
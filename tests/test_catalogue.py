@@ -0,0 +1,98 @@
+import os
+import shutil
+
+import pytest
+import scipy.io as sio
+
+from spike2py import catalogue, read
+
+
+@pytest.fixture()
+def study(tmp_path, synthetic_trial_file):
+    root = tmp_path / "study"
+    for subject in ("sub01", "sub02"):
+        (root / subject).mkdir(parents=True)
+        shutil.copy(synthetic_trial_file, root / subject / "trial1.mat")
+    (root / "notes.mat").write_text("not a MATLAB file")
+    return root
+
+
+def test_read_headers(synthetic_trial_file):
+    headers = read.headers(synthetic_trial_file)
+    assert list(headers) == ["EMG1", "EMG2", "Noise", "Stim", "Keyboard"]
+    assert headers["EMG1"] == read.ChannelHeader(
+        "EMG1", "waveform", headers["EMG1"].units, 1000, 20000, 0.0, 20.0
+    )
+    assert headers["Stim"].length == 4
+    assert headers["Stim"].end == 14.25
+    assert headers["Keyboard"].ch_type == "keyboard"
+    assert list(read.headers(synthetic_trial_file, ["Stim"])) == ["Stim"]
+
+
+def test_wavemark_length_is_its_spike_count(wavemark_trial_file):
+    header = read.headers(wavemark_trial_file)["MU"]
+    assert (header.length, header.end) == (4, 3.0)
+    with catalogue.Catalogue(":memory:") as cat:
+        cat.scan(wavemark_trial_file.parent)
+        [entry] = cat.query(ch_type="wavemark")
+        assert entry.channels["MU"].length == 4
+
+
+def test_header_end_of_fractional_sampling_frequency(synthetic_trial_file):
+    emg = sio.loadmat(synthetic_trial_file)["EMG1"]
+    emg["interval"][0, 0][0, 0] = 1 / 2000.5
+    sio.savemat(synthetic_trial_file, {"EMG1": emg})
+    header = read.headers(synthetic_trial_file)["EMG1"]
+    assert header.sampling_frequency == 2000
+    assert header.end == pytest.approx(20000 / 2000.5)
+
+
+def test_catalogue_scan_and_query(study):
+    with catalogue.Catalogue(":memory:") as cat:
+        result = cat.scan(study)
+        assert len(result.added) == 2
+        assert result.failed == [study / "notes.mat"]
+        entries = cat.query(subject_id="sub01", channel="emg1", min_duration=15)
+        assert [entry.file for entry in entries] == [study / "sub01" / "trial1.mat"]
+        assert entries[0].duration == 20.0
+        assert entries[0].channels["Stim"].length == 4
+        assert cat.query(channel="Emg1", min_duration=60) == []
+        assert len(cat.query(ch_type="event", max_duration=15)) == 2
+        assert cat.query(ch_type="wavemark") == []
+        assert len(cat.query()) == 2
+
+
+def test_catalogue_rescan_is_incremental(study, tmp_path):
+    database = tmp_path / "study.sqlite"
+    with catalogue.Catalogue(database) as cat:
+        cat.scan(study)
+    changed = study / "sub01" / "trial1.mat"
+    stat = changed.stat()
+    os.utime(changed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (study / "sub02" / "trial1.mat").unlink()
+    with catalogue.Catalogue(database) as cat:
+        result = cat.scan(study)
+        assert result.updated == [changed]
+        assert result.removed == [study / "sub02" / "trial1.mat"]
+        assert result.added == []
+        assert [entry.subject_id for entry in cat.query()] == ["sub01"]
+        assert cat.scan(study).unchanged == [changed]
+
+
+def test_catalogue_trials_are_lazy(study):
+    with catalogue.Catalogue(":memory:") as cat:
+        cat.scan(study)
+        trials = list(cat.trials(channel="Noise"))
+    assert [trial.info.subject_id for trial in trials] == ["sub01", "sub02"]
+    assert "Noise" not in vars(trials[0])
+    assert len(trials[0].Noise.values) == 20000
+
+
+def test_trial_infos_of_directories_and_files(study, synthetic_trial_file, tmp_path):
+    infos = catalogue.trial_infos(
+        [study, synthetic_trial_file], output_directory=tmp_path / "out"
+    )
+    assert [info.subject_id for info in infos] == ["sub", "sub01", "sub02", None]
+    assert infos[1].path_save_trial == tmp_path / "out" / "sub01" / "data"
+    assert infos[3].path_save_figures == tmp_path / "out" / "sub" / "figures"
+    assert catalogue.study_files(study)[1:] == [info.file for info in infos[1:3]]
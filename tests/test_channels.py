@@ -1,4 +1,5 @@
 from pytest import approx
+import numpy as np
 
 from spike2py import channels
 
@@ -71,3 +72,43 @@ def test_channels_wavemark_init(channels_init, channels_mock):
         channels_mock["wavemark"]["instantaneous_firing_frequency"]
     )
     assert repr(wavemark) == "Wavemark channel"
+
+
+def test_channels_waveform_window_returns_views(channels_init):
+    waveform = channels.Waveform(**channels_init["waveform"])
+    windowed = waveform.window(0.5, 1.25)
+    assert list(windowed.times) == [0.5, 0.75, 1.0, 1.25]
+    assert list(windowed.values) == list(waveform.values[2:6])
+    assert np.shares_memory(windowed.values, waveform.values)
+    assert np.shares_memory(windowed.times, waveform.times)
+    assert windowed.info is waveform.info
+
+
+def test_channels_waveform_window_processing_copy_on_write(channels_init):
+    waveform = channels.Waveform(**channels_init["waveform"])
+    original = waveform.values.copy()
+    windowed = waveform.window(0.5, 1.25).remove_mean().remove_value(1).rect()
+    assert list(waveform.values) == list(original)
+    assert list(windowed.raw_values) == list(original[2:6])
+    assert "proc_rect" not in waveform.__dir__()
+
+
+def test_channels_waveform_window_after_interp(channels_init):
+    waveform = channels.Waveform(**channels_init["waveform"])
+    waveform.interp_new_times(np.array([0.1, 0.3, 0.6, 1.4]))
+    windowed = waveform.window(0.2, 0.7)
+    assert list(windowed.times) == [0.3, 0.6]
+    assert list(windowed.times_pre_interp) == [0.5]
+    assert list(windowed.raw_values) == list(waveform.raw_values[2:3])
+
+
+def test_channels_event_keyboard_wavemark_window(channels_init):
+    event = channels.Event(**channels_init["event"]).window(7.7, 8)
+    assert list(event.times) == [7.882]
+    keyboard = channels.Keyboard(**channels_init["keyboard"]).window(0, 50)
+    assert list(keyboard.times) == [1.34]
+    assert keyboard.codes == ["t"]
+    wavemark = channels.Wavemark(**channels_init["wavemark"]).window(7.5, 8)
+    assert list(wavemark.times) == [7.765, 7.915]
+    assert len(wavemark.action_potentials) == 2
+    assert wavemark.inst_firing_frequency == approx([6.6666667])
@@ -0,0 +1,145 @@
+import json
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from spike2py import cli, trial
+
+
+@pytest.fixture()
+def study(tmp_path, synthetic_trial_file):
+    root = tmp_path / "study"
+    for subject in ("sub01", "sub02"):
+        (root / subject).mkdir(parents=True)
+        shutil.copy(synthetic_trial_file, root / subject / "trial1.mat")
+    return root
+
+
+def test_info_lists_channels(synthetic_trial_file, capsys):
+    assert (
+        cli.main(["info", str(synthetic_trial_file), "--channels", "EMG1", "Stim"]) == 0
+    )
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == str(synthetic_trial_file)
+    assert lines[2].split() == [
+        "EMG1",
+        "waveform",
+        "V",
+        "1000",
+        "20000",
+        "0.000",
+        "20.000",
+    ]
+    assert lines[3].split()[:2] == ["Stim", "event"]
+
+
+def test_convert_resumes_and_windows(study, tmp_path, capsys):
+    output = tmp_path / "converted"
+    assert (
+        cli.main(["convert", str(study), "--output", str(output), "--workers", "2"])
+        == 0
+    )
+    converted = trial.load(output / "sub01" / "data" / "trial1.pkl")
+    assert converted.info.subject_id == "sub01"
+    assert len(converted.Emg1.values) == 20000
+
+    assert cli.main(["convert", str(study), "--output", str(output)]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "0 done, 2 skipped, 0 failed"
+
+    arguments = ["--channels", "EMG1", "Stim", "--start", "4", "--end", "10"]
+    file = study / "sub02" / "trial1.mat"
+    assert cli.main(["convert", str(file), "--format", "npz", *arguments]) == 0
+    arrays = np.load(study / "sub02" / "data" / "trial1.npz")
+    assert sorted(arrays) == [
+        "Emg1.sampling_frequency",
+        "Emg1.times",
+        "Emg1.values",
+        "Stim.times",
+    ]
+    assert arrays["Emg1.times"][[0, -1]].tolist() == [4, 10]
+    assert arrays["Stim.times"].tolist() == [5, 9.5]
+
+    arguments = ["--channels", "EMG1", "--start", "1", "--end", "2"]
+    assert cli.main(["convert", str(file), "--format", "npz", *arguments]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "1 done, 0 skipped, 0 failed"
+    arrays = np.load(study / "sub02" / "data" / "trial1.npz")
+    assert arrays["Emg1.times"][[0, -1]].tolist() == [1, 2]
+
+    arguments = ["--channels", "EMG1", "Stim", "--start", "9"]
+    assert cli.main(["convert", str(file), "--format", "npz", *arguments]) == 0
+    arrays = np.load(study / "sub02" / "data" / "trial1.npz")
+    assert arrays["Emg1.times"][[0, -1]].tolist() == [9, 19.999]
+    assert arrays["Stim.times"].tolist() == [9.5, 14.25]
+
+
+def test_convert_wavemarks_to_npz(wavemark_trial_file):
+    arguments = ["--start", "1.2", "--end", "3", "--format", "npz"]
+    assert cli.main(["convert", str(wavemark_trial_file), *arguments]) == 0
+    arrays = np.load(wavemark_trial_file.parent / "data" / "wavemark.npz")
+    assert arrays["Mu.times"].tolist() == [1.5, 2.5, 3.0]
+    assert arrays["Mu.codes"].tolist() == [2, 1, 2]
+    np.testing.assert_array_equal(
+        arrays["Mu.action_potentials"], np.arange(5, 20).reshape(3, 5)
+    )
+
+
+def test_convert_reports_failures(study, capsys):
+    (study / "sub01" / "trial1.mat").write_text("not a MATLAB file")
+    assert cli.main(["convert", str(study)]) == 1
+    out = capsys.readouterr().out.splitlines()
+    assert "failed" in out[0] and "WrongFileType" in out[0]
+    assert out[-1] == "1 done, 0 skipped, 1 failed"
+
+
+def test_process_runs_recipe(study, tmp_path, capsys):
+    recipe_file = tmp_path / "recipe.json"
+    recipe_file.write_text(
+        json.dumps(
+            {
+                "channels": [{"select": "emg*", "steps": ["rect"]}],
+                "outputs": {"save": True},
+            }
+        )
+    )
+    output = tmp_path / "processed"
+    assert (
+        cli.main(["process", str(recipe_file), str(study), "--output", str(output)])
+        == 0
+    )
+    processed = trial.load(output / "sub02" / "data" / "trial1.pkl")
+    assert processed.Emg2.recipe == (("rect", {}),)
+
+
+def test_plot_window(synthetic_trial_file, tmp_path, capsys):
+    arguments = ["--channels", "EMG1", "--no-trial", "--start", "1", "--end", "2"]
+    assert cli.main(["plot", str(synthetic_trial_file), *arguments]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "1 done, 0 skipped, 0 failed"
+    assert (tmp_path / "figures" / "sub_synthetic_EMG1.png").exists()
+    assert cli.main(["plot", str(synthetic_trial_file), *arguments]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "0 done, 1 skipped, 0 failed"
+    (tmp_path / "figures" / "sub_synthetic_EMG1.png").unlink()
+    arguments[-1] = "3"
+    assert cli.main(["plot", str(synthetic_trial_file), *arguments]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "1 done, 0 skipped, 0 failed"
+    assert cli.main(["plot", str(tmp_path / "missing.mat")]) == 1
+
+
+def test_plot_saved_trials(synthetic_trial_file, tmp_path, capsys):
+    spike2py_trial = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    spike2py_trial.save()
+    pickle_file = spike2py_trial.info.path_save_trial / "synthetic.pkl"
+    arguments = ["--output", str(tmp_path / "qc"), "--no-channels", "--format", "pdf"]
+    assert cli.main(["plot", str(pickle_file), *arguments, "--rasterize"]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "1 done, 0 skipped, 0 failed"
+    assert (tmp_path / "qc" / "sub" / "figures" / "sub_synthetic.pdf").exists()
+
+
+def test_module_entry_point():
+    result = subprocess.run(
+        [sys.executable, "-m", "spike2py", "--help"], capture_output=True, text=True
+    )
+    assert result.returncode == 0
+    assert "convert" in result.stdout and "process" in result.stdout
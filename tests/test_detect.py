@@ -0,0 +1,79 @@
+import pytest
+from pytest import approx
+import numpy as np
+
+from spike2py import channels, detect, trial
+
+
+def _waveform(values, sampling_frequency=100):
+    return channels.Waveform(
+        "torque",
+        {
+            "times": np.arange(len(values)) / sampling_frequency,
+            "units": "Nm",
+            "values": np.asarray(values, dtype=float),
+            "sampling_frequency": sampling_frequency,
+            "path_save_figures": None,
+            "trial_name": "strong_you_are",
+            "subject_id": "Yoda",
+        },
+    )
+
+
+@pytest.fixture()
+def noisy_bursts():
+    values = np.zeros(1000)
+    values[100:300] = 1
+    values[500:520] = 1
+    values[700:900] = 1
+    values[[150, 160, 750]] = 0.4
+    return _waveform(values)
+
+
+def test_detect_threshold_rising_and_falling(noisy_bursts):
+    rising = detect.threshold(noisy_bursts, high=0.5)
+    falling = detect.threshold(noisy_bursts, high=0.5, edge="falling")
+    assert isinstance(rising, channels.Event)
+    assert rising.info.name == "torque_rising"
+    assert rising.info.subject_id == "Yoda"
+    assert rising.times == approx([1.0, 1.51, 1.61, 5.0, 7.0, 7.51])
+    assert falling.times == approx([1.5, 1.6, 3.0, 5.2, 7.5, 9.0])
+
+
+def test_detect_threshold_hysteresis_ignores_dips(noisy_bursts):
+    rising = detect.threshold(noisy_bursts, high=0.5, low=0.2)
+    assert rising.times == approx([1.0, 5.0, 7.0])
+
+
+def test_detect_threshold_min_duration_and_min_gap(noisy_bursts):
+    rising = detect.threshold(noisy_bursts, high=0.5, min_duration=0.5, min_gap=0.05)
+    assert rising.times == approx([1.0, 7.0])
+
+
+def test_detect_threshold_chunks_match_single_pass(noisy_bursts):
+    single = detect.threshold(noisy_bursts, high=0.5, low=0.2)
+    chunked = detect.threshold(noisy_bursts, high=0.5, low=0.2, chunk_size=7)
+    assert chunked.times == approx(single.times)
+
+
+def test_detect_threshold_invalid_arguments(noisy_bursts):
+    with pytest.raises(ValueError):
+        detect.threshold(noisy_bursts, high=0.2, low=0.5)
+    with pytest.raises(ValueError):
+        detect.threshold(noisy_bursts, high=0.5, edge="both")
+
+
+def test_detect_bursts_open_at_end():
+    values = np.r_[np.ones(5), np.zeros(10), np.ones(5)]
+    onsets, offsets = detect.bursts(_waveform(values), high=0.5, name="EMG")
+    assert onsets.info.name == "EMG_onsets"
+    assert onsets.times == approx([0, 0.15])
+    assert offsets.times == approx([0.05, 0.19])
+
+
+def test_detect_event_added_to_trial(synthetic_trial_file):
+    trial1 = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    event = detect.threshold(trial1.Emg1, high=3, name="emg1_spikes")
+    trial1.add_channel(event)
+    assert ("Emg1_Spikes", "event") in trial1.channels
+    assert trial1.Emg1_Spikes is event
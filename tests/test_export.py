@@ -0,0 +1,54 @@
+import matplotlib.pyplot as plt
+
+from spike2py import export, trial
+
+
+def test_export_figures_png_without_pyplot(synthetic_trial_file, tmp_path):
+    n_pyplot_figures = len(plt.get_fignums())
+    saved = export.export_figures([synthetic_trial_file], path_save_figures=tmp_path)
+    assert len(plt.get_fignums()) == n_pyplot_figures
+    assert sorted(path.name for path in saved) == [
+        "sub_synthetic.png",
+        "sub_synthetic_EMG1.png",
+        "sub_synthetic_EMG2.png",
+        "sub_synthetic_Keyboard.png",
+        "sub_synthetic_Noise.png",
+        "sub_synthetic_Stim.png",
+    ]
+    assert all(path.read_bytes().startswith(b"\x89PNG") for path in saved)
+
+
+def test_export_figures_pdf_in_processes(synthetic_trial_file, tmp_path):
+    sources = [
+        trial.TrialInfo(file=synthetic_trial_file, name=f"trial{i}") for i in range(3)
+    ]
+    saved = export.export_figures(
+        sources,
+        file_format="pdf",
+        path_save_figures=tmp_path,
+        channel_names=["Emg1"],
+        rasterize=True,
+        workers=2,
+    )
+    assert [path.name for path in saved] == [
+        f"sub_{name}{suffix}.pdf"
+        for name in ["trial0", "trial1", "trial2"]
+        for suffix in ["", "_EMG1"]
+    ]
+    assert all(path.read_bytes().startswith(b"%PDF") for path in saved)
+
+
+def test_reused_figures_do_not_keep_layout(synthetic_trial_file, tmp_path):
+    def trial_figure(channels, directory):
+        info = trial.TrialInfo(file=synthetic_trial_file, channels=channels)
+        options = export.ExportOptions(
+            path_save_figures=tmp_path / directory, include_channels=False
+        )
+        return export.export_trial(info, options)[0].read_bytes()
+
+    # The event channel of the first trial gets a tight layout and no y axis
+    trial_figure(["EMG1", "EMG2", "Stim"], "events")
+    reused = trial_figure(["EMG1", "EMG2", "Noise"], "reused")
+    export._templates.clear()
+    assert reused == trial_figure(["EMG1", "EMG2", "Noise"], "fresh")
+    export._templates.clear()
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+import spike2py
+
+HEAVY_MODULES = [
+    "matplotlib",
+    "scipy.signal",
+    "scipy.fft",
+    "urllib.request",
+    "sqlite3",
+    "asyncio",
+    "multiprocessing.shared_memory",
+]
+
+
+def _run(code):
+    return subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+
+
+def test_import_does_not_load_heavy_modules():
+    loaded = _run(
+        "import sys, spike2py\n"
+        f"print([name for name in {HEAVY_MODULES} if name in sys.modules])"
+    )
+    assert loaded.strip() == "[]"
+
+
+def test_import_does_not_load_lazy_modules():
+    lazy = [f"spike2py.{name}" for name in spike2py._LAZY_MODULES]
+    loaded = _run(
+        "import sys, spike2py\n"
+        f"print([name for name in {lazy} if name in sys.modules])"
+    )
+    assert loaded.strip() == "[]"
+
+
+def test_import_lazy_modules_still_available():
+    assert spike2py.plot.plot_trial
+    assert spike2py.export.export_figures
+    assert spike2py.test_install is spike2py.demo.test_install
+    assert spike2py.aload is spike2py.pipeline.aload
+    assert spike2py.catalogue.Catalogue
+    assert {"plot", "demo", "export", "catalogue", "aload", "Trial"} <= set(
+        dir(spike2py)
+    )
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from spike2py import memo, trial
+
+
+@pytest.fixture()
+def memo_directory(tmp_path):
+    memo.enable(tmp_path / "memo")
+    yield tmp_path / "memo"
+    memo.disable()
+
+
+def _emg(file):
+    return trial.Trial(trial.TrialInfo(file=file)).Emg1
+
+
+def _process(emg):
+    return emg.remove_mean().bandpass([20, 450], workers=2).rect().lowpass(6)
+
+
+def test_processing_steps_are_recorded(synthetic_trial_file):
+    emg = _process(_emg(synthetic_trial_file))
+    assert emg.recipe == (
+        ("remove_mean", {"first_n_samples": None}),
+        ("bandpass", {"cutoff": [20, 450], "order": 4}),
+        ("rect", {}),
+        ("lowpass", {"cutoff": 6, "order": 4}),
+    )
+    assert emg.window(1, 2).recipe == ()
+    emg.blank_artefacts([1.0, 5.0])
+    name, parameters = emg.recipe[-1]
+    assert name == "blank_artefacts"
+    assert parameters["event_times"]["shape"] == [2]
+
+
+def test_identical_recipe_reuses_saved_results(synthetic_trial_file, memo_directory):
+    expected = _process(_emg(synthetic_trial_file))
+    assert len(list(memo_directory.glob("*.json"))) == 4
+    emg = _process(_emg(synthetic_trial_file))
+    assert isinstance(emg.values, np.memmap)
+    assert emg.proc_filt_6_lowpass is emg.values
+    np.testing.assert_array_equal(emg.values, expected.values)
+    np.testing.assert_array_equal(emg.proc_rect, expected.proc_rect)
+    assert emg.recipe == expected.recipe
+    different = _emg(synthetic_trial_file).remove_mean().lowpass(7)
+    assert not isinstance(different.values, np.memmap)
+
+
+def test_saved_interpolation_restores_times(synthetic_trial_file, memo_directory):
+    expected = _emg(synthetic_trial_file).interp_new_fs(500)
+    emg = _emg(synthetic_trial_file).interp_new_fs(500)
+    assert isinstance(emg.times, np.memmap)
+    np.testing.assert_array_equal(emg.times, expected.times)
+    np.testing.assert_array_equal(emg.times_pre_interp, expected.times_pre_interp)
+
+
+def test_changed_data_is_not_reused(synthetic_trial_file, memo_directory):
+    _emg(synthetic_trial_file).rect()
+    windowed = _emg(synthetic_trial_file).window(1, 2).rect()
+    assert not isinstance(windowed.values, np.memmap)
+    assert len(windowed.values) == 1001
+
+
+def test_least_recently_used_results_evicted(synthetic_trial_file, tmp_path):
+    memo.enable(tmp_path / "memo", max_bytes=200_000)
+    try:
+        _emg(synthetic_trial_file).remove_mean().rect()
+        assert 0 < memo.size() <= 200_000
+        assert len(list((tmp_path / "memo").glob("*.json"))) == 1
+        memo.clear()
+        assert memo.size() == 0
+    finally:
+        memo.disable()
+
+
+def test_cache_scanned_only_above_size_limit(
+    synthetic_trial_file, tmp_path, monkeypatch
+):
+    memo.enable(tmp_path / "memo", max_bytes=500_000)
+    scans = list()
+    entries = memo._entries
+
+    def counting_entries():
+        scans.append(1)
+        return entries()
+
+    monkeypatch.setattr(memo, "_entries", counting_entries)
+    try:
+        _emg(synthetic_trial_file).remove_mean().rect()
+        assert scans == []
+        _emg(synthetic_trial_file).remove_mean().rect().lowpass(6).rect()
+        assert len(scans) == 1
+        assert memo.size() <= 500_000
+    finally:
+        memo.disable()
+
+
+def test_assigned_values_start_a_new_recipe(synthetic_trial_file, memo_directory):
+    _emg(synthetic_trial_file).remove_mean().remove_value(1.0)
+    emg = _emg(synthetic_trial_file).remove_mean()
+    emg.values = np.zeros_like(emg.values)
+    emg.remove_value(1.0)
+    np.testing.assert_array_equal(emg.values, -1)
+    assert emg.recipe == (("remove_value", {"value": 1.0}),)
+    assert emg.proc_remove_value_1_0 is emg.values
+
+
+def test_steps_after_batched_steps_are_saved(synthetic_trial_file, memo_directory):
+    expected = _emg(synthetic_trial_file).blank_artefacts([1.0, 5.0]).lowpass(6)
+    assert len(list(memo_directory.glob("*.json"))) == 1
+    emg = _emg(synthetic_trial_file).blank_artefacts([1.0, 5.0]).lowpass(6)
+    assert isinstance(emg.values, np.memmap)
+    np.testing.assert_array_equal(emg.values, expected.values)
+    assert emg.recipe == expected.recipe
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from spike2py import trial
+
+
+@pytest.fixture()
+def synthetic_trial(synthetic_trial_file):
+    return trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+
+
+def test_channel_memory_usage_counts_shared_buffers_once(synthetic_trial):
+    emg = synthetic_trial.Emg1
+    usage = emg.memory_usage()
+    assert usage.attributes == {
+        "values": emg.values.nbytes,
+        "raw_values": 0,
+        "times": emg.times.nbytes,
+    }
+    assert usage.aliases == {"raw_values": "values"}
+    emg.remove_mean().rect()
+    usage = emg.memory_usage()
+    assert usage.aliases == {"proc_rect": "values"}
+    assert usage.total == 3 * emg.values.nbytes + usage.attributes["times"]
+
+
+def test_trial_memory_usage_only_lists_loaded_channels(synthetic_trial):
+    assert synthetic_trial.memory_usage().total == 0
+    synthetic_trial.Emg1.window(0, 10)
+    windowed = synthetic_trial.window(0, 10)
+    usage = windowed.memory_usage()
+    assert usage.attributes["Emg1.values"] == synthetic_trial.Emg1.values.nbytes
+    assert set(name.split(".")[0] for name in usage.attributes) == {
+        "Emg1",
+        "Emg2",
+        "Noise",
+        "Stim",
+        "Keyboard",
+    }
+
+
+def test_trial_memory_usage_includes_pyramids(synthetic_trial):
+    synthetic_trial.Emg1.build_pyramid()
+    usage = synthetic_trial.memory_usage()
+    assert usage.attributes["Emg1._pyramid"] > 0
+    assert usage.aliases["Emg1._pyramid_values"] == "Emg1.values"
+
+
+def test_trial_compact_spills_intermediates(synthetic_trial, tmp_path):
+    emg = synthetic_trial.Emg1
+    emg.remove_mean().lowpass(20).rect()
+    lowpass = emg.proc_filt_20_lowpass.copy()
+    before = synthetic_trial.memory_usage()
+    intermediates = (
+        before.attributes["Emg1.proc_remove_mean"]
+        + before.attributes["Emg1.proc_filt_20_lowpass"]
+    )
+    usage = synthetic_trial.compact(
+        budget=before.total - intermediates, directory=tmp_path
+    )
+    assert usage.total == before.total - intermediates
+    assert set(usage.spilled) == {"Emg1.proc_remove_mean", "Emg1.proc_filt_20_lowpass"}
+    assert isinstance(emg.proc_filt_20_lowpass, np.memmap)
+    np.testing.assert_array_equal(emg.proc_filt_20_lowpass, lowpass)
+    assert not isinstance(emg.raw_values, np.memmap)
+    usage = synthetic_trial.compact(directory=tmp_path)
+    assert set(usage.attributes) == {"Emg1.values", "Emg1.times", "Emg1.proc_rect"}
+    assert "Emg1.raw_values" in usage.spilled
+    assert emg.proc_rect is emg.values
+
+
+def test_trial_compact_drop(synthetic_trial, tmp_path):
+    emg = synthetic_trial.Emg1
+    emg.interp_new_fs(500)
+    synthetic_trial.compact(drop=True, directory=tmp_path / "spill")
+    assert not hasattr(emg, "times_pre_interp")
+    assert not hasattr(emg, "raw_values")
+    assert set(emg.memory_usage().attributes) == {
+        "values",
+        "times",
+        "proc_interp_new_fs",
+    }
+    assert not (tmp_path / "spill").exists()
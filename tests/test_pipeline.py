@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+import spike2py
+from spike2py import aggregate, pipeline, read, trial
+
+
+def test_prefetch_yields_loaded_trials_in_order(synthetic_trial_file, tmp_path):
+    saved = trial.Trial(trial.TrialInfo(file=synthetic_trial_file, name="saved"))
+    saved.save()
+    sources = [synthetic_trial_file, saved.info.path_save_trial / "saved.pkl"]
+    trials = list(pipeline.prefetch(sources, depth=2, workers=2))
+    assert [spike2py_trial.info.name for spike2py_trial in trials] == [
+        synthetic_trial_file.stem,
+        "saved",
+    ]
+    assert "Emg1" in vars(trials[0])
+
+
+def test_prefetch_reads_at_most_depth_ahead(monkeypatch):
+    started = list()
+
+    def read(source, load_channels):
+        started.append(source)
+        return source
+
+    monkeypatch.setattr(pipeline, "_read", read)
+    trials = pipeline.prefetch(range(10), depth=3)
+    assert next(trials) == 0
+    assert next(trials) == 1
+    assert max(started) <= 1 + 3
+    trials.close()
+    assert len(started) <= 5
+
+
+def test_prefetch_raises_errors_in_order(tmp_path, synthetic_trial_file):
+    junk = tmp_path / "junk.mat"
+    junk.write_bytes(b"not a mat file")
+    trials = pipeline.prefetch([synthetic_trial_file, junk])
+    assert next(trials).info.name == synthetic_trial_file.stem
+    with pytest.raises(read.WrongFileType):
+        next(trials)
+    with pytest.raises(ValueError):
+        next(pipeline.prefetch([synthetic_trial_file], depth=-1))
+
+
+def test_prefetch_depth_zero_keeps_channels_lazy(synthetic_trial_file):
+    (spike2py_trial,) = pipeline.prefetch(
+        [synthetic_trial_file], depth=0, load_channels=False
+    )
+    assert "Emg1" not in vars(spike2py_trial)
+
+
+def _mean_emg(spike2py_trial):
+    return {"emg": spike2py_trial.Emg1.values[:, None]}
+
+
+def test_reduce_trials_with_prefetch(synthetic_trial_file):
+    accumulators = {"emg": aggregate.Moments()}
+    sources = [synthetic_trial_file] * 3
+    expected = aggregate.reduce_trials(sources, _mean_emg, accumulators)
+    result = aggregate.reduce_trials(sources, _mean_emg, accumulators, prefetch=2)
+    assert result["emg"].count == expected["emg"].count
+    assert result["emg"].mean == pytest.approx(expected["emg"].mean)
+
+
+def test_aload_reads_all_channels(synthetic_trial_file):
+    spike2py_trial = asyncio.run(spike2py.aload(synthetic_trial_file))
+    assert {"Emg1", "Emg2", "Noise", "Stim", "Keyboard"} <= set(vars(spike2py_trial))
+
+
+def test_achannels_yields_requested_channels(synthetic_trial_file):
+    async def read_channels():
+        spike2py_trial = await pipeline.aload(synthetic_trial_file, load_channels=False)
+        return [
+            (name, channel.info.name)
+            async for name, channel in pipeline.achannels(
+                spike2py_trial, ["Stim", "Emg2"], limit=asyncio.Semaphore(1)
+            )
+        ]
+
+    assert asyncio.run(read_channels()) == [("Stim", "Stim"), ("Emg2", "EMG2")]
+
+
+def test_aload_cancelled_between_channels(synthetic_trial_file, monkeypatch):
+    async def cancel_after_first_channel():
+        spike2py_trial = await pipeline.aload(synthetic_trial_file, load_channels=False)
+        monkeypatch.setattr(
+            pipeline.trial, "from_source", lambda source: spike2py_trial
+        )
+        task = asyncio.ensure_future(pipeline.aload(synthetic_trial_file))
+        while "Emg1" not in vars(spike2py_trial):
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return spike2py_trial
+
+    spike2py_trial = asyncio.run(cancel_after_first_channel())
+    assert "Keyboard" not in vars(spike2py_trial)
+
+
+def test_aprefetch_yields_trials_in_order(synthetic_trial_file, tmp_path):
+    other = tmp_path / "other.mat"
+    other.write_bytes(synthetic_trial_file.read_bytes())
+
+    async def names():
+        return [
+            spike2py_trial.info.name
+            async for spike2py_trial in pipeline.aprefetch(
+                [synthetic_trial_file, other, synthetic_trial_file], depth=2
+            )
+        ]
+
+    assert asyncio.run(names()) == [
+        synthetic_trial_file.stem,
+        "other",
+        synthetic_trial_file.stem,
+    ]
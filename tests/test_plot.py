@@ -0,0 +1,166 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+
+from spike2py import channels, plot, trial
+
+
+def _channel_data(tmp_path, times, **kwargs):
+    return {
+        "times": times,
+        "path_save_figures": tmp_path,
+        "trial_name": "strong_you_are",
+        "subject_id": "Yoda",
+        **kwargs,
+    }
+
+
+def test_plot_ticks_line_single_artist(tmp_path):
+    times = np.linspace(0, 100, 50_000)
+    event = channels.Event("stim", _channel_data(tmp_path, times))
+    fig, ax = plt.subplots()
+    plot._TicksLine(event).plot(ax)
+    ticks, line = ax.lines
+    tick_times = ticks.get_xdata()[0::3]
+    assert len(tick_times) <= plot._pixel_columns(ax)
+    assert tick_times[0] == 0
+    assert np.all(np.isin(tick_times, times))
+    assert np.all(np.isnan(ticks.get_ydata()[2::3]))
+    assert list(line.get_xdata()) == [0, 100]
+    plt.close(fig)
+
+
+def test_plot_ticks_line_keeps_sparse_ticks(tmp_path):
+    times = np.array([1.0, 2.5, 7.25])
+    event = channels.Event("stim", _channel_data(tmp_path, times))
+    fig, ax = plt.subplots()
+    plot._TicksLine(event).plot(ax)
+    assert list(ax.lines[0].get_xdata()[0::3]) == list(times)
+    plt.close(fig)
+
+
+def test_plot_codes_thinned_to_fit_axis(tmp_path):
+    times = np.linspace(0, 100, 10_000)
+    keyboard = channels.Keyboard(
+        "keyboard", _channel_data(tmp_path, times, codes=["a"] * len(times))
+    )
+    fig, ax = plt.subplots()
+    plot._TicksLine(keyboard).plot(ax)
+    assert 0 < len(ax.texts) <= plot._max_labels(ax)
+    plt.close(fig)
+
+
+def test_plot_thin_labels_keeps_first_in_each_slice():
+    times = np.array([0, 0.1, 0.2, 5, 5.1, 9.9, 10])
+    assert list(plot._thin_labels(times, max_labels=2)) == [0, 3, 6]
+    assert list(plot._thin_labels(np.array([3.0]), max_labels=2)) == [0]
+
+
+def test_plot_action_potentials_single_collection(tmp_path):
+    action_potentials = np.random.default_rng(0).normal(size=(2000, 30))
+    wavemark = channels.Wavemark(
+        "MU",
+        _channel_data(
+            tmp_path,
+            np.cumsum(np.full(2000, 0.1)),
+            units="V",
+            sampling_frequency=10000,
+            action_potentials=action_potentials,
+        ),
+    )
+    fig, ax = plt.subplots(1, 2)
+    plot._TicksLine(wavemark).plot(ax)
+    (collection,) = ax[1].collections
+    assert isinstance(collection, LineCollection)
+    assert len(collection.get_segments()) == plot.MAX_ACTION_POTENTIALS
+    plt.close(fig)
+
+
+def test_plot_channel_wavemark_saved(tmp_path):
+    action_potentials = np.random.default_rng(0).normal(size=(2000, 30))
+    wavemark = channels.Wavemark(
+        "MU",
+        _channel_data(
+            tmp_path,
+            np.cumsum(np.full(2000, 0.1)),
+            units="V",
+            sampling_frequency=10000,
+            action_potentials=action_potentials,
+        ),
+    )
+    wavemark.plot(save=True)
+    assert (tmp_path / "Yoda_strong_you_are_MU.pdf").exists()
+
+
+def test_plot_decimate_min_max_preserves_extremes():
+    random_generator = np.random.default_rng(0)
+    values = random_generator.normal(size=100_003)
+    times = np.arange(len(values)) / 1000
+    dec_times, dec_values = plot._decimate_min_max(times, values, n_columns=1000)
+    assert len(dec_values) <= 2 * 1000
+    assert np.all(np.diff(dec_times) > 0)
+    bin_size = int(np.ceil(len(values) / 1000))
+    for first_bin_sample in [0, 500 * bin_size, 990 * bin_size]:
+        bin_values = values[first_bin_sample:][:bin_size]
+        bin_times = times[first_bin_sample:][:bin_size]
+        in_bin = (dec_times >= bin_times[0]) & (dec_times <= bin_times[-1])
+        assert dec_values[in_bin].max() == bin_values.max()
+        assert dec_values[in_bin].min() == bin_values.min()
+
+
+def test_plot_decimate_min_max_short_signal_unchanged():
+    times, values = np.arange(10.0), np.arange(10.0) ** 2
+    dec_times, dec_values = plot._decimate_min_max(times, values, n_columns=1000)
+    assert list(dec_values) == list(values)
+
+
+def test_plot_channel_waveform_decimated(tmp_path):
+    n_samples = 1_000_000
+    waveform = channels.Waveform(
+        "EMG",
+        _channel_data(
+            tmp_path,
+            np.arange(n_samples) / 10_000,
+            values=np.sin(np.arange(n_samples) / 50),
+            units="V",
+            sampling_frequency=10_000,
+        ),
+    )
+    fig, ax = plt.subplots()
+    plot._plot_waveform(waveform, ax)
+    (line,) = ax.lines
+    assert len(line.get_ydata()) <= 2 * ax.get_window_extent().width
+    assert max(line.get_ydata()) == max(waveform.values)
+    assert ax.get_xlim() == (0, waveform.times[-1])
+    plt.close(fig)
+
+
+def test_plot_trial_interactive_zoom_redecimates(synthetic_trial_file, monkeypatch):
+    monkeypatch.setattr(plot, "ZOOM_DEBOUNCE_MS", 0)
+    trial1 = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    plot.plot_trial(trial1, save=False, interactive=True)
+    line = plt.gcf().axes[-1].lines[0]
+    assert len(line.get_xdata()) < len(trial1.Emg1.times)
+    plt.gcf().axes[-1].set_xlim(5, 6)
+    zoomed = line.get_xdata()
+    in_view = (trial1.Emg1.times >= 5) & (trial1.Emg1.times <= 6)
+    assert np.all(np.isin(trial1.Emg1.times[in_view], zoomed))
+    assert len(zoomed) < len(trial1.Emg1.times) // 4
+    plt.close("all")
+
+
+def test_plot_zoom_tiles_from_pyramid_and_cached(synthetic_trial_file, monkeypatch):
+    monkeypatch.setattr(plot, "ZOOM_DEBOUNCE_MS", 0)
+    trial1 = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    trial1.Emg1.build_pyramid()
+    fig, ax = plt.subplots()
+    plot._plot_waveform(trial1.Emg1, ax)
+    updater = plot._ZoomUpdater(trial1.Emg1, ax.lines[0], ax)
+    ax.set_xlim(0, 20)
+    assert ax.lines[0].get_ydata().max() == trial1.Emg1.values.max()
+    assert ax.lines[0].get_ydata().min() == trial1.Emg1.values.min()
+    tiles = dict(updater.tiles)
+    ax.set_xlim(3, 4)
+    ax.set_xlim(0, 20)
+    assert all(updater.tiles[key] is tile for key, tile in tiles.items())
+    plt.close(fig)
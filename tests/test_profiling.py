@@ -0,0 +1,97 @@
+import timeit
+
+import numpy as np
+import pytest
+
+from spike2py import profiling, read, trial
+
+
+@pytest.fixture()
+def synthetic_trial(synthetic_trial_file):
+    return trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+
+
+@pytest.fixture(autouse=True)
+def profiling_disabled():
+    yield
+    profiling.disable()
+
+
+def test_profiling_disabled_records_nothing(synthetic_trial):
+    synthetic_trial.Emg1.lowpass(20)
+    assert len(synthetic_trial.profile) == 0
+
+
+def test_profiling_trial_profile_records_stages(synthetic_trial_file):
+    profiling.enable()
+    trial1 = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    trial1.Emg1.lowpass(20)
+    stages = [record.stage for record in trial1.profile]
+    assert stages == [
+        "read.index",
+        "trial.open",
+        "read.parse_waveform",
+        "read.read_channel",
+        "trial.create_channel",
+        "sig_proc.lowpass",
+    ]
+    summary = trial1.profile.summary()
+    assert summary["trial.create_channel"].seconds >= (
+        summary["read.read_channel"].seconds
+    )
+    lowpass = trial1.profile.records[-1]
+    assert lowpass.label == "EMG1"
+    assert lowpass.allocated_bytes is None
+    assert lowpass.array_bytes >= trial1.Emg1.values.nbytes
+
+
+def test_profiling_context_collects_and_restores(synthetic_trial):
+    with profiling.profile(memory=True) as prof:
+        assert profiling.is_enabled()
+        synthetic_trial.Emg1.rect()
+    assert not profiling.is_enabled()
+    assert [record.stage for record in prof][-1] == "sig_proc.rect"
+    rect = prof.records[-1]
+    assert rect.allocated_bytes >= synthetic_trial.Emg1.values.nbytes
+    create = prof.summary()["trial.create_channel"]
+    assert create.allocated_bytes >= prof.summary()["read.read_channel"].allocated_bytes
+    assert "sig_proc.rect" in repr(prof)
+
+
+def test_profiling_callbacks_receive_records(synthetic_trial_file):
+    received = list()
+    profiling.add_callback(received.append)
+    try:
+        with profiling.profile():
+            read.read(synthetic_trial_file)
+    finally:
+        profiling.remove_callback(received.append)
+    stages = [record.stage for record in received]
+    assert stages.count("read.parse_waveform") == 3
+    assert stages[-2:] == ["read.parse_keyboard", "read.read"]
+    assert received[-1].array_bytes == 0
+    assert all(isinstance(record, profiling.StageRecord) for record in received)
+
+
+def test_profiling_nested_contexts_keep_outer_profile():
+    @profiling.stage("test.stage")
+    def stage():
+        return np.zeros(10)
+
+    with profiling.profile() as outer:
+        with profiling.profile(memory=True) as inner:
+            stage()
+        stage()
+    assert profiling.is_enabled() is False
+    assert len(inner) == 1
+    assert [record.array_bytes for record in outer] == [80, 80]
+
+
+def test_profiling_disabled_overhead_is_small():
+    def func(value):
+        return value
+
+    wrapped = profiling.stage("test.overhead")(func)
+    plain = min(timeit.repeat(lambda: func(1), number=20000, repeat=5))
+    instrumented = min(timeit.repeat(lambda: wrapped(1), number=20000, repeat=5))
+    assert (instrumented - plain) / 20000 < 2e-6
@@ -0,0 +1,113 @@
+import pytest
+from pytest import approx
+import numpy as np
+
+from spike2py import channels, pyramid, trial
+
+
+def _waveform(values, sampling_frequency=1000):
+    return channels.Waveform(
+        "torque",
+        {
+            "times": 2 + np.arange(len(values)) / sampling_frequency,
+            "units": "Nm",
+            "values": np.asarray(values, dtype=float),
+            "sampling_frequency": sampling_frequency,
+            "path_save_figures": None,
+            "trial_name": "strong_you_are",
+            "subject_id": "Yoda",
+        },
+    )
+
+
+def _expected_stats(values, window_samples):
+    n_windows = -(-len(values) // window_samples)
+    windows = np.array_split(values, np.arange(1, n_windows) * window_samples)
+    return (
+        [window.min() for window in windows],
+        [window.max() for window in windows],
+        [window.mean() for window in windows],
+        [np.sqrt(np.mean(window**2)) for window in windows],
+    )
+
+
+@pytest.mark.parametrize("n_samples", [1, 15, 16, 1000, 12345])
+@pytest.mark.parametrize("window", [0.001, 0.016, 0.1, 0.333, 1, 20])
+def test_pyramid_windowed_stats_match_full_scan(n_samples, window):
+    values = np.random.default_rng(0).normal(size=n_samples)
+    summary = pyramid.SummaryPyramid(values, 2, 1000)
+    stats = summary.windowed_stats(window, values)
+    window_samples = int(round(window * 1000))
+    expected_min, expected_max, expected_mean, expected_rms = _expected_stats(
+        values, window_samples
+    )
+    assert stats.times == approx(2 + np.arange(0, n_samples, window_samples) / 1000)
+    assert stats.min == approx(expected_min)
+    assert stats.max == approx(expected_max)
+    assert stats.mean == approx(expected_mean)
+    assert stats.rms == approx(expected_rms)
+
+
+def test_pyramid_aligned_windows_need_no_values():
+    values = np.random.default_rng(1).normal(size=4096)
+    summary = pyramid.SummaryPyramid(values, 0, 1024)
+    stats = summary.windowed_stats(0.125)
+    assert stats.max == approx(_expected_stats(values, 128)[1])
+    with pytest.raises(ValueError):
+        summary.windowed_stats(0.1)
+    with pytest.raises(ValueError):
+        pyramid.SummaryPyramid(values, 0, 1024, base_block=10)
+
+
+def test_pyramid_envelope_keeps_extremes():
+    values = np.zeros(10_000)
+    values[1234] = 5
+    values[8765] = -3
+    summary = pyramid.SummaryPyramid(values, 0, 1000)
+    times, envelope = summary.envelope(100)
+    assert 200 <= len(envelope) <= 400
+    assert envelope.max() == 5
+    assert envelope.min() == -3
+    assert times[np.argmax(envelope)] == approx(1.234, abs=0.128)
+
+
+def test_pyramid_waveform_invalidated_by_processing():
+    waveform = _waveform(np.random.default_rng(2).normal(size=5000))
+    assert waveform.summary_pyramid is None
+    waveform.build_pyramid()
+    assert isinstance(waveform.summary_pyramid, pyramid.SummaryPyramid)
+    assert waveform.windowed_stats(1).mean == approx(
+        _expected_stats(waveform.values, 1000)[2]
+    )
+    waveform.rect()
+    assert waveform.summary_pyramid is None
+    assert waveform.windowed_stats(1).mean == approx(
+        _expected_stats(waveform.values, 1000)[2]
+    )
+    assert waveform.window(2, 3).summary_pyramid is None
+
+
+def test_pyramid_dropped_by_window():
+    waveform = _waveform(np.random.default_rng(3).normal(size=5000)).build_pyramid()
+    windowed = waveform.window(2.5, 4)
+    assert "_pyramid_values" not in vars(windowed)
+    assert windowed.summary_pyramid is None
+    assert waveform.summary_pyramid is not None
+    assert windowed.windowed_stats(0.5).mean == approx(
+        _expected_stats(windowed.values, 500)[2]
+    )
+
+
+def test_pyramid_built_on_load_and_saved(synthetic_trial_file):
+    trial1 = trial.Trial(
+        trial.TrialInfo(file=synthetic_trial_file, summary_pyramids=True)
+    )
+    assert trial1.Emg1.summary_pyramid is not None
+    trial1.Emg2.lowpass(20)
+    assert trial1.Emg2.summary_pyramid is None
+    trial1.save()
+    loaded = trial.load(trial1.info.path_save_trial / (trial1.info.name + ".pkl"))
+    assert loaded.Emg2.summary_pyramid is not None
+    stats = loaded.Emg1.windowed_stats(1)
+    assert len(stats.times) == 20
+    assert stats.max == approx(_expected_stats(loaded.Emg1.values, 1000)[1])
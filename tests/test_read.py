@@ -2,6 +2,7 @@ import pytest
 from pytest import approx
 
 import numpy as np
+import scipy.io as sio
 
 from spike2py import read
 
@@ -118,3 +119,45 @@ def test_parse_mat_wavemark_sampling_frequency(data_setup):
 def test_parse_mat_wavemark_action_potentials(data_setup):
     actual = read._parse_mat_wavemark(data_setup["mat_wavemark"])["action_potentials"]
     assert actual.shape == (62, 256)
+
+
+def test_read_index_and_read_channel(synthetic_trial_file):
+    locations = read.index(synthetic_trial_file)
+    assert list(locations) == ["EMG1", "EMG2", "Noise", "Stim", "Keyboard"]
+    assert [location.ch_type for location in locations.values()] == [
+        "waveform",
+        "waveform",
+        "waveform",
+        "event",
+        "keyboard",
+    ]
+    data = read.read(synthetic_trial_file)
+    emg = read.read_channel(synthetic_trial_file, locations["EMG2"])
+    assert emg["values"] == approx(data["EMG2"]["values"])
+    assert emg["sampling_frequency"] == 1000
+    assert read.read_channel(synthetic_trial_file, locations["Keyboard"])["codes"] == [
+        "a",
+        "b",
+    ]
+    assert list(read.index(synthetic_trial_file, ["Stim", "EMG1"])) == ["EMG1", "Stim"]
+
+
+def test_reads_whole_variables_if_scipy_readers_change(
+    synthetic_trial_file, monkeypatch, caplog
+):
+    expected = read.headers(synthetic_trial_file)
+    monkeypatch.setattr(read, "MatFile5Reader", None)
+    locations = read.index(synthetic_trial_file)
+    assert locations["EMG2"].offset is None
+    assert read.headers(synthetic_trial_file) == expected
+    emg = read.read_channel(synthetic_trial_file, locations["EMG2"])
+    assert emg["values"] == approx(read.read(synthetic_trial_file)["EMG2"]["values"])
+    assert "scipy.io.loadmat instead" in caplog.text
+
+
+def test_unknown_variables_are_logged(synthetic_trial_file, caplog):
+    data = sio.loadmat(synthetic_trial_file)
+    data["Settings"] = {"gain": 2.0, "notes": "x"}
+    sio.savemat(synthetic_trial_file, data)
+    assert "Settings" not in read.index(synthetic_trial_file)
+    assert "Skipping variable Settings of synthetic.mat" in caplog.text
@@ -0,0 +1,149 @@
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+from spike2py import recipe, trial
+
+RECIPE = {
+    "channels": [
+        {
+            "select": "emg*",
+            "steps": [
+                "remove_mean",
+                {
+                    "blank_artefacts": {
+                        "event_times": "Stim",
+                        "pre": 0.001,
+                        "post": 0.004,
+                    }
+                },
+                {"bandpass": {"cutoff": [20, 450]}},
+                "rect",
+            ],
+        }
+    ],
+    "outputs": {
+        "save": True,
+        "epochs": {"select": "Emg1", "events": "Stim", "pre": 0.01, "post": 0.05},
+    },
+}
+
+
+@pytest.fixture()
+def study(tmp_path, synthetic_trial_file):
+    root = tmp_path / "study"
+    for subject in ("sub01", "sub02"):
+        (root / subject).mkdir(parents=True)
+        shutil.copy(synthetic_trial_file, root / subject / "trial1.mat")
+    return root
+
+
+def test_parse_validates_recipe():
+    parsed = recipe.parse(RECIPE)
+    assert parsed.channels[0].steps[1] == (
+        "blank_artefacts",
+        {"event_times": "Stim", "pre": 0.001, "post": 0.004},
+    )
+    assert parsed.outputs.epochs == recipe.EpochOutput("Emg1", "Stim", 0.01, 0.05)
+    assert parsed.digest == recipe.parse(json.loads(json.dumps(RECIPE))).digest
+    with pytest.raises(ValueError, match="Unknown recipe step 'smooth'"):
+        recipe.parse({"channels": [{"select": "*", "steps": ["smooth"]}]})
+    with pytest.raises(ValueError, match="Unknown channel selection keys: channel"):
+        recipe.parse({"channels": [{"channel": "Emg1"}]})
+    with pytest.raises(ValueError, match="'png' or 'pdf'"):
+        recipe.parse({"outputs": {"figures": "svg"}})
+
+
+def test_apply_matches_method_calls(synthetic_trial_file):
+    processed = recipe.apply(
+        recipe.parse(RECIPE), trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    )
+    expected = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    expected.Emg2.remove_mean().blank_artefacts(expected.Stim, 0.001, 0.004)
+    expected.Emg2.bandpass([20, 450]).rect()
+    np.testing.assert_array_equal(processed.Emg2.values, expected.Emg2.values)
+    assert processed.Emg2.recipe == expected.Emg2.recipe
+    assert processed.Noise.recipe == ()
+
+
+def test_apply_removes_artefacts_of_a_selection_at_once(
+    synthetic_trial_file, monkeypatch
+):
+    calls = list()
+    blank_artefacts = recipe.sig_proc.blank_artefacts
+
+    def counting_blank_artefacts(waveforms, *args, **kwargs):
+        calls.append([waveform.info.name for waveform in waveforms])
+        return blank_artefacts(waveforms, *args, **kwargs)
+
+    monkeypatch.setattr(recipe.sig_proc, "blank_artefacts", counting_blank_artefacts)
+    recipe.apply(
+        recipe.parse(RECIPE), trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    )
+    assert calls == [["EMG1", "EMG2"]]
+
+
+def test_run_writes_outputs_and_skips_up_to_date_trials(study, tmp_path):
+    output = tmp_path / "output"
+    report = recipe.run(recipe.parse(RECIPE), study, output_directory=output)
+    assert [report.status for report in report.trials] == ["done", "done"]
+    epochs = np.load(output / "sub02" / "data" / "trial1_epochs.npz")
+    assert epochs["Emg1"].shape == (4, 61)
+    assert (output / "sub01" / "data" / "trial1.pkl").exists()
+
+    report = recipe.run(recipe.parse(RECIPE), study, output_directory=output)
+    assert report.count("skipped") == 2
+    (output / "sub01" / "data" / "trial1.pkl").unlink()
+    changed = dict(RECIPE, outputs={"save": True})
+    report = recipe.run(
+        recipe.parse(changed), study, output_directory=output, workers=2
+    )
+    assert [report.status for report in report.trials] == ["done", "done"]
+
+
+def test_run_reports_failed_trials(study, tmp_path):
+    (study / "sub01" / "trial1.mat").write_text("not a MATLAB file")
+    file = tmp_path / "recipe.json"
+    file.write_text(json.dumps(RECIPE))
+    reports = list()
+    report = recipe.run(
+        file, study, output_directory=tmp_path / "out", progress=reports.append
+    )
+    assert [report.status for report in report.trials] == ["failed", "done"]
+    assert "WrongFileType" in report.trials[0].error
+    assert len(reports) == 2
+    assert "1 done, 0 skipped, 1 failed" in repr(report)
+
+
+def test_read_yaml_recipe(tmp_path):
+    pytest.importorskip("yaml")
+    file = tmp_path / "recipe.yaml"
+    file.write_text(
+        "channels:\n"
+        "  - select: Emg*\n"
+        "    steps:\n"
+        "      - remove_mean\n"
+        "      - lowpass: {cutoff: 6}\n"
+        "outputs:\n"
+        "  figures: pdf\n"
+    )
+    parsed = recipe.read_recipe(file)
+    assert parsed.channels[0].steps == [("remove_mean", {}), ("lowpass", {"cutoff": 6})]
+    assert parsed.outputs.figures == "pdf"
+
+
+def test_default_selection_and_figure_outputs(study, tmp_path):
+    spike2py_trial = trial.Trial(trial.TrialInfo(file=study / "sub01" / "trial1.mat"))
+    everything = recipe.parse({"channels": [{"steps": ["remove_mean"]}]})
+    processed = recipe.apply(everything, spike2py_trial)
+    assert processed.Emg1.recipe == (("remove_mean", {"first_n_samples": None}),)
+
+    figures = recipe.parse({"outputs": {"figures": "png"}})
+    files, output = [study / "sub01" / "trial1.mat"], tmp_path / "output"
+    assert recipe.run(figures, files, output_directory=output).count("done") == 1
+    figure = next((output / "sub" / "figures").glob("*EMG1.png"))
+    figure.unlink()
+    report = recipe.run(figures, files, output_directory=output)
+    assert report.count("done") == 1 and figure.exists()
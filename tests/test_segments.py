@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from spike2py import segments, trial
+
+
+@pytest.fixture()
+def segmented():
+    parts = [np.arange(5.0), np.arange(5.0, 9.0), np.arange(9.0, 15.0)]
+    return segments.SegmentedArray(parts), np.concatenate(parts)
+
+
+def test_indexing_resolves_to_segments(segmented):
+    array, expected = segmented
+    assert len(array) == 15 and array.shape == (15,) and array.nbytes == expected.nbytes
+    assert array[5] == 5 and array[-1] == 14
+    for index in [slice(2, 7), slice(3, 13), slice(-4, None), slice(None, None, 3)]:
+        np.testing.assert_array_equal(np.asarray(array[index]), expected[index])
+    assert array[6:8].base is array.segments[1]
+    assert array[3:13].segments[1].base is array.segments[1]
+    np.testing.assert_array_equal(array[[1, 7, -1]], expected[[1, 7, -1]])
+    np.testing.assert_array_equal(array[expected > 10], expected[expected > 10])
+    assert np.searchsorted(array, [0, 5, 8.5, 20]).tolist() == [0, 5, 9, 15]
+    assert np.searchsorted(array, 5, side="right") == 6
+    with pytest.raises(IndexError):
+        array[15]
+
+
+def test_operations_run_segment_by_segment(segmented):
+    array, expected = segmented
+    result = abs(array - np.mean(array)) * 2
+    assert isinstance(result, segments.SegmentedArray)
+    np.testing.assert_array_equal(
+        np.asarray(result), abs(expected - expected.mean()) * 2
+    )
+    assert (np.max(array), np.min(array), array.sum()) == (14, 0, expected.sum())
+    replaced = array.replace([6, 7], 0)
+    assert replaced.segments[0] is array.segments[0]
+    assert replaced[6] == 0 and array[6] == 6
+
+
+def test_offsets_are_added_when_read():
+    parts = [np.arange(5.0), np.arange(4.0), np.arange(6.0)]
+    array = segments.SegmentedArray(parts, offsets=[0, 5, 9])
+    expected = np.arange(15.0)
+    np.testing.assert_array_equal(np.asarray(array), expected)
+    assert array[7] == 7 and array[[1, 7, -1]].tolist() == [1, 7, 14]
+    np.testing.assert_array_equal(np.asarray(array[3:13]), expected[3:13])
+    np.testing.assert_array_equal(np.asarray(array[6:8]), [6, 7])
+    assert np.searchsorted(array, [0, 5, 8.5, 20]).tolist() == [0, 5, 9, 15]
+    assert (array.min(), array.max(), array.sum()) == (0, 14, expected.sum())
+    np.testing.assert_array_equal(np.asarray(array * 2), expected * 2)
+    assert array.replace([6], 0)[6] == 0
+
+
+def test_merge_presents_continuous_channels(synthetic_trial_file, split_trial_files):
+    expected = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    parts = [trial.Trial(trial.TrialInfo(file=file)) for file in split_trial_files]
+    merged = trial.merge(parts, name="session")
+    assert merged.info.name == "session"
+    assert merged.Emg1.values.segments[1] is parts[1].Emg1.values
+    assert merged.Emg1.times.segments[1] is parts[1].Emg1.times
+    np.testing.assert_allclose(np.asarray(merged.Emg1.times), expected.Emg1.times)
+    np.testing.assert_array_equal(np.asarray(merged.Emg1.values), expected.Emg1.values)
+    np.testing.assert_allclose(merged.Stim.times, expected.Stim.times)
+    assert merged.Keyboard.codes == ["a", "b"]
+    windowed = merged.window(5.5, 6.5)
+    assert isinstance(windowed.Emg1.values, segments.SegmentedArray)
+    assert len(windowed.Emg1.values) == 1001
+    with pytest.raises(ValueError, match="starts before the end"):
+        trial.merge(split_trial_files, offsets=[0, 3, 20])
+
+
+def test_merged_processing_matches_concatenated(
+    synthetic_trial_file, split_trial_files
+):
+    expected = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    merged = trial.merge(split_trial_files)
+    for spike2py_trial in (expected, merged):
+        spike2py_trial.Emg1.remove_mean().blank_artefacts(spike2py_trial.Stim)
+        spike2py_trial.Emg1.bandpass([20, 450]).rect().lowpass(6)
+        spike2py_trial.Emg2.remove_line_noise()
+    for name in ("Emg1", "Emg2"):
+        values = getattr(merged, name).values
+        assert isinstance(values, segments.SegmentedArray)
+        np.testing.assert_allclose(
+            np.asarray(values), getattr(expected, name).values, rtol=0, atol=1e-8
+        )
@@ -0,0 +1,90 @@
+import pickle
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from spike2py import shared, trial
+
+
+def _processed_trial(file):
+    spike2py_trial = trial.Trial(trial.TrialInfo(file=file))
+    spike2py_trial.Emg1.remove_mean().lowpass(20)
+    return spike2py_trial
+
+
+def _share_processed_trial(file):
+    return _processed_trial(file).share()
+
+
+def test_trial_arrays_cross_processes_in_shared_memory(synthetic_trial_file):
+    expected = _processed_trial(synthetic_trial_file)
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        handle = executor.submit(_share_processed_trial, synthetic_trial_file).result()
+    assert len(handle._payload) < handle.size / 10
+    loaded = handle.load()
+    emg = loaded.Emg1
+    np.testing.assert_array_equal(emg.proc_filt_20_lowpass, expected.Emg1.values)
+    np.testing.assert_array_equal(loaded.Stim.times, expected.Stim.times)
+    assert emg.proc_filt_20_lowpass is emg.values
+    assert [name for name, _ in loaded.channels] == [
+        name for name, _ in expected.channels
+    ]
+    with pytest.raises(BufferError):
+        handle.close()
+    del loaded, emg
+    handle.close()
+    handle.unlink()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(handle.name)
+
+
+def test_channel_share_keeps_small_arrays_in_descriptor(synthetic_trial_file):
+    spike2py_trial = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    handle = spike2py_trial.Stim.share()
+    assert handle.size == 0
+    stim = handle.load()
+    np.testing.assert_array_equal(stim.times, spike2py_trial.Stim.times)
+    handle.unlink()
+    handle = spike2py_trial.Emg1.share(min_bytes=0)
+    emg = handle.load()
+    np.testing.assert_array_equal(emg.values, spike2py_trial.Emg1.values)
+    del emg
+    handle.close()
+    handle.unlink()
+
+
+CONSUMER = """
+import pickle, sys
+handle = pickle.loads(open(sys.argv[1], "rb").read())
+emg = handle.load().Emg1
+assert len(emg.values) == 20000
+del emg
+handle.close()
+if sys.argv[2] == "unlink":
+    handle.unlink()
+"""
+
+
+def _run_consumer(handle_file, action):
+    return subprocess.run(
+        [sys.executable, "-c", CONSUMER, str(handle_file), action],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_consumer_process_does_not_own_block(synthetic_trial_file, tmp_path):
+    handle = _processed_trial(synthetic_trial_file).share()
+    handle_file = tmp_path / "handle.pkl"
+    handle_file.write_bytes(pickle.dumps(handle))
+    assert _run_consumer(handle_file, "close").stderr == ""
+    # The block outlives the consumer, which can then unlink it
+    shared._attach(handle.name).close()
+    assert _run_consumer(handle_file, "unlink").stderr == ""
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(handle.name)
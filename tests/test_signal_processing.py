@@ -1,9 +1,9 @@
 import pytest
 from pytest import approx
 import numpy as np
-from scipy.signal import welch
+from scipy.signal import butter, filtfilt, welch
 
-from spike2py import sig_proc
+from spike2py import channels, sig_proc
 
 
 def test_signal_processing_methods_present(mixin_methods):
@@ -256,3 +256,101 @@ def test_signal_processing_linear_detrend(mixin):
     mixin.linear_detrend()
     assert "proc_linear_detrend" in mixin.__dir__()
     assert np.mean(mixin.values) == approx(0.0)
+
+
+def test_signal_processing_blank_artefacts_interp(mixin):
+    original = mixin.values.copy()
+    mixin.blank_artefacts(np.array([20.0, 60.0]), pre=0.1, post=0.5)
+    assert "proc_blank_artefacts" in mixin.__dir__()
+    blanked = ((mixin.times >= 19.9) & (mixin.times <= 20.5)) | (
+        (mixin.times >= 59.9) & (mixin.times <= 60.5)
+    )
+    assert np.all(mixin.values[~blanked] == original[~blanked])
+    first_artefact = np.flatnonzero(blanked & (mixin.times < 40))
+    neighbours = [first_artefact[0] - 1, first_artefact[-1] + 1]
+    expected = np.interp(
+        mixin.times[first_artefact], mixin.times[neighbours], original[neighbours]
+    )
+    assert mixin.values[first_artefact] == approx(expected)
+
+
+def test_signal_processing_blank_artefacts_zero(mixin):
+    mixin.blank_artefacts(np.array([50.0]), pre=0, post=1, method="zero")
+    blanked = (mixin.times >= 50) & (mixin.times <= 51)
+    assert np.all(mixin.values[blanked] == 0)
+    assert np.all(mixin.values[~blanked] != 0)
+
+
+def test_signal_processing_blank_artefacts_invalid_method(mixin):
+    with pytest.raises(ValueError):
+        mixin.blank_artefacts(np.array([50.0]), method="median")
+
+
+def test_signal_processing_remove_line_noise(mixin):
+    times = mixin.times
+    mixin.values = mixin.values + np.sin(2 * np.pi * 50 * times)
+    mixin.values = mixin.values + np.sin(2 * np.pi * 150 * times)
+    mixin.remove_line_noise(frequency=50, harmonics=3)
+    assert "proc_line_noise_50" in mixin.__dir__()
+    freq, power_spectral_density = welch(
+        x=mixin.values, fs=mixin.info.sampling_frequency, nperseg=1024
+    )
+    for line_frequency in [50, 150]:
+        line_power = power_spectral_density[np.argmin(np.abs(freq - line_frequency))]
+        assert line_power < 1e-3
+
+
+def test_signal_processing_remove_line_noise_filters_designed_once(mixin):
+    sig_proc._line_noise_sos.cache_clear()
+    mixin.remove_line_noise(frequency=60, harmonics=2)
+    mixin.remove_line_noise(frequency=60, harmonics=2)
+    assert sig_proc._line_noise_sos.cache_info().hits == 1
+
+
+def test_signal_processing_remove_line_noise_above_nyquist(mixin):
+    with pytest.raises(ValueError):
+        mixin.remove_line_noise(frequency=600)
+
+
+def test_signal_processing_group_matches_single_channel(mixin, negative_value_mixin):
+    negative_value_mixin.times = mixin.times
+    single = sig_proc.SignalProcessing()
+    single.values, single.times, single.info = (
+        negative_value_mixin.values.copy(),
+        mixin.times,
+        mixin.info,
+    )
+    single.blank_artefacts(np.array([30.0]), pre=0.2, post=0.2).remove_line_noise()
+    sig_proc.blank_artefacts(
+        [mixin, negative_value_mixin], np.array([30.0]), pre=0.2, post=0.2
+    )
+    sig_proc.remove_line_noise([mixin, negative_value_mixin])
+    assert negative_value_mixin.values == approx(single.values)
+
+
+@pytest.mark.parametrize(
+    "filter_method, cutoff",
+    [("lowpass", 20), ("highpass", 5), ("bandpass", [20, 200]), ("bandstop", [5, 200])],
+)
+def test_signal_processing_filter_in_chunks_matches_one_shot(filter_method, cutoff):
+    random_generator = np.random.default_rng(42)
+    one_shot = sig_proc.SignalProcessing()
+    one_shot.values = random_generator.normal(size=200_000)
+    one_shot.info = channels.ChannelInfo(name="long", sampling_frequency=1000)
+    chunked = sig_proc.SignalProcessing()
+    chunked.values, chunked.info = one_shot.values.copy(), one_shot.info
+    tolerance = 1e-9 * np.max(np.abs(one_shot.values))
+    getattr(one_shot, filter_method)(cutoff)
+    getattr(chunked, filter_method)(cutoff, workers=4)
+    assert np.max(np.abs(chunked.values - one_shot.values)) < tolerance
+
+
+def test_signal_processing_filtfilt_chunked_small_chunks():
+    values = np.random.default_rng(1).normal(size=50_000)
+    filt_coef_b, filt_coef_a = butter(2, 0.1)
+    chunked = sig_proc.filtfilt_chunked(
+        filt_coef_b, filt_coef_a, values, workers=3, chunk_size=10
+    )
+    assert chunked == approx(filtfilt(filt_coef_b, filt_coef_a, values), abs=1e-9)
+    with pytest.raises(ValueError):
+        sig_proc.filtfilt_chunked(filt_coef_b, filt_coef_a, values, workers=0)
@@ -0,0 +1,78 @@
+import pytest
+from pytest import approx
+import numpy as np
+from scipy.signal import coherence as scipy_coherence
+
+from spike2py import trial, spectral
+
+
+@pytest.fixture()
+def synthetic_trial(synthetic_trial_file):
+    return trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+
+
+def test_spectral_coherence_matches_scipy(synthetic_trial):
+    result = synthetic_trial.coherence([("Emg1", "Emg2")], nperseg=256)
+    frequencies, expected = scipy_coherence(
+        synthetic_trial.Emg1.values, synthetic_trial.Emg2.values, fs=1000, nperseg=256
+    )
+    assert result.frequencies == approx(frequencies)
+    assert result.values[("Emg1", "Emg2")] == approx(expected)
+
+
+def test_spectral_coherence_defaults_to_all_waveform_pairs(synthetic_trial):
+    result = synthetic_trial.coherence(nperseg=256)
+    assert list(result.values) == [
+        ("Emg1", "Emg2"),
+        ("Emg1", "Noise"),
+        ("Emg2", "Noise"),
+    ]
+    peak = np.argmin(np.abs(result.frequencies - 25))
+    assert result.values[("Emg1", "Emg2")][peak] > 0.5
+    assert result.values[("Emg1", "Noise")][peak] < 0.2
+
+
+def test_spectral_cross_spectra_reused_for_pairs(synthetic_trial):
+    spectra = synthetic_trial.cross_spectra(["Emg1", "Emg2", "Noise"], nperseg=256)
+    first = spectra.coherence([("Emg1", "Emg2")])
+    second = spectra.coherence([("Emg2", "Noise"), ("Emg1", "Emg2")])
+    assert first.values[("Emg1", "Emg2")] == approx(second.values[("Emg1", "Emg2")])
+    with pytest.raises(ValueError):
+        spectra.coherence([("Emg1", "Missing")])
+
+
+def test_spectral_coherence_pooled_across_epochs_and_trials(synthetic_trial):
+    epochs = [(0, 5), (10, 15)]
+    single = synthetic_trial.coherence([("Emg1", "Emg2")], nperseg=256, epochs=epochs)
+    pooled = spectral.coherence(
+        [synthetic_trial, synthetic_trial],
+        [("Emg1", "Emg2")],
+        nperseg=256,
+        epochs=epochs,
+    )
+    assert pooled.n_segments == 2 * single.n_segments
+    assert pooled.values[("Emg1", "Emg2")] == approx(single.values[("Emg1", "Emg2")])
+
+
+def test_spectral_coherence_in_processes(synthetic_trial):
+    serial = synthetic_trial.coherence(nperseg=256)
+    parallel = synthetic_trial.coherence(nperseg=256, workers=2)
+    for pair, values in serial.values.items():
+        assert parallel.values[pair] == approx(values)
+
+
+def test_spectral_cross_correlation_finds_lag(synthetic_trial):
+    result = synthetic_trial.cross_correlation([("Emg1", "Emg2")], max_lag=0.02)
+    correlation = result.values[("Emg1", "Emg2")]
+    assert len(result.lags) == 41
+    assert result.lags[np.argmax(correlation)] == approx(0.003)
+    direct = np.correlate(
+        synthetic_trial.Emg2.values - synthetic_trial.Emg2.values.mean(),
+        synthetic_trial.Emg1.values - synthetic_trial.Emg1.values.mean(),
+        mode="full",
+    )
+    direct /= np.linalg.norm(
+        synthetic_trial.Emg1.values - synthetic_trial.Emg1.values.mean()
+    ) * np.linalg.norm(synthetic_trial.Emg2.values - synthetic_trial.Emg2.values.mean())
+    lags = slice(len(direct) // 2 - 20, len(direct) // 2 + 21)
+    assert correlation == approx(direct[lags])
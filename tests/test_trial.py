@@ -72,3 +72,56 @@ def test_trial_read(payload_dir, trial_default):
     assert isinstance(trial1, trial.Trial)
     assert np.mean(trial1.Angle.values) == approx(1.87862485065)
     assert "Flex" in trial1.__dir__()
+
+
+def test_trial_window(synthetic_trial_file):
+    trial1 = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    windowed = trial1.window(4, 10)
+    assert windowed.channels == trial1.channels
+    assert windowed.Emg1.times[0] == approx(4)
+    assert windowed.Emg1.times[-1] == approx(10)
+    assert len(windowed.Emg1.values) == 6001
+    assert np.shares_memory(windowed.Emg1.values, trial1.Emg1.values)
+    assert list(windowed.Stim.times) == [5.0, 9.5]
+    assert windowed.Keyboard.codes == []
+    windowed.Emg1.lowpass(20)
+    assert not np.shares_memory(windowed.Emg1.values, trial1.Emg1.values)
+    assert len(trial1.Emg1.values) == 20000
+
+
+def test_trial_channels_created_on_first_access(synthetic_trial_file, monkeypatch):
+    read_channel = trial.read.read_channel
+    read_channels = list()
+
+    def counting_read_channel(file, location):
+        read_channels.append(location.name)
+        return read_channel(file, location)
+
+    monkeypatch.setattr(trial.read, "read_channel", counting_read_channel)
+    trial1 = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    assert read_channels == []
+    assert ("Keyboard", "keyboard") in trial1.channels
+    assert "Emg2" in trial1.__dir__()
+    assert len(trial1.Emg2.values) == 20000
+    assert trial1.Emg2 is trial1.Emg2
+    assert read_channels == ["EMG2"]
+    with pytest.raises(AttributeError):
+        trial1.Torque
+    trial1.save()
+    assert read_channels == ["EMG2", "EMG1", "Noise", "Stim", "Keyboard"]
+
+
+def test_trial_add_channel_type_from_class(synthetic_trial_file):
+    class Spikes(trial.channels.Event):
+        def __repr__(self):
+            return "Detected spikes"
+
+    trial1 = trial.Trial(trial.TrialInfo(file=synthetic_trial_file))
+    info = {"path_save_figures": None, "trial_name": None, "subject_id": None}
+    spikes = Spikes("spikes", {"times": np.array([1.0]), **info})
+    trial1.add_channel(spikes)
+    assert ("Spikes", "event") in trial1.channels
+    trial1.add_channel(trial1.Emg1, "Emg1_copy")
+    assert ("Emg1_copy", "waveform") in trial1.channels
+    with pytest.raises(TypeError):
+        trial1.add_channel(trial1.info, "Info")